@@ -0,0 +1,523 @@
+from typing import *
+import numpy as np
+
+from .logic import (CardCode, GameState, CARD_MONTH, CARD_FLAGS, CARD_PI_CNT,
+                    FLAG_BRIGHT, FLAG_SUBBRIGHT, FLAG_BIRD, FLAG_ANIMAL, FLAG_RIBBON,
+                    FLAG_RED_RIBBON, FLAG_BLUE_RIBBON, FLAG_PLAIN_RIBBON, FLAG_BONUS,
+                    ACTION_BOMB_CARD, ACTION_THROW, ACTION_SHAKE, ACTION_STOP, ACTION_GO,
+                    ACTION_CAPTURE, NUM_ACTIONS, Player,
+                    PI_SCORE, ANIMAL_SCORE, BIRD_SCORE, BRIGHT_SCORE, RIBBON_SCORE, amplify)
+
+
+# BatchGame plays N games at once with the same rules as Game.
+# every card of every game has a location code, so the whole batch is a (N, 51) array
+# and a step applies one action code (see ACTION_* in logic) per game with masked array ops.
+
+NUM_CARDS = len(CardCode)
+
+# card locations
+LOC_STOCK    = 0
+LOC_BOARD    = 1
+LOC_FLIGHT   = 2   # thrown or flipped, not matched yet
+LOC_CAPTURED = 3   # captured during the current turn
+LOC_HAND     = 4   # LOC_HAND + player
+LOC_ACQUIRED = 7   # LOC_ACQUIRED + player
+
+_ASK_PRESIDENT = GameState.AskPresident.value
+_ASK_THROW     = GameState.AskCardToThrow.value
+_ASK_CAPTURE   = GameState.AskCardToCapture.value
+_ASK_GO        = GameState.AskGo.value
+_DONE          = GameState.Done.value
+
+# card attribute tables, indexed by card index (CardCode.value - 1)
+_MONTH = np.array([CARD_MONTH[v] or 0 for v in range(1, NUM_CARDS + 1)], dtype=np.int64)
+_FLAGS = np.array(CARD_FLAGS[1:], dtype=np.int64)
+_PI = np.array(CARD_PI_CNT[1:], dtype=np.int64)
+_IS_BONUS = (_FLAGS & FLAG_BONUS) != 0
+_KUKJIN = np.arange(NUM_CARDS) == CardCode.SepFlask.value - 1
+
+# columns of the category matrix used for scoring
+_CAT_BRIGHT, _CAT_SUBBRIGHT, _CAT_KUKJIN, _CAT_PI, _CAT_RIBBON, _CAT_RED, _CAT_BLUE, _CAT_PLAIN, \
+    _CAT_ANIMAL, _CAT_BIRD = range(10)
+_CATEGORIES = np.stack([(_FLAGS & FLAG_BRIGHT) != 0,
+                        (_FLAGS & FLAG_SUBBRIGHT) != 0,
+                        _KUKJIN,
+                        _PI,
+                        (_FLAGS & FLAG_RIBBON) != 0,
+                        (_FLAGS & FLAG_RED_RIBBON) != 0,
+                        (_FLAGS & FLAG_BLUE_RIBBON) != 0,
+                        (_FLAGS & FLAG_PLAIN_RIBBON) != 0,
+                        (_FLAGS & FLAG_ANIMAL) != 0,
+                        (_FLAGS & FLAG_BIRD) != 0], axis=1).astype(np.float32)
+
+# scoring tables of logic, as arrays
+_PI_SCORE = np.array(PI_SCORE, dtype=np.int64)
+_ANIMAL_SCORE = np.array(ANIMAL_SCORE, dtype=np.int64)
+_BIRD_SCORE = np.array(BIRD_SCORE, dtype=np.int64)
+_BRIGHT_SCORE = np.array(BRIGHT_SCORE, dtype=np.int64)
+_RIBBON_SCORE = np.array(RIBBON_SCORE, dtype=np.int64)
+
+# the cheapest pi card is given away first, the lowest index among equals
+_NO_PI = 1 << 16
+_PI_ORDER = np.where(_PI > 0, _PI * 64 + np.arange(NUM_CARDS), _NO_PI)
+
+
+def month_counts(cards:np.ndarray) -> np.ndarray:
+    # cards are laid out four per month, with the bonus cards last; column 0 counts the bonus cards
+    lead = cards.shape[:-1]
+    counts = np.empty(lead + (13,), dtype=np.int64)
+    counts[..., 1:] = cards[..., :48].reshape(lead + (12, 4)).sum(axis=-1)
+    counts[..., 0] = cards[..., 48:].sum(axis=-1)
+    return counts
+
+
+def category_counts(cards:np.ndarray) -> np.ndarray:
+    # (..., 51) card masks to (..., 10) category counts, in the column order of _CATEGORIES
+    return (cards.astype(np.float32) @ _CATEGORIES).astype(np.int64)
+
+
+def score_counts(counts:np.ndarray, go_cnt:np.ndarray, shake_cnt:np.ndarray, bomb_cnt:np.ndarray,
+                 president_cnt:np.ndarray, kukjin_as_doublepi:np.ndarray, amplifier:bool=True) -> np.ndarray:
+    # same as Player.score(), over rows of category counts
+    kukjin = kukjin_as_doublepi & (counts[..., _CAT_KUKJIN] > 0)
+    pi = counts[..., _CAT_PI] + 2 * kukjin
+    animal = counts[..., _CAT_ANIMAL] - kukjin
+
+    res = (_PI_SCORE[pi] + _ANIMAL_SCORE[animal] + _BIRD_SCORE[counts[..., _CAT_BIRD]]
+           + _BRIGHT_SCORE[2 * counts[..., _CAT_BRIGHT] + (counts[..., _CAT_SUBBRIGHT] > 0)]
+           + _RIBBON_SCORE[(counts[..., _CAT_RED] * 4 + counts[..., _CAT_BLUE]) * 5 + counts[..., _CAT_PLAIN]])
+    if amplifier:
+        res = amplify(res, go_cnt, shake_cnt, bomb_cnt, animal >= 7)
+
+    return np.where(president_cnt > 0, 7, res)
+
+
+# Player.score() of many players at once
+def score_players(players:Sequence[Player], amplifier:bool=True) -> np.ndarray:
+    # Player._counters() is in the column order of _CATEGORIES
+    counts = np.array([p._counters() for p in players], dtype=np.int64).reshape(-1, _CATEGORIES.shape[1])
+    state = np.array([(p._go_cnt, p._shake_cnt, p._bomb_cnt, p._president_cnt, p._kukjin_as_doublepi)
+                      for p in players], dtype=np.int64).reshape(-1, 5)
+    return score_counts(counts, state[:, 0], state[:, 1], state[:, 2], state[:, 3], state[:, 4] > 0, amplifier)
+
+
+class BatchGame(object):
+    def __init__(self, num_games:int, num_players:int=2, seed:Union[None, int]=None):
+        if num_players == 2:
+            self._num_hand = 10
+            self._num_board = 8
+            self._goable_score = 7
+        elif num_players == 3:
+            self._num_hand = 7
+            self._num_board = 6
+            self._goable_score = 3
+        else: raise NotImplemented
+
+        n = num_games
+        self._num_games = n
+        self._num_players = num_players
+        self._rng = np.random.default_rng(seed)
+        self._rows = np.arange(n)
+
+        self._loc = np.zeros((n, NUM_CARDS), dtype=np.int8)
+        self._shaked = np.zeros((n, NUM_CARDS), dtype=bool)
+        self._deck = np.zeros((n, NUM_CARDS), dtype=np.int64)
+        self._stock_pos = np.zeros(n, dtype=np.int64)
+        self._pending = np.full((n, 2), -1, dtype=np.int64)
+        self._steal_cnt = np.zeros(n, dtype=np.int64)
+        self._bbuck_player = np.full((n, 13), -1, dtype=np.int64)
+
+        self._state = np.zeros(n, dtype=np.int64)
+        self._turn = np.zeros(n, dtype=np.int64)
+        self._winner = np.full(n, -1, dtype=np.int64)
+
+        shape = (n, num_players)
+        self._go_cnt = np.zeros(shape, dtype=np.int64)
+        self._shake_cnt = np.zeros(shape, dtype=np.int64)
+        self._bomb_cnt = np.zeros(shape, dtype=np.int64)
+        self._bomb_card_cnt = np.zeros(shape, dtype=np.int64)
+        self._bbuck_cnt = np.zeros(shape, dtype=np.int64)
+        self._latest_go_score = np.zeros(shape, dtype=np.int64)
+        self._president_cnt = np.zeros(shape, dtype=np.int64)
+        self._kukjin_as_doublepi = np.zeros(shape, dtype=bool)
+
+        self.reset()
+
+    @property
+    def num_games(self) -> int:
+        return self._num_games
+
+    @property
+    def num_players(self) -> int:
+        return self._num_players
+
+    @property
+    def state(self) -> np.ndarray:
+        return self._state
+
+    @property
+    def turn(self) -> np.ndarray:
+        return self._turn
+
+    @property
+    def winner(self) -> np.ndarray:
+        return self._winner
+
+    @property
+    def done(self) -> np.ndarray:
+        return self._state == _DONE
+
+    def reset(self, games:Union[None, np.ndarray]=None):
+        # shuffles new decks for the given games (all by default), redealing a 'president' board
+        rows = self._rows if games is None else self._as_rows(games)
+        while len(rows) > 0:
+            perms = self._rng.permuted(np.tile(np.arange(NUM_CARDS), (len(rows), 1)), axis=1)
+            self.deal(perms, rows)
+            board = month_counts(self._loc[rows] == LOC_BOARD)
+            rows = rows[(board[:, 1:] == 4).any(axis=1)]
+
+    def deal(self, perms:np.ndarray, games:Union[None, np.ndarray]=None):
+        # deals the card indices of each row of perms in order: hands, board, then the stock
+        rows = self._rows if games is None else self._as_rows(games)
+        perms = np.asarray(perms, dtype=np.int64)
+        P = self._num_players
+        h = self._num_hand
+        b = self._num_board
+
+        self._deck[rows] = perms
+        self._stock_pos[rows] = P * h + b
+        loc = np.full((len(rows), NUM_CARDS), LOC_STOCK, dtype=np.int8)
+        sub = np.arange(len(rows))[:, None]
+        for p in range(P):
+            loc[sub, perms[:, p * h:(p + 1) * h]] = LOC_HAND + p
+        board = perms[:, P * h:P * h + b]
+        # the 1st player get the bonus cards on the board
+        loc[sub, board] = np.where(_IS_BONUS[board], LOC_ACQUIRED, LOC_BOARD)
+        self._loc[rows] = loc
+
+        self._shaked[rows] = False
+        self._pending[rows] = -1
+        self._steal_cnt[rows] = 0
+        self._bbuck_player[rows] = -1
+        self._turn[rows] = 0
+        self._winner[rows] = -1
+        for counter in [self._go_cnt, self._shake_cnt, self._bomb_cnt, self._bomb_card_cnt,
+                        self._bbuck_cnt, self._latest_go_score, self._president_cnt]:
+            counter[rows] = 0
+        self._kukjin_as_doublepi[rows] = False
+
+        self._state[rows] = GameState.Initialized.value
+        self._scan_president(rows)
+
+    def legal_actions(self) -> np.ndarray:
+        legal = np.zeros((self._num_games, NUM_ACTIONS), dtype=bool)
+        state = self._state
+
+        rows = np.nonzero(state == _ASK_THROW)[0]
+        if len(rows) > 0:
+            turn = self._turn[rows]
+            sub = self._loc[rows]
+            hand = sub == (LOC_HAND + turn)[:, None]
+            hand_cnt = month_counts(hand)[:, _MONTH]
+            board_cnt = month_counts(sub == LOC_BOARD)[:, _MONTH]
+            shakable = hand & (_MONTH > 0) & ((hand_cnt == 3) | ((hand_cnt >= 2) & (hand_cnt + board_cnt >= 4)))
+            legal[rows, ACTION_BOMB_CARD] = self._bomb_card_cnt[rows, turn] > 0
+            legal[rows, ACTION_THROW:ACTION_THROW + NUM_CARDS] = hand
+            legal[rows, ACTION_SHAKE:ACTION_SHAKE + NUM_CARDS] = shakable
+
+        rows = np.nonzero((state == _ASK_PRESIDENT) | (state == _ASK_GO))[0]
+        legal[rows, ACTION_STOP] = True
+        legal[rows, ACTION_GO] = True
+
+        rows = np.nonzero(state == _ASK_CAPTURE)[0]
+        if len(rows) > 0:
+            month = _MONTH[self._pending[rows, 0]]
+            legal[rows, ACTION_CAPTURE:ACTION_CAPTURE + NUM_CARDS] = \
+                (self._loc[rows] == LOC_BOARD) & (_MONTH[None, :] == month[:, None])
+
+        return legal
+
+    # applies one action code per game; returns which games accepted their action.
+    # finished games and illegal actions are left untouched.
+    def step(self, actions:np.ndarray) -> np.ndarray:
+        actions = np.asarray(actions, dtype=np.int64)
+        ok = self._is_legal(actions)
+        state = self._state.copy()
+
+        rows = np.nonzero(ok & (state == _ASK_THROW))[0]
+        if len(rows) > 0: self._throw(rows, actions[rows])
+
+        rows = np.nonzero(ok & (state == _ASK_CAPTURE))[0]
+        if len(rows) > 0: self._capture(rows, actions[rows] - ACTION_CAPTURE)
+
+        rows = np.nonzero(ok & (state == _ASK_GO))[0]
+        if len(rows) > 0: self._go(rows, actions[rows] == ACTION_GO)
+
+        rows = np.nonzero(ok & (state == _ASK_PRESIDENT))[0]
+        if len(rows) > 0: self._president(rows, actions[rows] == ACTION_GO)
+
+        return ok
+
+    def scores(self, amplifier:bool=True) -> np.ndarray:
+        acquired = self._loc[:, None, :] == (LOC_ACQUIRED + np.arange(self._num_players))[None, :, None]
+        counts = category_counts(acquired)
+        return score_counts(counts, self._go_cnt, self._shake_cnt, self._bomb_cnt, self._president_cnt,
+                            self._kukjin_as_doublepi, amplifier)
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    def _as_rows(self, games:np.ndarray) -> np.ndarray:
+        games = np.asarray(games)
+        if games.dtype == bool: return np.nonzero(games)[0]
+        return games.astype(np.int64)
+
+    def _score_of(self, rows:np.ndarray, players:np.ndarray, amplifier:bool) -> np.ndarray:
+        acquired = self._loc[rows] == (LOC_ACQUIRED + players)[:, None]
+        counts = category_counts(acquired)
+        return score_counts(counts, self._go_cnt[rows, players], self._shake_cnt[rows, players],
+                            self._bomb_cnt[rows, players], self._president_cnt[rows, players],
+                            self._kukjin_as_doublepi[rows, players], amplifier)
+
+    # same as legal_actions()[game, action], checking only the given action of each game
+    def _is_legal(self, actions:np.ndarray) -> np.ndarray:
+        ok = np.zeros(self._num_games, dtype=bool)
+        state = self._state
+
+        rows = np.nonzero((state == _ASK_THROW) & (actions >= 0) & (actions < ACTION_STOP))[0]
+        if len(rows) > 0:
+            a = actions[rows]
+            turn = self._turn[rows]
+            shake = a >= ACTION_SHAKE
+            card = np.where(shake, a - ACTION_SHAKE, np.maximum(a - ACTION_THROW, 0))
+            sub = self._loc[rows]
+            hand_loc = LOC_HAND + turn
+            in_hand = sub[np.arange(len(rows)), card] == hand_loc
+            same_month = _MONTH[None, :] == _MONTH[card][:, None]
+            hand_cnt = ((sub == hand_loc[:, None]) & same_month).sum(axis=1)
+            board_cnt = ((sub == LOC_BOARD) & same_month).sum(axis=1)
+            shakable = (_MONTH[card] > 0) & ((hand_cnt == 3) | ((hand_cnt >= 2) & (hand_cnt + board_cnt >= 4)))
+            ok[rows] = np.where(a == ACTION_BOMB_CARD, self._bomb_card_cnt[rows, turn] > 0,
+                                in_hand & (~shake | shakable))
+
+        rows = np.nonzero((state == _ASK_PRESIDENT) | (state == _ASK_GO))[0]
+        ok[rows] = (actions[rows] == ACTION_STOP) | (actions[rows] == ACTION_GO)
+
+        rows = np.nonzero((state == _ASK_CAPTURE) & (actions >= ACTION_CAPTURE) & (actions < NUM_ACTIONS))[0]
+        if len(rows) > 0:
+            card = actions[rows] - ACTION_CAPTURE
+            ok[rows] = (self._loc[rows, card] == LOC_BOARD) & (_MONTH[card] == _MONTH[self._pending[rows, 0]])
+
+        return ok
+
+    def _has_move(self, rows:np.ndarray) -> np.ndarray:
+        turn = self._turn[rows]
+        hand = (self._loc[rows] == (LOC_HAND + turn)[:, None]).any(axis=1)
+        return hand | (self._bomb_card_cnt[rows, turn] > 0)
+
+    def _scan_president(self, rows:np.ndarray):
+        while len(rows) > 0:
+            turn = self._turn[rows]
+            finished = turn >= self._num_players
+            self._turn[rows[finished]] = 0
+            self._state[rows[finished]] = _ASK_THROW
+            rows, turn = rows[~finished], turn[~finished]
+
+            hand = month_counts(self._loc[rows] == (LOC_HAND + turn)[:, None])
+            ask = (hand[:, 1:] == 4).any(axis=1)
+            self._state[rows[ask]] = _ASK_PRESIDENT
+            rows = rows[~ask]
+            self._turn[rows] += 1
+
+    def _president(self, rows:np.ndarray, go:np.ndarray):
+        claim = rows[~go]
+        self._president_cnt[claim, self._turn[claim]] += 1
+        self._state[claim] = _DONE
+        self._winner[claim] = self._turn[claim]
+
+        rows = rows[go]
+        self._turn[rows] += 1
+        self._scan_president(rows)
+
+    def _go(self, rows:np.ndarray, go:np.ndarray):
+        stop = rows[~go]
+        self._state[stop] = _DONE
+        self._winner[stop] = self._turn[stop]
+
+        rows = rows[go]
+        turn = self._turn[rows]
+        self._latest_go_score[rows, turn] = self._score_of(rows, turn, amplifier=False)
+        self._go_cnt[rows, turn] += 1
+        self._next_turn(rows)
+
+    def _capture(self, rows:np.ndarray, chosen:np.ndarray):
+        self._loc[rows, chosen] = LOC_CAPTURED
+        self._loc[rows, self._pending[rows, 0]] = LOC_CAPTURED
+        self._pending[rows, 0] = self._pending[rows, 1]
+        self._pending[rows, 1] = -1
+        self._resolve_turn(rows)
+
+    def _throw(self, rows:np.ndarray, actions:np.ndarray):
+        loc = self._loc
+        turn = self._turn[rows]
+        is_pass = actions == ACTION_BOMB_CARD
+        shake = actions >= ACTION_SHAKE
+        card = np.where(shake, actions - ACTION_SHAKE, np.maximum(actions - ACTION_THROW, 0))
+
+        # a bonus card from the hand: take it, take a pi from the others, draw a card from the stock in its place
+        # and throw again
+        bonus = ~is_pass & _IS_BONUS[card]
+        if bonus.any():
+            r = rows[bonus]
+            loc[r, card[bonus]] = LOC_ACQUIRED + turn[bonus]
+            self._steal(r, np.ones(len(r), dtype=np.int64))
+            i = np.nonzero(self._stock_pos[r] < NUM_CARDS)[0]
+            drawn = self._deck[r[i], self._stock_pos[r[i]]]
+            loc[r[i], drawn] = LOC_HAND + turn[bonus][i]
+            self._stock_pos[r[i]] += 1
+            last = ~self._has_move(r)
+            if last.any(): self._resolve_turn(r[last])
+            keep = ~bonus
+            rows, turn, is_pass, shake, card = rows[keep], turn[keep], is_pass[keep], shake[keep], card[keep]
+            if len(rows) == 0: return
+
+        hand_loc = LOC_HAND + turn
+        month = np.where(is_pass, 0, _MONTH[card])
+        sub = loc[rows]
+        same_month = (_MONTH[None, :] == month[:, None]) & (month[:, None] > 0)
+        hand_board = (sub == LOC_BOARD) & same_month
+        hand_cnt = hand_board.sum(axis=1)
+
+        # shaked
+        i = np.nonzero(shake & (hand_cnt == 0))[0]
+        if len(i) > 0:
+            self._shaked[rows[i]] |= (sub[i] == hand_loc[i, None]) & same_month[i]
+            self._shake_cnt[rows[i], turn[i]] += 1
+
+        # bomb: throw every card of the month and take the board cards
+        bomb = shake & (hand_cnt > 0)
+        i = np.nonzero(bomb)[0]
+        if len(i) > 0:
+            r = rows[i]
+            hand_same = (sub[i] == hand_loc[i, None]) & same_month[i]
+            loc[r] = np.where(hand_same | hand_board[i], LOC_CAPTURED, sub[i])
+            self._shaked[r] &= ~hand_same
+            self._bomb_card_cnt[r, turn[i]] += hand_same.sum(axis=1) - 1
+            self._bomb_cnt[r, turn[i]] += 1
+            self._steal_cnt[r] += 1
+            month[i] = 0
+
+        i = np.nonzero(~bomb & ~is_pass)[0]
+        loc[rows[i], card[i]] = LOC_FLIGHT
+        self._shaked[rows[i], card[i]] = False
+        i = np.nonzero(is_pass)[0]
+        self._bomb_card_cnt[rows[i], turn[i]] -= 1
+
+        # flip the stock; bonus cards go straight to the player
+        stock_card = np.full(len(rows), -1, dtype=np.int64)
+        drawing = np.nonzero(self._stock_pos[rows] < NUM_CARDS)[0]
+        while len(drawing) > 0:
+            r = rows[drawing]
+            c = self._deck[r, self._stock_pos[r]]
+            self._stock_pos[r] += 1
+            b = _IS_BONUS[c]
+            loc[r, c] = np.where(b, LOC_CAPTURED, LOC_FLIGHT)
+            stock_card[drawing[~b]] = c[~b]
+            drawing = drawing[b & (self._stock_pos[r] < NUM_CARDS)]
+        stock_month = np.where(stock_card >= 0, _MONTH[stock_card], -1)
+
+        same = (month > 0) & (month == stock_month)
+        # jjock
+        i = np.nonzero(same & (hand_cnt == 0))[0]
+        if len(i) > 0:
+            loc[rows[i], card[i]] = LOC_CAPTURED
+            loc[rows[i], stock_card[i]] = LOC_CAPTURED
+            self._steal_cnt[rows[i]] += 1
+        # bbuck
+        i = np.nonzero(same & (hand_cnt == 1))[0]
+        if len(i) > 0:
+            loc[rows[i], card[i]] = LOC_BOARD
+            loc[rows[i], stock_card[i]] = LOC_BOARD
+            self._bbuck_player[rows[i], month[i]] = turn[i]
+            self._bbuck_cnt[rows[i], turn[i]] += 1
+        # dda dack
+        i = np.nonzero(same & (hand_cnt == 2))[0]
+        if len(i) > 0:
+            r = rows[i]
+            loc[r] = np.where(hand_board[i], LOC_CAPTURED, loc[r])
+            loc[r, card[i]] = LOC_CAPTURED
+            loc[r, stock_card[i]] = LOC_CAPTURED
+            self._steal_cnt[r] += 1
+
+        i = np.nonzero(~same & (month > 0))[0]
+        if len(i) > 0: self._match(rows[i], card[i])
+        i = np.nonzero(~same & (stock_card >= 0))[0]
+        if len(i) > 0: self._match(rows[i], stock_card[i])
+
+        self._resolve_turn(rows)
+
+    # matches a thrown or flipped card against the board cards of its month
+    def _match(self, rows:np.ndarray, cards:np.ndarray):
+        loc = self._loc
+        month = _MONTH[cards]
+        sub = loc[rows]
+        board_cards = (sub == LOC_BOARD) & (_MONTH[None, :] == month[:, None])
+        cnt = board_cards.sum(axis=1)
+
+        # wasted
+        i = np.nonzero(cnt == 0)[0]
+        loc[rows[i], cards[i]] = LOC_BOARD
+
+        # acquired, or resolve bbuck
+        i = np.nonzero((cnt == 1) | (cnt == 3))[0]
+        if len(i) > 0:
+            loc[rows[i]] = np.where(board_cards[i], LOC_CAPTURED, sub[i])
+            loc[rows[i], cards[i]] = LOC_CAPTURED
+        i = np.nonzero(cnt == 3)[0]
+        self._bbuck_player[rows[i], month[i]] = -1
+        self._steal_cnt[rows[i]] += 1
+
+        # choose what to acquire
+        i = np.nonzero(cnt == 2)[0]
+        if len(i) > 0:
+            r = rows[i]
+            slot = np.where(self._pending[r, 0] < 0, 0, 1)
+            self._pending[r, slot] = cards[i]
+
+    def _resolve_turn(self, rows:np.ndarray):
+        ask = self._pending[rows, 0] >= 0
+        self._state[rows[ask]] = _ASK_CAPTURE
+        rows = rows[~ask]
+        if len(rows) == 0: return
+
+        turn = self._turn[rows]
+        sub = self._loc[rows]
+        captured = sub == LOC_CAPTURED
+        # sweeping the board takes a pi from the others as well
+        sweep = ~(sub == LOC_BOARD).any(axis=1) & captured.any(axis=1)
+        self._loc[rows] = np.where(captured, (LOC_ACQUIRED + turn)[:, None], sub)
+        steal = self._steal_cnt[rows] + sweep
+        self._steal_cnt[rows] = 0
+        self._steal(rows, steal)
+
+        score = self._score_of(rows, turn, amplifier=False)
+        go = (score >= self._goable_score) & (score > self._latest_go_score[rows, turn]) & (score > 0)
+        self._state[rows[go]] = _ASK_GO
+        self._next_turn(rows[~go])
+
+    def _steal(self, rows:np.ndarray, cnt:np.ndarray):
+        turn = self._turn[rows]
+        for k in range(int(cnt.max(initial=0))):
+            i = np.nonzero(cnt > k)[0]
+            r, t = rows[i], turn[i]
+            for offset in range(1, self._num_players):
+                owner = LOC_ACQUIRED + (t + offset) % self._num_players
+                order = np.where(self._loc[r] == owner[:, None], _PI_ORDER[None, :], _NO_PI)
+                pi = order.argmin(axis=1)
+                has = order[np.arange(len(r)), pi] < _NO_PI
+                self._loc[r[has], pi[has]] = LOC_ACQUIRED + t[has]
+
+    def _next_turn(self, rows:np.ndarray):
+        self._turn[rows] = (self._turn[rows] + 1) % self._num_players
+        has = self._has_move(rows)
+        # nobody stopped before the cards ran out
+        self._state[rows[~has]] = _DONE
+        self._state[rows[has]] = _ASK_THROW
@@ -0,0 +1,111 @@
+from typing import *
+
+import numpy as np
+
+from .logic import Game, CardMask, CardCode, ALL_CARDS
+
+
+# where the unseen cards of a player (the observer) may be: in the stock, or in the hidden hand of another
+# player. the probabilities are a (num_players, 51) array indexed by CardCode.value - 1:
+#
+#   LOC_STOCK        the stock
+#   LOC_HAND + i     the hand of the i-th player after the observer (i = 0 .. num_players - 2)
+#
+# every unseen card is somewhere, so its column sums to 1, and row k sums to the number of hidden cards
+# at location k. seen cards have a zero column.
+#
+# the unseen cards follow from Game._public, which the game keeps up to date on every throw, flip and
+# shake, so they cost a few mask operations. without a prior, every unseen card is equally likely at
+# every location. a prior hook, prior(game, observer) -> (num_players, 51) nonnegative weights (e.g. from
+# an opponent model), tilts them: the weights are scaled until the columns and rows sum as above.
+
+NUM_CARDS = len(CardCode)
+
+LOC_STOCK = 0
+LOC_HAND  = 1
+
+PriorHook = Callable[[Game, int], np.ndarray]
+
+_SHIFTS = np.arange(NUM_CARDS, dtype=np.uint64)
+
+
+# cards observer cannot see, the same as determinize.unseen_cards()
+def unseen_mask(game:Game, observer:int) -> CardMask:
+    return ALL_CARDS - game._public - game._players[observer]._hand
+
+
+# number of unseen cards at each location
+def hidden_counts(game:Game, observer:int) -> np.ndarray:
+    num_players = game.num_player
+    counts = np.empty(num_players, dtype=np.float64)
+    counts[LOC_STOCK] = game.stock_size
+    for i in range(num_players - 1):
+        p = game._players[(observer + 1 + i) % num_players]
+        counts[LOC_HAND + i] = len(p._hand - p._shaked)
+    return counts
+
+
+# the uniform location probabilities of the unseen cards of observer (the turn player by default), written to out
+def location_probabilities(game:Game, observer:Union[None, int]=None,
+                           out:Union[None, np.ndarray]=None) -> np.ndarray:
+    if observer is None: observer = game.turn
+    if out is None: out = np.zeros((game.num_player, NUM_CARDS), dtype=np.float32)
+    unseen = (np.uint64(unseen_mask(game, observer)) >> _SHIFTS) & np.uint64(1)
+    counts = hidden_counts(game, observer)
+    total = counts.sum()
+    if total == 0:
+        out[:] = 0
+        return out
+    np.multiply((counts / total)[:, np.newaxis], unseen, out=out, casting='unsafe')
+    return out
+
+
+# the beliefs of one observer about one game. they are recomputed only when a throw, flip or shake
+# revealed a card since the last call (or the hidden counts changed), so asking every ply is cheap.
+class BeliefTracker(object):
+    def __init__(self, game:Game, observer:int, prior:Union[None, PriorHook]=None, iterations:int=50):
+        self.game = game
+        self.observer = observer
+        self._prior = prior
+        self._iterations = iterations
+        self._key = None
+        self._probs = np.zeros((game.num_player, NUM_CARDS), dtype=np.float32)
+
+    @property
+    def unseen(self) -> CardMask:
+        return unseen_mask(self.game, self.observer)
+
+    # location probabilities, see above. the array is reused by the next call; copy it to keep it.
+    def probabilities(self) -> np.ndarray:
+        game = self.game
+        key = (int(game._public), int(game._players[self.observer]._hand), game.stock_size,
+               tuple(len(p._hand - p._shaked) for p in game._players))
+        # a prior may change with anything in the game
+        if key == self._key and self._prior is None: return self._probs
+        self._key = key
+        if self._prior is None: return location_probabilities(game, self.observer, self._probs)
+        return self._fit()
+
+    # the row of the hand of player (another than the observer) in probabilities()
+    def hand_row(self, player:int) -> int:
+        if player == self.observer: raise Exception('The observer sees its own hand')
+        return LOC_HAND + (player - self.observer - 1) % self.game.num_player
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    # scales the prior weights until every unseen card sums to 1 and every location to its hidden count
+    def _fit(self) -> np.ndarray:
+        game = self.game
+        unseen = ((np.uint64(self.unseen) >> _SHIFTS) & np.uint64(1)).astype(bool)
+        counts = hidden_counts(game, self.observer)
+        weights = np.asarray(self._prior(game, self.observer), dtype=np.float64)[:, unseen]
+        weights = np.where(counts[:, np.newaxis] > 0, weights, 0.0)
+        for _ in range(self._iterations):
+            cols = weights.sum(axis=0)
+            weights /= np.where(cols > 0, cols, 1.0)
+            rows = weights.sum(axis=1)
+            weights *= (counts / np.where(rows > 0, rows, 1.0))[:, np.newaxis]
+        cols = weights.sum(axis=0)
+        weights /= np.where(cols > 0, cols, 1.0)
+        self._probs[:] = 0
+        self._probs[:, unseen] = weights
+        return self._probs
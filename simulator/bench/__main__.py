@@ -0,0 +1,38 @@
+import argparse
+import json
+import sys
+
+from .suite import environment, run_all
+
+
+# python -m simulator.bench [--quick] [--output results.json] [--compare baseline.json]
+
+def compare(baseline:dict, current:dict):
+    # ratios are new / old: above 1 is better for rates (*_per_sec), worse for costs (us_*)
+    for bench, metrics in current['results'].items():
+        old = baseline['results'].get(bench, {})
+        for metric, value in metrics.items():
+            if metric not in old: continue
+            print('{0:<22}{1:<24}{2:>14.3f}{3:>14.3f}{4:>8.2f}x'
+                  .format(bench, metric, old[metric], value, value / old[metric]), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulator benchmarks, written as JSON')
+    parser.add_argument('--quick', action='store_true', help='fewer games, for a smoke run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='write the results to this file instead of stdout')
+    parser.add_argument('--compare', default=None, help='print the ratios against an earlier results file')
+    args = parser.parse_args()
+
+    current = {'environment': environment(), 'results': run_all(args.quick, args.seed)}
+    text = json.dumps(current, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(json.load(f), current)
@@ -0,0 +1,39 @@
+from typing import *
+import argparse
+import time
+
+from ..logic import Game, deck_from_seed, game_seed
+
+
+# games initialized per second: new Game objects, in-place Game.reset(), and deck_from_seed() alone
+def bench_deal(num_games:int=20000, num_players:int=2, seed:int=0) -> Dict[str, float]:
+    seeds = [game_seed(seed, i) for i in range(num_games)]
+    res = dict()
+
+    start = time.perf_counter()
+    for s in seeds:
+        Game(num_players, seed=s)
+    res['init'] = num_games / (time.perf_counter() - start)
+
+    game = Game(num_players, seed=seed)
+    start = time.perf_counter()
+    for s in seeds:
+        game.reset(seed=s)
+    res['reset'] = num_games / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for s in seeds:
+        deck_from_seed(s, num_players)
+    res['deck_from_seed'] = num_games / (time.perf_counter() - start)
+    return res
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Games initialized per second')
+    parser.add_argument('--games', type=int, default=20000)
+    parser.add_argument('--players', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for name, rate in bench_deal(args.games, args.players, args.seed).items():
+        print('{0:<16}{1:>12.0f} games/s'.format(name, rate))
@@ -0,0 +1,104 @@
+from typing import *
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+
+from ..logic import Game, GameState, game_seed
+from ..selfplay import play_game, random_policy, policy_seed
+from ..playout import playout
+from ..playout import random_policy as random_playout_policy
+from .deal import bench_deal
+
+
+# every benchmark returns a flat dict of metrics; rates are per second, costs are in microseconds.
+# timings are the best of a few repeats, to keep the noise of a shared machine out of comparisons.
+
+def _best(func:Callable[[], object], number:int, repeat:int=5) -> float:
+    # seconds per call
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+# games stopped at random plies, so that the players hold typical mid-game cards
+def _midgame_games(num_games:int, seed:int) -> List[Game]:
+    rng = random.Random(seed)
+    games = []
+    for i in range(num_games):
+        game = Game(2, seed=game_seed(seed, i))
+        for _ in range(rng.randrange(30)):
+            if game.state == GameState.Done: break
+            game.action(game.action_to_answer(rng.choice(game.legal_action_list())))
+        games.append(game)
+    return games
+
+
+def bench_score(seed:int=0) -> Dict[str, float]:
+    players = [p for game in _midgame_games(200, seed) for p in game._players]
+
+    def run():
+        for p in players:
+            p.score()
+    return {'us_per_call': 1e6 * _best(run, 50) / len(players)}
+
+
+def bench_by_month(seed:int=0) -> Dict[str, float]:
+    boards = [game._board for game in _midgame_games(200, seed)]
+
+    def run():
+        for board in boards:
+            for m in range(1, 13):
+                board.by_month(m)
+    return {'us_per_call': 1e6 * _best(run, 20) / (12 * len(boards))}
+
+
+def bench_init(num_games:int=20000, seed:int=0) -> Dict[str, float]:
+    res = dict()
+    for num_players in (2, 3):
+        for name, rate in bench_deal(num_games, num_players, seed).items():
+            res['{0}p_{1}_per_sec'.format(num_players, name)] = rate
+    return res
+
+
+def bench_random_games(num_players:int, num_games:int=2000, seed:int=0) -> Dict[str, float]:
+    policies = [random_policy] * num_players
+    plies = 0
+    start = time.perf_counter()
+    for i in range(num_games):
+        # the policies draw from random.Random(policy_seed(seed, i))
+        plies += play_game(policies, num_players, game_seed(seed, i))[2]
+    elapsed = time.perf_counter() - start
+    return {'games_per_sec': num_games / elapsed, 'plies_per_sec': plies / elapsed}
+
+
+# the same games as bench_random_games, through the playout fast path (dealing excluded)
+def bench_playouts(num_players:int, num_games:int=2000, seed:int=0) -> Dict[str, float]:
+    games = [Game(num_players, seed=game_seed(seed, i)) for i in range(num_games)]
+    rngs = [random.Random(policy_seed(seed, i)) for i in range(num_games)]
+    start = time.perf_counter()
+    for game, rng in zip(games, rngs):
+        playout(game, random_playout_policy, rng=rng)
+    elapsed = time.perf_counter() - start
+    return {'games_per_sec': num_games / elapsed}
+
+
+def run_all(quick:bool=False, seed:int=0) -> Dict[str, Dict[str, float]]:
+    scale = 10 if quick else 1
+    return {'player.score': bench_score(seed),
+            'board.by_month': bench_by_month(seed),
+            'game.init': bench_init(20000 // scale, seed),
+            'selfplay.random_2p': bench_random_games(2, 2000 // scale, seed),
+            'selfplay.random_3p': bench_random_games(3, 2000 // scale, seed),
+            'playout.random_2p': bench_playouts(2, 2000 // scale, seed),
+            'playout.random_3p': bench_playouts(3, 2000 // scale, seed)}
+
+
+def environment() -> Dict[str, str]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': sys.version.split()[0], 'implementation': platform.python_implementation(),
+            'machine': platform.machine(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
@@ -0,0 +1,108 @@
+from typing import *
+import itertools
+import math
+
+import numpy as np
+
+from .logic import Game, CardMask, CARDS, ALL_CARDS
+
+
+# a determinization (world) is a full Game consistent with what one player has seen: its own hand,
+# the board, every acquired pile, the shaked cards of the others and the cards of an unfinished turn.
+# the unseen cards are dealt at random to the hands of the others and to the stock.
+#
+# a weighting hook (e.g. an opponent model) rates each sampled world: weight(world, observer) returns
+# a likelihood, and the weights returned by sample() are normalized to sum to 1.
+
+WeightHook = Callable[[Game, int], float]
+
+
+# cards whose location observer cannot know: the hidden hands of the others and the stock
+def unseen_cards(game:Game, observer:Union[None, int]=None) -> CardMask:
+    if observer is None: observer = game.turn
+    return ALL_CARDS - game._public - game._players[observer]._hand
+
+
+# every world consistent with what observer has seen, or None when there are more than limit of them.
+# the stock order counts, so there are n! / (h_1! * ... * h_k!) worlds for n unseen cards and h_i hidden
+# cards in the hand of the i-th other player.
+def enumerate_worlds(game:Game, observer:Union[None, int]=None,
+                     limit:Union[None, int]=None) -> Union[None, List[Game]]:
+    if observer is None: observer = game.turn
+    unseen = [c._value for c in unseen_cards(game, observer)]
+    others, hidden = _hidden_counts(game, observer, len(unseen))
+    cnt = math.factorial(len(unseen))
+    for n in hidden:
+        cnt //= math.factorial(n)
+    if limit is not None and cnt > limit: return None
+
+    worlds = []
+    def assign(i:int, rest:List[int], hands:List[int]):
+        if i == len(others):
+            for stock in itertools.permutations(rest):
+                worlds.append(_make_world(game, others, hands, stock))
+            return
+        for chosen in itertools.combinations(rest, hidden[i]):
+            bits = 0
+            for v in chosen:
+                bits |= 1 << (v - 1)
+            assign(i + 1, [v for v in rest if v not in chosen], hands + [bits])
+    assign(0, unseen, [])
+    return worlds
+
+
+class Determinizer(object):
+    def __init__(self, seed:Union[None, int]=None, weight:Union[None, WeightHook]=None):
+        self._rng = np.random.default_rng(seed)
+        self._weight = weight
+
+    def sample(self, game:Game, num_worlds:int,
+               observer:Union[None, int]=None) -> Tuple[List[Game], np.ndarray]:
+        if observer is None: observer = game.turn
+        unseen = unseen_cards(game, observer)
+        values = np.array([c._value for c in unseen], dtype=np.int64)
+
+        others, hidden = _hidden_counts(game, observer, len(values))
+
+        # one permutation of the unseen cards per world, drawn in a single call
+        perms = self._rng.permuted(np.tile(values, (num_worlds, 1)), axis=1)
+        bits = np.left_shift(np.uint64(1), (perms - 1).astype(np.uint64))
+        hands = []
+        start = 0
+        for n in hidden:
+            hands.append(np.bitwise_or.reduce(bits[:, start:start + n], axis=1).tolist() if n > 0
+                         else [0] * num_worlds)
+            start += n
+        stocks = perms[:, start:].tolist()
+
+        worlds = [_make_world(game, others, [hand[w] for hand in hands], stocks[w]) for w in range(num_worlds)]
+
+        if self._weight is None:
+            weights = np.full(num_worlds, 1.0 / max(1, num_worlds))
+        else:
+            weights = np.array([self._weight(world, observer) for world in worlds], dtype=np.float64)
+            total = weights.sum()
+            if total <= 0: raise Exception('The weighting hook rejected every world')
+            weights /= total
+        return worlds, weights
+
+
+## Functions, whose names start with an underscore, should not be called by the user
+# the other players, and the number of unseen cards in each of their hands; the stock takes the rest
+def _hidden_counts(game:Game, observer:int, num_unseen:int) -> Tuple[List[int], List[int]]:
+    others = [i for i in range(game.num_player) if i != observer]
+    hidden = [len(game._players[i]._hand - game._players[i]._shaked) for i in others]
+    if sum(hidden) + game.stock_size != num_unseen:
+        raise Exception('The game is not consistent with its unseen cards')
+    return others, hidden
+
+
+def _make_world(game:Game, others:List[int], hands:List[int], stock:Sequence[int]) -> Game:
+    world = game.clone()
+    # the deal and its seed would give the hidden cards away; _set_stock() rewrites the deck
+    world._seed = None
+    for i, hand in zip(others, hands):
+        p = world._players[i]
+        p._set_hand(CardMask(p._shaked | hand))
+    world._set_stock(tuple(map(CARDS.__getitem__, stock)))
+    return world
@@ -0,0 +1,113 @@
+from typing import *
+import numpy as np
+
+from .logic import Game, CardMask, CardCode
+from .belief import location_probabilities
+
+
+# an observation is a (num_planes, 51) array seen from one player (the turn player by default).
+# each plane but the last marks the cards of one zone, indexed by CardCode.value - 1;
+# players are ordered relative to the observer: the observer first, then the next players in turn.
+#
+#   PLANE_HAND                 hand of the observer
+#   PLANE_BOARD                board
+#   PLANE_PENDING              thrown or flipped cards waiting for a capture choice
+#   PLANE_CAPTURED             cards captured earlier in the turn, not acquired yet
+#   PLANE_ACQUIRED + i         acquired cards of the i-th player
+#   PLANE_ACQUIRED + P + i     shaked cards of the i-th player
+#   PLANE_ACQUIRED + 2P + k    with beliefs, the probability that an unseen card is at location k
+#                              (see belief.py: the stock, then the hands of the next players)
+#   last plane                 counters; slot META_* + i * META_PER_PLAYER for the i-th player,
+#                              and META_STOCK after the players
+
+NUM_CARDS = len(CardCode)
+
+PLANE_HAND     = 0
+PLANE_BOARD    = 1
+PLANE_PENDING  = 2
+PLANE_CAPTURED = 3
+PLANE_ACQUIRED = 4
+
+META_GO        = 0
+META_SHAKE     = 1
+META_BOMB      = 2
+META_BOMB_CARD = 3
+META_HAND      = 4
+META_PER_PLAYER = 5
+
+_SHIFTS = np.arange(NUM_CARDS, dtype=np.uint64)
+
+
+class ObservationEncoder(object):
+    def __init__(self, num_players:int=2, max_batch:int=1, beliefs:bool=False):
+        self._num_players = num_players
+        self._num_mask_planes = PLANE_ACQUIRED + 2 * num_players
+        self._beliefs = beliefs
+        self._meta_plane = self._num_mask_planes + (num_players if beliefs else 0)
+        self._meta_stock = META_PER_PLAYER * num_players
+        self._masks = np.zeros((max_batch, self._num_mask_planes), dtype=np.uint64)
+        self._bits = np.zeros((max_batch, self._num_mask_planes, NUM_CARDS), dtype=np.uint64)
+
+    @property
+    def num_planes(self) -> int:
+        return self._meta_plane + 1
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.num_planes, NUM_CARDS)
+
+    def new_buffer(self, batch:Union[None, int]=None, dtype=np.float32) -> np.ndarray:
+        if batch is None: return np.zeros(self.shape, dtype=dtype)
+        return np.zeros((batch,) + self.shape, dtype=dtype)
+
+    # writes the observation of game into out, a buffer of shape self.shape
+    def encode(self, game:Game, out:np.ndarray, player:Union[None, int]=None) -> np.ndarray:
+        self._fill(0, game, player, out)
+        self._unpack(1, out[np.newaxis])
+        return out
+
+    # writes the observations of games into out, a buffer of shape (len(games),) + self.shape
+    def encode_batch(self, games:Sequence[Game], out:np.ndarray,
+                     players:Union[None, Sequence[int]]=None) -> np.ndarray:
+        n = len(games)
+        if n > len(self._masks):
+            # grow the scratch buffers once, to the largest batch seen so far
+            self._masks = np.zeros((n, self._num_mask_planes), dtype=np.uint64)
+            self._bits = np.zeros((n, self._num_mask_planes, NUM_CARDS), dtype=np.uint64)
+        for i, game in enumerate(games):
+            self._fill(i, game, None if players is None else players[i], out[i])
+        self._unpack(n, out)
+        return out
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    def _fill(self, idx:int, game:Game, player:Union[None, int], out:np.ndarray):
+        if player is None: player = game.turn
+        num_players = self._num_players
+        masks = self._masks[idx]
+        masks[PLANE_HAND] = game._players[player]._hand
+        masks[PLANE_BOARD] = game._board.as_set()
+        masks[PLANE_PENDING] = CardMask(game._pending)
+        masks[PLANE_CAPTURED] = game._captured
+
+        meta = out[self._meta_plane]
+        meta[:] = 0
+        for i in range(num_players):
+            p = game._players[(player + i) % num_players]
+            masks[PLANE_ACQUIRED + i] = p._acquired
+            masks[PLANE_ACQUIRED + num_players + i] = p._shaked
+            base = i * META_PER_PLAYER
+            meta[base + META_GO] = p._go_cnt
+            meta[base + META_SHAKE] = p._shake_cnt
+            meta[base + META_BOMB] = p._bomb_cnt
+            meta[base + META_BOMB_CARD] = p._bomb_card_cnt
+            meta[base + META_HAND] = len(p._hand)
+        meta[self._meta_stock] = game.stock_size
+        if self._beliefs:
+            location_probabilities(game, player, out[self._num_mask_planes:self._meta_plane])
+
+    def _unpack(self, n:int, out:np.ndarray):
+        masks = self._masks[:n]
+        bits = self._bits[:n]
+        np.right_shift(masks[:, :, np.newaxis], _SHIFTS, out=bits)
+        np.bitwise_and(bits, 1, out=bits)
+        out[:, :self._num_mask_planes] = bits
@@ -0,0 +1,164 @@
+from typing import *
+import random
+
+from .logic import Game, GameState
+from .determinize import Determinizer, enumerate_worlds
+from .transposition import make_table
+from .symmetry import canonical_swaps, canonical_key, permute_action
+
+
+# exact search of the last plies of a game.
+#
+# a Game with its hidden cards known is deterministic (the stock order is fixed), so solve() searches it
+# to GameState.Done: alpha-beta for two players, max^n for three. a result is the payoff of every player:
+# the winner gets score * (num_players - 1) and every loser pays the score, as in env.
+# positions are memoized in a transposition table keyed by Game.zhash, or by symmetry.canonical_key when
+# symmetric is set, so that states differing by a swap of equivalent cards share an entry.
+#
+# a player that cannot see the hidden cards uses best_action(): the action values are averaged over
+# every world consistent with its view (see determinize.enumerate_worlds), or over sampled worlds
+# when there are more than max_worlds of them.
+
+Payoff = Tuple[float, ...]
+
+_EXACT = 0
+_LOWER = 1
+_UPPER = 2
+
+
+def payoff(game:Game) -> Payoff:
+    num_players = game.num_player
+    winner = game.winner()
+    if winner is None: return (0.0,) * num_players
+    score = float(game._players[winner].score())
+    res = [-score] * num_players
+    res[winner] = score * (num_players - 1)
+    return tuple(res)
+
+
+class EndgameSolver(object):
+    # threshold: can_solve() holds once the stock has at most that many cards.
+    # fallback: the policy (see selfplay) used by __call__ before that; random by default.
+    # perfect_information: search the game as it is, hidden cards included (e.g. for a determinized world).
+    # symmetric: key the table by canonical_key; it merges more states but costs more than zhash.
+    def __init__(self, threshold:int=4, fallback:Union[None, Callable[[Game, List[str], random.Random], dict]]=None,
+                 perfect_information:bool=False, max_worlds:int=256, capacity:int=1 << 20,
+                 symmetric:bool=False, seed:Union[None, int]=None):
+        self.threshold = threshold
+        self.perfect_information = perfect_information
+        self.symmetric = symmetric
+        self.max_worlds = max_worlds
+        self._fallback = fallback
+        self._rng = random.Random(seed)
+        self._determinizer = Determinizer(seed=self._rng.getrandbits(64))
+        self._table = make_table(capacity)
+        self.nodes = 0
+
+    @property
+    def table(self):
+        return self._table
+
+    def can_solve(self, game:Game) -> bool:
+        return game.stock_size <= self.threshold and game.state != GameState.Done
+
+    # payoffs of game under perfect play of every player
+    def solve(self, game:Game) -> Payoff:
+        if game.num_player == 2:
+            v = self._alphabeta(game, float('-inf'), float('inf'))
+            return (v, -v)
+        return self._maxn(game)
+
+    # payoff of the turn player for every legal action
+    def action_values(self, game:Game) -> Dict[int, float]:
+        turn = game.turn
+        res = dict()
+        for action in game.legal_action_list():
+            game.do(game.action_to_answer(action))
+            res[action] = self.solve(game)[turn]
+            game.undo()
+        return res
+
+    # the action with the best expected payoff for the turn player, seen from observer (the turn player by default)
+    def best_action(self, game:Game, observer:Union[None, int]=None) -> int:
+        if game.state == GameState.Done: raise Exception('The game is over')
+        if self.perfect_information:
+            values = self.action_values(game)
+        else:
+            worlds = enumerate_worlds(game, observer, self.max_worlds)
+            if worlds is None: worlds = self._determinizer.sample(game, self.max_worlds, observer)[0]
+            values = dict()
+            for world in worlds:
+                for action, value in self.action_values(world).items():
+                    values[action] = values.get(action, 0.0) + value
+        return max(values, key=lambda action: values[action])
+
+    # a policy: exact play once can_solve() holds, the fallback before
+    def __call__(self, game:Game, reqfields:List[str], rng:random.Random) -> dict:
+        if self.can_solve(game):
+            return game.action_to_answer(self.best_action(game))
+        if self._fallback is not None: return self._fallback(game, reqfields, rng)
+        return game.action_to_answer(rng.choice(game.legal_action_list()))
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    # payoff of player 0
+    def _alphabeta(self, game:Game, alpha:float, beta:float) -> float:
+        self.nodes += 1
+        if game.state == GameState.Done: return payoff(game)[0]
+
+        # the best action is stored in the canonical frame
+        swaps = canonical_swaps(game) if self.symmetric else 0
+        key = canonical_key(game, swaps) if self.symmetric else game.zhash
+        entry = self._table.get(key)
+        best_first = None
+        if entry is not None:
+            flag, value, best_first = entry
+            if best_first is not None: best_first = permute_action(best_first, swaps)
+            if flag == _EXACT: return value
+            if flag == _LOWER: alpha = max(alpha, value)
+            else: beta = min(beta, value)
+            if alpha >= beta: return value
+
+        actions = game.legal_action_list()
+        if best_first is not None and best_first in actions:
+            actions.remove(best_first)
+            actions.insert(0, best_first)
+
+        alpha0, beta0 = alpha, beta
+        maximize = game.turn == 0
+        best = float('-inf') if maximize else float('inf')
+        best_action = None
+        for action in actions:
+            game.do(game.action_to_answer(action))
+            value = self._alphabeta(game, alpha, beta)
+            game.undo()
+            if maximize:
+                if value > best: best, best_action = value, action
+                alpha = max(alpha, value)
+            else:
+                if value < best: best, best_action = value, action
+                beta = min(beta, value)
+            if alpha >= beta: break
+
+        if best <= alpha0: flag = _UPPER
+        elif best >= beta0: flag = _LOWER
+        else: flag = _EXACT
+        self._table.store(key, (flag, best, None if best_action is None else permute_action(best_action, swaps)))
+        return best
+
+    def _maxn(self, game:Game) -> Payoff:
+        self.nodes += 1
+        if game.state == GameState.Done: return payoff(game)
+
+        key = canonical_key(game) if self.symmetric else game.zhash
+        entry = self._table.get(key)
+        if entry is not None: return entry
+
+        turn = game.turn
+        best = None
+        for action in game.legal_action_list():
+            game.do(game.action_to_answer(action))
+            value = self._maxn(game)
+            game.undo()
+            if best is None or value[turn] > best[turn]: best = value
+        self._table.store(key, best)
+        return best
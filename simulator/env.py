@@ -0,0 +1,216 @@
+from typing import *
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .logic import Game, GameState, NUM_ACTIONS, game_seed
+from .encoder import ObservationEncoder
+
+
+# GoStopVectorEnv steps N games with one canonical action code (see ACTION_* in logic) each.
+#
+#   reset()         -> observations, legal action masks
+#   step(actions)   -> observations, rewards, dones, legal action masks
+#
+# observations are encoded for the player to act (see encoder). rewards are (N, num_players):
+# when a game is done, every loser pays the final score of the winner. a finished game is
+# reset in place, so the returned observation and mask already belong to the next game.
+# the returned arrays are reused by the next call; copy them to keep them.
+# a step with an illegal action raises, and leaves the games its action was meant for as they were.
+
+
+class _Envs(object):
+    # a slice of the games from env start on, run in this process and written into the given output arrays
+    def __init__(self, num_players:int, seeds:Sequence[Union[None, int]], obs:np.ndarray, rewards:np.ndarray,
+                 dones:np.ndarray, masks:np.ndarray, start:int=0):
+        self._games = [Game(num_players, seed=seed) for seed in seeds]
+        self._encoder = ObservationEncoder(num_players, max_batch=len(seeds))
+        self._obs = obs
+        self._rewards = rewards
+        self._dones = dones
+        self._masks = masks
+        self._start = start
+        self._observe()
+
+    def reset(self):
+        for game in self._games:
+            game.reset()
+        self._rewards[:] = 0
+        self._dones[:] = False
+        self._observe()
+
+    def step(self, actions:np.ndarray):
+        # every action is checked against the masks of the last observation before any game moves
+        actions = np.asarray(actions)
+        legal = (actions >= 0) & (actions < NUM_ACTIONS)
+        legal[legal] = self._masks[np.flatnonzero(legal), actions[legal]]
+        if not legal.all():
+            i = int(np.flatnonzero(~legal)[0])
+            raise Exception('Illegal action {0} for env {1}'.format(actions[i], self._start + i))
+        rewards = self._rewards
+        rewards[:] = 0
+        for i, game in enumerate(self._games):
+            if not game.action(game.action_to_answer(int(actions[i]))):
+                raise Exception('Illegal action {0} for env {1}'.format(actions[i], self._start + i))
+            done = game.state == GameState.Done
+            self._dones[i] = done
+            if done:
+                winner = game.winner()
+                if winner is not None:
+                    score = game._players[winner].score()
+                    rewards[i] = -score
+                    rewards[i, winner] = score * (game.num_player - 1)
+                game.reset()
+        self._observe()
+
+    def _observe(self):
+        self._encoder.encode_batch(self._games, self._obs)
+        masks = self._masks
+        for i, game in enumerate(self._games):
+            masks[i] = np.frombuffer(game.legal_actions(), dtype=np.uint8)
+
+
+class GoStopVectorEnv(object):
+    # backend 'sync' runs the games in this process; 'subprocess' splits them over worker
+    # processes, which write their results into shared memory.
+    def __init__(self, num_envs:int, num_players:int=2, backend:str='sync',
+                 num_workers:Union[None, int]=None, seed:Union[None, int]=None):
+        self._num_envs = num_envs
+        self._num_players = num_players
+        self._encoder = ObservationEncoder(num_players)
+        shapes = _shapes(num_envs, num_players, self._encoder)
+
+        if backend == 'sync':
+            self._arrays = [np.zeros(shape, dtype=dtype) for shape, dtype in shapes]
+            self._envs = _Envs(num_players, _seeds(seed, 0, num_envs), *self._arrays)
+            self._workers = None
+        elif backend == 'subprocess':
+            if num_workers is None: num_workers = min(num_envs, mp.cpu_count())
+            self._shm = [shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize))
+                         for shape, dtype in shapes]
+            self._arrays = [np.ndarray(shape, dtype=dtype, buffer=shm.buf) for shm, (shape, dtype) in zip(self._shm, shapes)]
+            self._envs = None
+            self._workers = []
+            bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+            for w in range(num_workers):
+                parent, child = mp.Pipe()
+                proc = mp.Process(target=_worker, daemon=True,
+                                  args=(child, [shm.name for shm in self._shm], num_envs, num_players,
+                                        int(bounds[w]), int(bounds[w + 1]), seed))
+                proc.start()
+                child.close()
+                self._workers.append((parent, proc, int(bounds[w]), int(bounds[w + 1])))
+        else: raise Exception('Unknown backend: {0}'.format(backend))
+
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+        self._closed = False
+
+    @property
+    def num_envs(self) -> int:
+        return self._num_envs
+
+    @property
+    def observation_shape(self) -> Tuple[int, int]:
+        return self._encoder.shape
+
+    @property
+    def num_actions(self) -> int:
+        return NUM_ACTIONS
+
+    def reset(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._workers is None:
+            self._envs.reset()
+        else:
+            self._call('reset')
+        obs, _, _, masks = self._arrays
+        return obs, masks
+
+    def step(self, actions:np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        self.step_async(actions)
+        return self.step_wait()
+
+    # with the subprocess backend, the games are stepped while the caller does something else
+    def step_async(self, actions:np.ndarray):
+        self._actions[:] = actions
+        if self._workers is not None:
+            for conn, _, start, end in self._workers:
+                conn.send(('step', self._actions[start:end]))
+
+    def step_wait(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if self._workers is None:
+            self._envs.step(self._actions)
+        else:
+            self._wait()
+        return tuple(self._arrays)
+
+    def close(self):
+        if self._closed: return
+        self._closed = True
+        if self._workers is None: return
+        for conn, proc, _, _ in self._workers:
+            try: conn.send(('close', None))
+            except (BrokenPipeError, EOFError): pass
+        for conn, proc, _, _ in self._workers:
+            proc.join()
+            conn.close()
+        del self._arrays
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self) -> 'GoStopVectorEnv':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _call(self, cmd:str):
+        for conn, _, _, _ in self._workers:
+            conn.send((cmd, None))
+        self._wait()
+
+    # every worker answers before an error is raised, so the pipes stay in step
+    def _wait(self):
+        error = None
+        for conn, _, _, _ in self._workers:
+            res = conn.recv()
+            if isinstance(res, Exception) and error is None: error = res
+        if error is not None: raise error
+
+
+# the i-th env starts from game_seed(seed, i) and deals its next games from there (see Game.reset),
+# so a seeded env plays the same games with either backend
+def _seeds(seed:Union[None, int], start:int, end:int) -> list:
+    if seed is None: return [None] * (end - start)
+    return [game_seed(seed, i) for i in range(start, end)]
+
+
+def _shapes(num_envs:int, num_players:int, encoder:ObservationEncoder) -> list:
+    # observations, rewards, dones, legal action masks
+    return [((num_envs,) + encoder.shape, np.float32),
+            ((num_envs, num_players), np.float32),
+            ((num_envs,), np.bool_),
+            ((num_envs, NUM_ACTIONS), np.bool_)]
+
+
+def _worker(conn, shm_names:List[str], num_envs:int, num_players:int, start:int, end:int,
+            seed:Union[None, int]):
+    shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    shapes = _shapes(num_envs, num_players, ObservationEncoder(num_players))
+    arrays = [np.ndarray(shape, dtype=dtype, buffer=shm.buf)[start:end] for shm, (shape, dtype) in zip(shms, shapes)]
+    envs = _Envs(num_players, _seeds(seed, start, end), *arrays, start=start)
+    try:
+        while True:
+            cmd, data = conn.recv()
+            if cmd == 'close': break
+            try:
+                if cmd == 'reset': envs.reset()
+                elif cmd == 'step': envs.step(data)
+                conn.send(None)
+            except Exception as e:
+                conn.send(e)
+    finally:
+        del envs, arrays
+        for shm in shms:
+            shm.close()
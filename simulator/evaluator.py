@@ -0,0 +1,150 @@
+from typing import *
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from .logic import Game, NUM_ACTIONS
+from .encoder import ObservationEncoder
+
+
+# a model evaluates a batch: model(observations, legal action masks) -> (policies, values), where
+# observations are (B,) + ObservationEncoder.shape float32, masks are (B, NUM_ACTIONS) bool,
+# policies are (B, NUM_ACTIONS) and values are (B,). row i of the outputs belongs to row i of the inputs.
+Model = Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+# (policy over action codes, value for the player to act)
+Evaluation = Tuple[np.ndarray, float]
+
+
+class LinearModel(object):
+    # a stand-in model: one linear layer for the policy logits and one for the value
+    def __init__(self, num_players:int=2, seed:Union[None, int]=None):
+        rng = np.random.default_rng(seed)
+        size = int(np.prod(ObservationEncoder(num_players).shape))
+        self._policy = (rng.standard_normal((size, NUM_ACTIONS)) / np.sqrt(size)).astype(np.float32)
+        self._value = (rng.standard_normal(size) / np.sqrt(size)).astype(np.float32)
+
+    def __call__(self, obs:np.ndarray, masks:np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        flat = obs.reshape(len(obs), -1)
+        logits = flat @ self._policy
+        logits[~masks] = -np.inf
+        logits -= logits.max(axis=1, keepdims=True)
+        policy = np.exp(logits)
+        policy /= policy.sum(axis=1, keepdims=True)
+        return policy, np.tanh(flat @ self._value)
+
+
+class EvaluatorStats(object):
+    def __init__(self):
+        self.evaluations = 0
+        self.batches = 0
+        self.model_seconds = 0.0
+
+    @property
+    def mean_batch(self) -> float:
+        if self.batches == 0: return 0.0
+        return self.evaluations / self.batches
+
+    def __str__(self):
+        return ('{0} evaluations in {1} batches (mean {2:.1f}), {3:.3f}s in the model'
+                .format(self.evaluations, self.batches, self.mean_batch, self.model_seconds))
+
+
+# collects the states submitted by any number of threads (or asyncio tasks) and evaluates them in batches.
+# a batch is sent to the model when it holds max_batch states, or max_latency seconds after its first state.
+# a submitted game is encoded by the evaluator thread, so it must not change until its result is ready.
+class BatchedEvaluator(object):
+    def __init__(self, model:Model, num_players:int=2, max_batch:int=256, max_latency:float=0.002):
+        self._model = model
+        self._max_batch = max_batch
+        self._max_latency = max_latency
+        self._encoder = ObservationEncoder(num_players, max_batch=max_batch)
+        self._obs = self._encoder.new_buffer(max_batch)
+        self._masks = np.zeros((max_batch, NUM_ACTIONS), dtype=np.bool_)
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self.stats = EvaluatorStats()
+        self._thread = threading.Thread(target=self._run, name='BatchedEvaluator', daemon=True)
+        self._thread.start()
+
+    def submit(self, game:Game, player:Union[None, int]=None) -> Future:
+        if self._closed: raise Exception('The evaluator is closed')
+        future = Future()
+        self._queue.put((game, player, future))
+        return future
+
+    def evaluate(self, game:Game, player:Union[None, int]=None) -> Evaluation:
+        return self.submit(game, player).result()
+
+    async def evaluate_async(self, game:Game, player:Union[None, int]=None) -> Evaluation:
+        return await asyncio.wrap_future(self.submit(game, player))
+
+    # a prior hook for MCTSPlayer
+    def prior(self, game:Game) -> np.ndarray:
+        return self.evaluate(game)[0]
+
+    def close(self):
+        if self._closed: return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self) -> 'BatchedEvaluator':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    def _run(self):
+        pending = self._queue
+        while True:
+            item = pending.get()
+            if item is None: return
+            batch = [item]
+            deadline = time.perf_counter() + self._max_latency
+            stop = False
+            while len(batch) < self._max_batch:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = pending.get(timeout=timeout) if timeout > 0 else pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            # a future cancelled while it waited is dropped; the others can no longer be cancelled
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if batch:
+                try:
+                    self._evaluate(batch)
+                except Exception as e:
+                    # e.g. a failing model: the batch fails, the evaluator goes on
+                    for _, _, future in batch:
+                        if not future.done(): future.set_exception(e)
+            if stop: return
+
+    def _evaluate(self, batch:list):
+        n = len(batch)
+        games = [game for game, _, _ in batch]
+        players = [game.turn if player is None else player for game, player, _ in batch]
+        obs = self._encoder.encode_batch(games, self._obs[:n], players)
+        masks = self._masks[:n]
+        for i, game in enumerate(games):
+            masks[i] = np.frombuffer(game.legal_actions(), dtype=np.bool_)
+        start = time.perf_counter()
+        policies, values = self._model(obs, masks)
+        self.stats.model_seconds += time.perf_counter() - start
+        policies = np.asarray(policies)
+        values = np.asarray(values)
+        if policies.shape != (n, NUM_ACTIONS) or values.shape != (n,):
+            raise Exception('The model answered {0} and {1} for a batch of {2}'.format(policies.shape, values.shape, n))
+        self.stats.evaluations += n
+        self.stats.batches += 1
+        for i, (_, _, future) in enumerate(batch):
+            future.set_result((policies[i].copy(), float(values[i])))
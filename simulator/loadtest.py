@@ -0,0 +1,165 @@
+from typing import *
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from .server import TableServer, encode_frame, read_frame
+
+
+# load test of a table server: every client is one connection that keeps a number of tables in play and
+# answers their requests with random legal actions, after an optional think time. the latency of a decision
+# is the time from an answer to the next request (or the end) of the same table, as seen by the client.
+
+class LoadStats(object):
+    def __init__(self):
+        self.games = 0
+        self.decisions = 0
+        self.refused = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.latencies = []
+        self.elapsed = 0.0
+
+    def percentile(self, q:float) -> float:
+        if len(self.latencies) == 0: return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def report(self) -> dict:
+        return {'games': self.games, 'decisions': self.decisions, 'refused': self.refused,
+                'timeouts': self.timeouts, 'errors': self.errors, 'seconds': self.elapsed,
+                'games_per_sec': self.games / self.elapsed if self.elapsed > 0 else 0.0,
+                'decisions_per_sec': self.decisions / self.elapsed if self.elapsed > 0 else 0.0,
+                'latency_ms': {'p50': 1e3 * self.percentile(0.5), 'p99': 1e3 * self.percentile(0.99),
+                               'max': 1e3 * max(self.latencies, default=0.0)}}
+
+    def __str__(self):
+        r = self.report()
+        return ('{0} games, {1} decisions in {2:.2f}s ({3:.1f} games/s, {4:.0f} decisions/s), '
+                'latency p50 {5:.2f}ms p99 {6:.2f}ms max {7:.2f}ms, {8} refused, {9} timeouts, {10} errors'
+                .format(r['games'], r['decisions'], r['seconds'], r['games_per_sec'], r['decisions_per_sec'],
+                        r['latency_ms']['p50'], r['latency_ms']['p99'], r['latency_ms']['max'],
+                        r['refused'], r['timeouts'], r['errors']))
+
+
+async def open_connection(address:Union[str, Tuple[str, int]]) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if isinstance(address, str): return await asyncio.open_unix_connection(address)
+    return await asyncio.open_connection(*address)
+
+
+# runs num_clients clients, each playing num_games games with up to num_tables of them at once.
+# the client sits at every seat of its tables but the last num_bots, which the server plays.
+async def run_load(address:Union[str, Tuple[str, int]], num_clients:int=10, num_tables:int=100,
+                   num_games:int=1000, num_players:int=2, num_bots:int=0, think:float=0.0,
+                   seed:Union[None, int]=None) -> LoadStats:
+    stats = LoadStats()
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(address, num_tables, num_games, num_players, num_bots, think,
+                                   rng.getrandbits(64), stats) for _ in range(num_clients)])
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+## Functions, whose names start with an underscore, should not be called by the user
+async def _client(address:Union[str, Tuple[str, int]], num_tables:int, num_games:int, num_players:int,
+                  num_bots:int, think:float, seed:int, stats:LoadStats):
+    rng = random.Random(seed)
+    reader, writer = await open_connection(address)
+    create = encode_frame({'op': 'create', 'players': num_players, 'seats': list(range(num_players - num_bots)),
+                           'bots': list(range(num_players - num_bots, num_players))})
+    # time of the last answer, by table
+    answered = dict()
+    created = min(num_tables, num_games)
+    finished = 0
+
+    async def answer(msg:dict):
+        await asyncio.sleep(rng.uniform(0, 2 * think))
+        answered[msg['table']] = time.perf_counter()
+        writer.write(encode_frame({'op': 'act', 'table': msg['table'], 'ply': msg['ply'],
+                                   'action': rng.choice(msg['legal'])}))
+
+    async def retry_create():
+        await asyncio.sleep(0.01)
+        writer.write(create)
+
+    tasks = set()
+    writer.write(create * created)
+    try:
+        while finished < num_games:
+            msg = await read_frame(reader)
+            if msg is None: raise Exception('The server closed the connection')
+            op = msg['op']
+            if op in ['request', 'done']:
+                sent = answered.pop(msg['table'], None)
+                if sent is not None: stats.latencies.append(time.perf_counter() - sent)
+            if op == 'request':
+                stats.decisions += 1
+                if think > 0:
+                    task = asyncio.ensure_future(answer(msg))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    answered[msg['table']] = time.perf_counter()
+                    writer.write(encode_frame({'op': 'act', 'table': msg['table'], 'ply': msg['ply'],
+                                               'action': rng.choice(msg['legal'])}))
+            elif op == 'done':
+                finished += 1
+                stats.games += 1
+                if created < num_games:
+                    created += 1
+                    writer.write(create)
+            elif op == 'timeout':
+                stats.timeouts += 1
+            elif op == 'error':
+                if msg.get('for') == 'create':
+                    # refused: try again a bit later
+                    stats.refused += 1
+                    task = asyncio.ensure_future(retry_create())
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    stats.errors += 1
+            await writer.drain()
+    finally:
+        for task in list(tasks):
+            task.cancel()
+        writer.close()
+
+
+async def _main(args:argparse.Namespace) -> LoadStats:
+    server = None
+    address = args.path if args.path is not None else ('127.0.0.1', args.port)
+    if args.serve:
+        if args.path is None: address = os.path.join(tempfile.mkdtemp(), 'tables.sock')
+        server = TableServer(address, max_tables=args.max_tables, turn_timeout=args.turn_timeout)
+        await server.start()
+    try:
+        return await run_load(address, args.clients, args.tables, args.games, args.players, args.bots,
+                              args.think, args.seed)
+    finally:
+        if server is not None:
+            await server.close()
+            print(server.stats)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test of a Go-Stop table server')
+    parser.add_argument('--path', default=None, help='unix socket of the server')
+    parser.add_argument('--port', type=int, default=7007, help='TCP port of the server on localhost, without --path')
+    parser.add_argument('--serve', action='store_true', help='run the server in this process')
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--tables', type=int, default=100, help='tables in play per client')
+    parser.add_argument('--games', type=int, default=1000, help='games per client')
+    parser.add_argument('--players', type=int, default=2)
+    parser.add_argument('--bots', type=int, default=0, help='seats per table played by the server')
+    parser.add_argument('--think', type=float, default=0.0, help='mean think time of a decision (seconds)')
+    parser.add_argument('--max-tables', type=int, default=10000, help='with --serve')
+    parser.add_argument('--turn-timeout', type=float, default=10.0, help='with --serve')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    print(asyncio.run(_main(args)))
@@ -1,9 +1,12 @@
 
 from typing import *
+import os
 import random
 import enum
 from enum import Enum
 
+# opt-in instrumentation, see probe. it is None when off, so a probe point costs a global lookup
+_probe = None
 
 # Please see https://namu.wiki/w/%ED%99%94%ED%88%AC/%ED%8C%A8
 # Following cards are defined in the same order as appeared in the above link
@@ -77,90 +80,449 @@ class CardCode(Enum):
     JokerTriple=51
 
 
+# card attribute flags
+FLAG_BRIGHT       = 1 << 0
+FLAG_SUBBRIGHT    = 1 << 1
+FLAG_BIRD         = 1 << 2
+FLAG_ANIMAL       = 1 << 3
+FLAG_RED_RIBBON   = 1 << 4
+FLAG_BLUE_RIBBON  = 1 << 5
+FLAG_PLAIN_RIBBON = 1 << 6
+FLAG_BONUS        = 1 << 7
+FLAG_RIBBON       = FLAG_RED_RIBBON | FLAG_BLUE_RIBBON | FLAG_PLAIN_RIBBON
+
+def _build_card_tables():
+    flags = dict()
+    def mark(flag, codes):
+        for code in codes: flags[code] = flags.get(code, 0) | flag
+
+    mark(FLAG_BRIGHT, [CardCode.JanBright, CardCode.MarBright, CardCode.AugBright, CardCode.NovBright, CardCode.DecBright])
+    mark(FLAG_SUBBRIGHT, [CardCode.DecBright])
+    mark(FLAG_BIRD, [CardCode.FebBird, CardCode.AprBird, CardCode.AugBird])
+    mark(FLAG_ANIMAL, [CardCode.FebBird, CardCode.AprBird, CardCode.MayBridge, CardCode.JunButterfly, CardCode.JulPig,
+                       CardCode.AugBird, CardCode.SepFlask, CardCode.OctDeer, CardCode.DecBird])
+    mark(FLAG_RED_RIBBON, [CardCode.FebRedRibbon, CardCode.MarRedRibbon, CardCode.JanRedRibbon])
+    mark(FLAG_BLUE_RIBBON, [CardCode.JunBlueRibbon, CardCode.SepBlueRibbon, CardCode.OctBlueRibbon])
+    mark(FLAG_PLAIN_RIBBON, [CardCode.AprRibbon, CardCode.MayRibbon, CardCode.JulRibbon, CardCode.DecRibbon])
+    mark(FLAG_BONUS, [CardCode.JokerDouble1, CardCode.JokerDouble2, CardCode.JokerTriple])
+
+    pi = dict()
+    for code in [CardCode.Jan1, CardCode.Jan2, CardCode.Feb1, CardCode.Feb2, CardCode.Mar1, CardCode.Mar2,
+                 CardCode.Apr1, CardCode.Apr2, CardCode.May1, CardCode.May2, CardCode.Jun1, CardCode.Jun2,
+                 CardCode.Jul1, CardCode.Jul2, CardCode.Aug1, CardCode.Aug2, CardCode.Sep1, CardCode.Sep2,
+                 CardCode.Oct1, CardCode.Oct2, CardCode.Nov1, CardCode.Nov2]:
+        pi[code] = 1
+    for code in [CardCode.DecDoor, CardCode.NovDouble, CardCode.JokerDouble1, CardCode.JokerDouble2]:
+        pi[code] = 2
+    pi[CardCode.JokerTriple] = 3
+
+    # index 0 is unused, so that the tables can be indexed by CardCode.value
+    month = [None]
+    flag = [0]
+    pi_cnt = [0]
+    for code in CardCode:
+        month.append((code.value - 1) // 4 + 1 if code.value <= 48 else None)
+        flag.append(flags.get(code, 0))
+        pi_cnt.append(pi.get(code, 0))
+    return tuple(month), tuple(flag), tuple(pi_cnt)
+
+# card attribute tables indexed by CardCode.value
+CARD_MONTH, CARD_FLAGS, CARD_PI_CNT = _build_card_tables()
+
+
+# there is exactly one Card instance per CardCode: Card(code) returns the interned instance
 class Card(object):
-    def __init__(self, code:CardCode):
-        if not code in CardCode:
+    __slots__ = ('_code', '_value')
+
+    def __new__(cls, code:CardCode):
+        card = _CARD_BY_CODE.get(code)
+        if card is None:
             raise Exception('Illegal code number')
-        self._code = code
+        return card
 
     @property
     def month(self) -> int:
-        code = self._code.value
-        if code >= 1 and code <= 48:
-            return int((code - 1) / 4) + 1
-        return None
+        return CARD_MONTH[self._value]
 
     @property
     def is_bright(self) -> bool:
-        return  self._code in [CardCode.JanBright, CardCode.MarBright, CardCode.AugBright, CardCode.NovBright, CardCode.DecBright]
+        return CARD_FLAGS[self._value] & FLAG_BRIGHT != 0
 
     @property
     def is_subbright(self) -> bool:
-        return self._code == CardCode.DecBright
+        return CARD_FLAGS[self._value] & FLAG_SUBBRIGHT != 0
 
     @property
     def is_bird(self) -> bool:
-        return self._code in [CardCode.FebBird, CardCode.AprBird, CardCode.AugBird]
+        return CARD_FLAGS[self._value] & FLAG_BIRD != 0
 
     @property
     def is_animal(self) -> bool:
-        return self._code in [CardCode.FebBird, CardCode.AprBird, CardCode.MayBridge, CardCode.JunButterfly, CardCode.JulPig,
-                              CardCode.AugBird, CardCode.SepFlask, CardCode.OctDeer, CardCode.DecBird]
+        return CARD_FLAGS[self._value] & FLAG_ANIMAL != 0
+
     @property
     def is_red_ribbon(self) -> bool:
-        return self._code in [CardCode.FebRedRibbon, CardCode.MarRedRibbon, CardCode.JanRedRibbon]
+        return CARD_FLAGS[self._value] & FLAG_RED_RIBBON != 0
 
     @property
     def is_blue_ribbon(self) -> bool:
-        return self._code in [CardCode.JunBlueRibbon, CardCode.SepBlueRibbon, CardCode.OctBlueRibbon]
+        return CARD_FLAGS[self._value] & FLAG_BLUE_RIBBON != 0
 
     @property
     def is_plain_ribbon(self) -> bool:
-        return self._code in [CardCode.AprRibbon, CardCode.MayRibbon, CardCode.JulRibbon, CardCode.DecRibbon]
+        return CARD_FLAGS[self._value] & FLAG_PLAIN_RIBBON != 0
 
     @property
     def is_ribbon(self) -> bool:
-        return self._code in [CardCode.FebRedRibbon, CardCode.MarRedRibbon, CardCode.JanRedRibbon,
-                              CardCode.JunBlueRibbon, CardCode.SepBlueRibbon, CardCode.OctBlueRibbon,
-                              CardCode.AprRibbon, CardCode.MayRibbon, CardCode.JulRibbon, CardCode.DecRibbon]
+        return CARD_FLAGS[self._value] & FLAG_RIBBON != 0
 
     @property
     def pi_cnt(self) -> int:
-        if self._code in [CardCode.Jan1, CardCode.Jan2, CardCode.Feb1, CardCode.Feb2, CardCode.Mar1, CardCode.Mar2,
-                              CardCode.Apr1, CardCode.Apr2, CardCode.May1, CardCode.May2, CardCode.Jun1, CardCode.Jun2,
-                              CardCode.Jul1, CardCode.Jul2, CardCode.Aug1, CardCode.Aug2, CardCode.Sep1, CardCode.Sep2,
-                              CardCode.Oct1, CardCode.Oct2, CardCode.Nov1, CardCode.Nov2]:
-            return 1
-
-        if self._code in [CardCode.DecDoor, CardCode.NovDouble, CardCode.JokerDouble1, CardCode.JokerDouble2]:
-            return 2
-
-        if self._code == CardCode.JokerTriple: return 3
-        return 0
+        return CARD_PI_CNT[self._value]
 
     @property
     def is_bonus(self) -> bool:
-        return self._code in [CardCode.JokerDouble1, CardCode.JokerDouble2, CardCode.JokerTriple]
+        return CARD_FLAGS[self._value] & FLAG_BONUS != 0
+
+    @property
+    def mask(self) -> 'CardMask':
+        return _CARD_MASKS[self._value]
 
-    def __eq__(self, other:'Card'): return self._code.value == other._code.value
-    def __gt__(self, other:'Card'): return self > other._code.value
-    def __lt__(self, other:'Card'): return self < other._code.value
-    def __hash__(self): return self._code.value
+    def __eq__(self, other:'Card'): return self._value == other._value
+    def __gt__(self, other:'Card'): return self._value > other._value
+    def __lt__(self, other:'Card'): return self._value < other._value
+    def __hash__(self): return self._value
     def __str__(self):
         return '[' + self._code.name + ']'
 
-CardSet = Set[Card]
-def _cardset_to_str(cardset:CardSet):
+    # copies and unpickled cards resolve to the interned instance
+    def __reduce__(self):
+        return (Card, (self._code,))
+
+
+def _intern_cards():
+    cards = [None]
+    for code in CardCode:
+        card = object.__new__(Card)
+        card._code = code
+        card._value = code.value
+        cards.append(card)
+    return cards
+
+# CARDS[code.value] is the interned Card of the code; index 0 is unused
+CARDS = tuple(_intern_cards())
+_CARD_BY_CODE = {c._code: c for c in CARDS[1:]}
+
+
+# a set of cards packed into a 51-bit integer: bit (code.value - 1) stands for the card.
+# masks are immutable, so copying and hashing a player or a board costs nothing.
+class CardMask(int):
+    __slots__ = ()
+
+    def __new__(cls, cards:Union[int, Iterable[Card]]=0):
+        if isinstance(cards, int): return int.__new__(cls, cards)
+        bits = 0
+        for c in cards: #type: Card
+            bits |= 1 << (c._value - 1)
+        return int.__new__(cls, bits)
+
+    def __or__(self, other:int) -> 'CardMask': return int.__new__(CardMask, int.__or__(self, other))
+    def __and__(self, other:int) -> 'CardMask': return int.__new__(CardMask, int.__and__(self, other))
+    def __xor__(self, other:int) -> 'CardMask': return int.__new__(CardMask, int.__xor__(self, other))
+    def __sub__(self, other:int) -> 'CardMask': return int.__new__(CardMask, int.__and__(self, int.__invert__(other)))
+    def __invert__(self) -> 'CardMask': return int.__new__(CardMask, int.__xor__(self, _ALL_BITS))
+    __ror__ = __or__
+    __rand__ = __and__
+    __rxor__ = __xor__
+
+    def __contains__(self, card:Card) -> bool:
+        return (int(self) >> (card._value - 1)) & 1 == 1
+
+    def __len__(self) -> int:
+        return self.bit_count()
+
+    def __iter__(self) -> Iterator[Card]:
+        bits = int(self)
+        while bits:
+            low = bits & -bits
+            yield CARDS[low.bit_length()]
+            bits ^= low
+
+    def __repr__(self):
+        return 'CardMask(' + hex(self) + ')'
+
+    def first(self) -> Union[Card, None]:
+        if self == 0: return None
+        return CARDS[(self & -self).bit_length()]
+
+    def by_month(self, month:int) -> 'CardMask':
+        if month is None or month < 1 or month > 12: return CardMask()
+        return int.__new__(CardMask, int.__and__(self, MONTH_MASKS[month]))
+
+    # number of cards that belong to the given category mask, e.g. BRIGHT_MASK
+    def count(self, category:int) -> int:
+        return int.__and__(self, category).bit_count()
+
+    # number of cards of every month; index 0 counts the bonus cards.
+    # the four cards of month m are the bits 4 * (m - 1) .. 4 * m - 1, so a count is a table lookup.
+    def month_counts(self) -> List[int]:
+        bits = int(self)
+        return [_NIBBLE_CNT[bits >> 48]] + [_NIBBLE_CNT[(bits >> shift) & 15] for shift in _MONTH_SHIFTS]
+
+    # number of cards of the month; month 0 counts the bonus cards
+    def month_count(self, month:int) -> int:
+        if month == 0: return _NIBBLE_CNT[int(self) >> 48]
+        return _NIBBLE_CNT[(int(self) >> _MONTH_SHIFTS[month - 1]) & 15]
+
+    # months of which all four cards are in the mask
+    def full_months(self) -> List[int]:
+        bits = int(self)
+        return _months_of(bits & (bits >> 1) & (bits >> 2) & (bits >> 3) & _MONTH_LOW_BITS)
+
+    @property
+    def pi_cnt(self) -> int:
+        return (int.__and__(self, PI_MASKS[1]).bit_count()
+                + 2 * int.__and__(self, PI_MASKS[2]).bit_count()
+                + 3 * int.__and__(self, PI_MASKS[3]).bit_count())
+
+
+_NIBBLE_CNT = tuple(bin(i).count('1') for i in range(16))
+_MONTH_SHIFTS = tuple(4 * m for m in range(12))
+_MONTH_LOW_BITS = sum(1 << shift for shift in _MONTH_SHIFTS)
+_MONTH_BITS = _MONTH_LOW_BITS * 15
+
+# the month buckets of a mask are its nibbles, so per-month counts of a whole mask take a few
+# integer ops: the count of month m ends up in the nibble of month m (bonus cards are dropped)
+def _month_nibble_counts(bits:int) -> int:
+    x = int(bits) & _MONTH_BITS
+    x -= (x >> 1) & (_MONTH_LOW_BITS * 5)
+    return (x & (_MONTH_LOW_BITS * 3)) + ((x >> 2) & (_MONTH_LOW_BITS * 3))
+
+# months whose lowest nibble bit is set in low_bits
+def _months_of(low_bits:int) -> List[int]:
+    res = []
+    while low_bits:
+        low = low_bits & -low_bits
+        res.append((low.bit_length() + 3) >> 2)
+        low_bits ^= low
+    return res
+
+# hand cards that can be thrown with shake_or_bomb: three of a month in the hand (shake),
+# or at least two that complete the month with the board (bomb)
+def _shakable_bits(hand:int, board:int) -> int:
+    cnt = _month_nibble_counts(hand)
+    total = cnt + _month_nibble_counts(board)
+    months = ((cnt & (cnt >> 1)) | (((cnt >> 1) | (cnt >> 2)) & (total >> 2))) & _MONTH_LOW_BITS
+    return int(hand) & (months * 15)
+
+def _category_mask(pred:Callable[[Card], bool]) -> CardMask:
+    return CardMask([c for c in CARDS[1:] if pred(c)])
+
+_ALL_BITS = (1 << len(CardCode)) - 1
+ALL_CARDS = CardMask(_ALL_BITS)
+# MONTH_MASKS[0] holds the bonus cards, which do not belong to any month
+MONTH_MASKS = tuple(_category_mask(lambda c, m=m: (c.month or 0) == m) for m in range(13))
+BRIGHT_MASK = _category_mask(lambda c: c.is_bright)
+SUBBRIGHT_MASK = _category_mask(lambda c: c.is_subbright)
+BIRD_MASK = _category_mask(lambda c: c.is_bird)
+ANIMAL_MASK = _category_mask(lambda c: c.is_animal)
+RED_RIBBON_MASK = _category_mask(lambda c: c.is_red_ribbon)
+BLUE_RIBBON_MASK = _category_mask(lambda c: c.is_blue_ribbon)
+PLAIN_RIBBON_MASK = _category_mask(lambda c: c.is_plain_ribbon)
+RIBBON_MASK = _category_mask(lambda c: c.is_ribbon)
+BONUS_MASK = _category_mask(lambda c: c.is_bonus)
+KUKJIN_MASK = CardMask([Card(CardCode.SepFlask)])
+# PI_MASKS[n] holds the cards that count as n pi
+PI_MASKS = tuple(_category_mask(lambda c, n=n: c.pi_cnt == n) for n in range(4))
+_CARD_MASKS = (CardMask(),) + tuple(CardMask([c]) for c in CARDS[1:])
+# the category masks as plain ints, for the hot paths
+(_BRIGHT_BITS, _SUBBRIGHT_BITS, _KUKJIN_BITS, _RIBBON_BITS, _RED_RIBBON_BITS, _BLUE_RIBBON_BITS, _PLAIN_RIBBON_BITS,
+ _ANIMAL_BITS, _BIRD_BITS, _PI1_BITS, _PI2_BITS, _PI3_BITS) = map(int, (
+    BRIGHT_MASK, SUBBRIGHT_MASK, KUKJIN_MASK, RIBBON_MASK, RED_RIBBON_MASK, BLUE_RIBBON_MASK, PLAIN_RIBBON_MASK,
+    ANIMAL_MASK, BIRD_MASK, PI_MASKS[1], PI_MASKS[2], PI_MASKS[3]))
+_PI_BITS = (_PI1_BITS, _PI2_BITS, _PI3_BITS)
+
+
+# the rules of a turn on plain ints, shared by Game._deal() and the playout fast path (playout.py).
+# a card is its index, CardCode.value - 1, and -1 for none; a set of cards is the bits of their indices.
+
+# every other player gives its cheapest pi card to the player turn, cnt times
+def _steal_pi_bits(acquired:List[int], turn:int, cnt:int):
+    for _ in range(cnt):
+        for i, bits in enumerate(acquired):
+            if i == turn: continue
+            for pi_bits in _PI_BITS:
+                pi = bits & pi_bits
+                if pi:
+                    low = pi & -pi
+                    acquired[i] = bits ^ low
+                    acquired[turn] |= low
+                    break
+
+# matches a thrown or flipped card against the board cards of its month; returns the new board,
+# captured cards and steal count. a card with two board cards to choose from is appended to pending,
+# and a bbuck taken back is cleared in bbuck (the player who left the bbuck, indexed by month)
+def _match_bits(card:int, board:int, captured:int, steal:int, pending:List[int],
+                bbuck:List[Union[None, int]]) -> Tuple[int, int, int]:
+    bit = 1 << card
+    same = board & (15 << (card & ~3))
+    # wasted
+    if not same: return board | bit, captured, steal
+    cnt = same.bit_count()
+    # acquired
+    if cnt == 1: return board ^ same, captured | same | bit, steal
+    # choose what to acquire
+    if cnt == 2:
+        pending.append(card)
+        return board, captured, steal
+    # resolve bbuck
+    bbuck[(card >> 2) + 1] = None
+    return board ^ same, captured | same | bit, steal + 1
+
+# what _resolve_throw_bits() made of a turn
+_TURN_MATCH    = 0
+_TURN_JJOCK    = 1
+_TURN_BBUCK    = 2
+_TURN_DDA_DACK = 3
+# the probe counter of each
+_TURN_PROBES = ('deal.match', 'deal.jjock', 'deal.bbuck', 'deal.dda_dack')
+
+# resolves the card thrown by the player turn (-1 for a bomb card or a bomb) and the card flipped from
+# the stock (-1 for none); hand_board are the board cards of the month of card before the throw.
+# returns the new board, captured cards, steal count and the _TURN_* of the turn
+def _resolve_throw_bits(turn:int, card:int, stock_card:int, hand_board:int, board:int, captured:int, steal:int,
+                        pending:List[int], bbuck:List[Union[None, int]]) -> Tuple[int, int, int, int]:
+    if card >= 0 and stock_card >= 0 and (card ^ stock_card) < 4:
+        both = (1 << card) | (1 << stock_card)
+        cnt = hand_board.bit_count()
+        if cnt == 0: return board, captured | both, steal + 1, _TURN_JJOCK
+        if cnt == 1:
+            bbuck[(card >> 2) + 1] = turn
+            return board | both, captured, steal, _TURN_BBUCK
+        return board ^ hand_board, captured | hand_board | both, steal + 1, _TURN_DDA_DACK
+    if card >= 0: board, captured, steal = _match_bits(card, board, captured, steal, pending, bbuck)
+    if stock_card >= 0: board, captured, steal = _match_bits(stock_card, board, captured, steal, pending, bbuck)
+    return board, captured, steal, _TURN_MATCH
+
+
+# zobrist keys: one random 64-bit key per (zone, card). the hash of the cards in a zone is the xor
+# of their keys, so moving a card between zones updates a hash with two xors.
+ZONE_HAND     = 0
+ZONE_ACQUIRED = 1
+ZONE_SHAKED   = 2
+ZONE_BOARD    = 3
+ZONE_CAPTURED = 4
+NUM_ZONES     = 5
+
+def _build_zobrist_tables():
+    rng = random.Random(0x5a0b7157)
+    # _Z_CARD[zone][code.value]
+    card = tuple((0,) + tuple(rng.getrandbits(64) for _ in CardCode) for _ in range(NUM_ZONES))
+    # _Z_BYTES[zone][k][b]: xor of the keys of the cards set in byte b of the k-th byte of a mask
+    by_bytes = []
+    for zone in range(NUM_ZONES):
+        tables = []
+        for k in range(7):
+            table = [0] * 256
+            for b in range(1, 256):
+                low = b & -b
+                value = 8 * k + low.bit_length()
+                table[b] = table[b ^ low] ^ (card[zone][value] if value < len(CARDS) else 0)
+            tables.append(tuple(table))
+        by_bytes.append(tuple(tables))
+    # _Z_STOCK[n][code.value]: the card n-th from the bottom of the stock
+    stock = tuple((0,) + tuple(rng.getrandbits(64) for _ in CardCode) for _ in CardCode)
+    # _Z_BBUCK[month][player + 1]: the player who left the bbuck of the month (0: nobody)
+    bbuck = tuple(tuple(rng.getrandbits(64) for _ in range(4)) for _ in range(13))
+    return card, tuple(by_bytes), stock, bbuck
+
+_Z_CARD, _Z_BYTES, _Z_STOCK, _Z_BBUCK = _build_zobrist_tables()
+
+def _zobrist(cards:int, zone:int) -> int:
+    # most moves touch a single card
+    if not cards & (cards - 1): return _Z_CARD[zone][cards.bit_length()]
+    h = 0
+    tables = _Z_BYTES[zone]
+    k = 0
+    while cards:
+        h ^= tables[k][cards & 255]
+        cards >>= 8
+        k += 1
+    return h
+
+def _rotl64(x:int, n:int) -> int:
+    return ((x << n) | (x >> (64 - n))) & 0xffffffffffffffff if n else x
+
+CardSet = CardMask
+
+
+# scoring tables. the base score is a sum of independent parts, each looked up by its category count;
+# the ribbon part also holds the bonus for five or more ribbons, as red + blue + plain = all ribbons.
+def _build_score_tables():
+    pi = tuple(cnt - 9 if cnt >= 10 else 0 for cnt in range(sum(CARD_PI_CNT) + 3))
+    animal = tuple(cnt - 4 if 5 <= cnt <= 7 else (3 if cnt > 7 else 0) for cnt in range(10))
+    bird = (0, 0, 0, 5)
+    # BRIGHT_SCORE[2 * bright + subbright]
+    bright = []
+    for cnt in range(6):
+        for subbright in range(2):
+            bright.append({3: 2 if subbright else 3, 4: 4, 5: 15}.get(cnt, 0))
+    # RIBBON_SCORE[(red * 4 + blue) * 5 + plain]
+    ribbon = []
+    for red in range(4):
+        for blue in range(4):
+            for plain in range(5):
+                total = red + blue + plain
+                ribbon.append((total - 4 if total >= 5 else 0) + (3 if red == 3 else 0)
+                              + (3 if blue == 3 else 0) + (3 if plain >= 3 else 0))
+    return pi, animal, bird, tuple(bright), tuple(ribbon)
+
+PI_SCORE, ANIMAL_SCORE, BIRD_SCORE, BRIGHT_SCORE, RIBBON_SCORE = _build_score_tables()
+
+# score before the go, mungbak, shake and bomb multipliers.
+# pi_cnt and animal_cnt already count a kukjin used as double pi as such.
+def base_score(bright_cnt:int, subbright:bool, pi_cnt:int, animal_cnt:int, bird_cnt:int,
+               red_ribbon_cnt:int, blue_ribbon_cnt:int, plain_ribbon_cnt:int) -> int:
+    return (PI_SCORE[pi_cnt] + ANIMAL_SCORE[animal_cnt] + BIRD_SCORE[bird_cnt]
+            + BRIGHT_SCORE[2 * bright_cnt + subbright]
+            + RIBBON_SCORE[(red_ribbon_cnt * 4 + blue_ribbon_cnt) * 5 + plain_ribbon_cnt])
+
+# 1 and 2 go add 1 and 2; from 3 go on, every go doubles. mungbak, every shake and every bomb double.
+# only arithmetic, so it works on ints and on numpy arrays alike.
+def amplify(base, go_cnt, shake_cnt, bomb_cnt, mungbak):
+    return (base + go_cnt * (go_cnt <= 2)) << ((go_cnt - 2) * (go_cnt > 2) + mungbak + shake_cnt + bomb_cnt)
+def _cardset_to_str(cardset:Union[CardSet, List[Card]]):
     if len(cardset) == 0: return '-'
     res = ' '.join([str(c) for c in cardset])
     return res
 
 
 class Player(object):
+    # when set, score() cross-checks the running category counters against a full recount
+    debug_score = False
+
     def __init__(self):
-        self._hand = set()
-        self._acquired = set()
-        self._shaked = set()
+        self._reset()
+
+    def _reset(self):
+        self._hand = CardMask()
+        self._acquired = CardMask()
+        self._shaked = CardMask()
+        # zobrist hash of _hand, _acquired and _shaked
+        self._zhash = 0
+
+        # running category counters of _acquired, maintained by _get() and _set_acquired()
+        self._bright_cnt = 0
+        self._subbright_cnt = 0
+        self._kukjin_cnt = 0
+        self._pi_cnt = 0
+        self._ribbon_cnt = 0
+        self._red_ribbon_cnt = 0
+        self._blue_ribbon_cnt = 0
+        self._plain_ribbon_cnt = 0
+        self._animal_cnt = 0
+        self._bird_cnt = 0
+
         self._go_cnt = 0
         self._shake_cnt = 0
         self._bomb_cnt = 0
@@ -186,119 +548,51 @@ class Player(object):
         return res
 
     def shakable_months(self) -> List[int]:
-        cnt = dict()
-        for c in self._hand: #type:Card
-            m = c.month
-            cnt[m] = cnt.get(m, 0) + 1
-
-        res = []
-        for k in cnt.keys():
-            if cnt[k] == 3: res.append(m)
-        return res
+        # a count is at most 4, so bits 0 and 1 of a nibble are both set for 3 only
+        cnt = _month_nibble_counts(self._hand)
+        return _months_of(cnt & (cnt >> 1) & _MONTH_LOW_BITS)
 
     def can_say_go(self) -> bool:
         cur_score = self.score(amplifier=False)
         return cur_score > self._latest_go_score and cur_score > 0
 
     def president_months(self) -> List[int]:
-        cnt = dict()
-        for c in self._hand: #type:Card
-            m = c.month
-            cnt[m] = cnt.get(m, 0) + 1
-
-        res = []
-        for k in cnt.keys():
-            if cnt[k] == 4: res.append(m)
-        return res
+        return self._hand.full_months()
 
     def score(self, amplifier = True) -> int:
         if self._president_cnt > 0: return 7
-        bright_cnt = 0
-        pi_cnt = 0
-        subbright = False
-        has_kukjin = False
-
-        ribbon_cnt = 0
-        red_ribbon_cnt = 0
-        blue_ribbon_cnt = 0
-        plain_ribbon_cnt = 0
-
-        animal_cnt = 0
-        bird_cnt = 0
-
-        for c in self._acquired: #type: Card
-            subbright        |= c.is_subbright
-            has_kukjin       |= (c._code == CardCode.SepFlask)
-            pi_cnt           += c.pi_cnt
-            red_ribbon_cnt   += 1 if c.is_red_ribbon else 0
-            blue_ribbon_cnt  += 1 if c.is_blue_ribbon else 0
-            plain_ribbon_cnt += 1 if c.is_plain_ribbon else 0
-            ribbon_cnt       += 1 if c.is_ribbon else 0
-            animal_cnt       += 1 if c.is_animal else 0
-            bird_cnt         += 1 if c.is_bird else 0
-            bright_cnt       += 1 if c.is_bright else 0
-            pi_cnt           += c.pi_cnt
-
-        res = 0
-
-        if self._kukjin_as_doublepi and has_kukjin:
+        if Player.debug_score: self._check_counters()
+
+        pi_cnt = self._pi_cnt
+        animal_cnt = self._animal_cnt
+        if self._kukjin_as_doublepi and self._kukjin_cnt > 0:
             pi_cnt += 2
             animal_cnt -= 1
 
-        if pi_cnt >= 10: res += pi_cnt - 9
-        if animal_cnt >= 5 and animal_cnt <= 7: res += animal_cnt - 4
-        elif animal_cnt > 7: res += 3
-        if bird_cnt == 3: res += 5
-        if ribbon_cnt >= 5: res += ribbon_cnt - 4
-
-        if bright_cnt == 3 and subbright: res += 2
-        elif bright_cnt == 3 and not subbright: res += 3
-        elif bright_cnt == 4: res += 4
-        elif bright_cnt == 5: res += 15
-
-        if red_ribbon_cnt == 3: res += 3
-        if blue_ribbon_cnt == 3: res += 3
-        if plain_ribbon_cnt >= 3: res += 3
-
+        res = base_score(self._bright_cnt, self._subbright_cnt > 0, pi_cnt, animal_cnt, self._bird_cnt,
+                         self._red_ribbon_cnt, self._blue_ribbon_cnt, self._plain_ribbon_cnt)
         if amplifier:
-            if self._go_cnt == 1: res += 1
-            elif self._go_cnt == 2: res += 2
-            elif self._go_cnt > 0: res = res * (2 ** (self._go_cnt - 2))
-
-            if animal_cnt >= 7: res *= 2 # mungbak
-
-            if self._shake_cnt > 0: res = res * (2 ** self._shake_cnt)
-            if self._bomb_cnt > 0: res = res * (2 ** self._bomb_cnt)
-
+            res = amplify(res, self._go_cnt, self._shake_cnt, self._bomb_cnt, animal_cnt >= 7)
         return res
 
 
-    def by_month(self, set_name:str, month:int) -> Set[Card]:
-        res = set()
+    def by_month(self, set_name:str, month:int) -> CardMask:
         if   set_name == 'hand': used_set = self._hand
         elif set_name == 'acquired': used_set = self._acquired
         elif set_name == 'shaked': used_set = self._shaked
 
-        for c in used_set: #type: Card
-            if c.month == month: res.add(c)
-
-        return res
+        return used_set.by_month(month)
 
 
     @property
     def pibakable(self) -> bool:
-        cnt = 0
-        for c in list(self._acquired): #type: Card
-            cnt += c.pi_cnt
+        cnt = self._pi_cnt
         if cnt == 0 or cnt > 5: return False
         return True
 
     @property
     def gwangbakable(self) -> bool:
-        cnt = 0
-        for c in list(self._acquired): #type: Card
-            cnt += 1 if c.is_bright else 0
-        return cnt == 0
+        return self._bright_cnt == 0
 
     @property
     def bomb_cnt(self) -> int:
@@ -311,22 +605,12 @@ class Player(object):
             return True
         return False
 
-    def _remove_pi(self) -> Union[Card, None]:
-        pi = None
-        pi_cnt = 0
-        for c in self._acquired: #type: Card
-            if pi_cnt == 0 or c.pi_cnt < pi_cnt:
-                pi = c
-                pi_cnt = c.pi_cnt
-        if pi_cnt > 0: self._acquired.remove(pi)
-        return pi
-
     def _shake(self, c:Card) -> bool:
-        m = c.month
-        shakables = self.shakable_months()
-        if m in shakables:
-            for cc in self._hand: #type: Card
-                if cc.month == m: self._shaked.insert(cc)
+        # a declined president shakes all four cards of the month
+        hand_same = self._hand.by_month(c.month)
+        if len(hand_same) >= 3:
+            self._zhash ^= _zobrist(hand_same - self._shaked, ZONE_SHAKED)
+            self._shaked |= hand_same
             return True
         return False
 
@@ -337,22 +621,87 @@ class Player(object):
         return True
 
     def _throw(self, c:Union[None, Card]) -> bool:
-        if c._code is None:
+        if c is None:
             if self._bomb_card_cnt > 0:
                 self._bomb_card_cnt -= 1
                 return True
             return False
         else:
             if not c in self._hand: return False
-            self._hand.remove(c)
-            if c in self._shaked: self._shaked.remove(c)
+            self._hand -= c.mask
+            self._zhash ^= _Z_CARD[ZONE_HAND][c._value]
+            if c in self._shaked:
+                self._shaked -= c.mask
+                self._zhash ^= _Z_CARD[ZONE_SHAKED][c._value]
             return True
 
     def _acquire_bomb(self, bomb_cnt):
         self._bomb_card_cnt += bomb_cnt
 
-    def _get(self, cards:Set[Card]):
-        self._acquired.update(cards)
+    def _clone(self) -> 'Player':
+        player = object.__new__(Player)
+        player.__dict__.update(self.__dict__)
+        return player
+
+    def _deal(self, cards:CardMask):
+        self._hand |= cards
+        self._zhash ^= _zobrist(cards, ZONE_HAND)
+
+    def _set_hand(self, cards:CardMask):
+        self._zhash ^= _zobrist(self._hand ^ cards, ZONE_HAND)
+        self._hand = cards
+
+    def _set_acquired(self, cards:CardMask):
+        old = int(self._acquired)
+        bits = int(cards)
+        self._update_counters(old & ~bits, -1)
+        self._update_counters(bits & ~old, 1)
+        self._zhash ^= _zobrist(old ^ bits, ZONE_ACQUIRED)
+        self._acquired = CardMask(bits)
+
+    def _set_shaked(self, cards:CardMask):
+        self._zhash ^= _zobrist(self._shaked ^ cards, ZONE_SHAKED)
+        self._shaked = CardMask(cards)
+
+    def _get(self, cards:CardMask):
+        cards -= self._acquired
+        self._acquired |= cards
+        self._zhash ^= _zobrist(cards, ZONE_ACQUIRED)
+        self._update_counters(cards, 1)
+
+    # on plain ints: this runs for every card a player gets
+    def _update_counters(self, cards:CardMask, sign:int):
+        bits = int(cards)
+        if not bits: return
+        self._bright_cnt       += sign * (bits & _BRIGHT_BITS).bit_count()
+        self._subbright_cnt    += sign * (bits & _SUBBRIGHT_BITS).bit_count()
+        self._kukjin_cnt       += sign * (bits & _KUKJIN_BITS).bit_count()
+        self._pi_cnt           += sign * ((bits & _PI1_BITS).bit_count() + 2 * (bits & _PI2_BITS).bit_count()
+                                          + 3 * (bits & _PI3_BITS).bit_count())
+        self._ribbon_cnt       += sign * (bits & _RIBBON_BITS).bit_count()
+        self._red_ribbon_cnt   += sign * (bits & _RED_RIBBON_BITS).bit_count()
+        self._blue_ribbon_cnt  += sign * (bits & _BLUE_RIBBON_BITS).bit_count()
+        self._plain_ribbon_cnt += sign * (bits & _PLAIN_RIBBON_BITS).bit_count()
+        self._animal_cnt       += sign * (bits & _ANIMAL_BITS).bit_count()
+        self._bird_cnt         += sign * (bits & _BIRD_BITS).bit_count()
+
+    def _counters(self) -> tuple:
+        return (self._bright_cnt, self._subbright_cnt, self._kukjin_cnt, self._pi_cnt,
+                self._ribbon_cnt, self._red_ribbon_cnt, self._blue_ribbon_cnt, self._plain_ribbon_cnt,
+                self._animal_cnt, self._bird_cnt)
+
+    def _check_counters(self):
+        acquired = self._acquired
+        recount = (acquired.count(BRIGHT_MASK), acquired.count(SUBBRIGHT_MASK), acquired.count(KUKJIN_MASK),
+                   acquired.pi_cnt, acquired.count(RIBBON_MASK), acquired.count(RED_RIBBON_MASK),
+                   acquired.count(BLUE_RIBBON_MASK), acquired.count(PLAIN_RIBBON_MASK),
+                   acquired.count(ANIMAL_MASK), acquired.count(BIRD_MASK))
+        assert self._counters() == recount, 'score counters {0} != recount {1}'.format(self._counters(), recount)
+
+    def _check_zhash(self):
+        zhash = (_zobrist(self._hand, ZONE_HAND) ^ _zobrist(self._acquired, ZONE_ACQUIRED)
+                 ^ _zobrist(self._shaked, ZONE_SHAKED))
+        assert self._zhash == zhash, 'zobrist hash {0:x} != recount {1:x}'.format(self._zhash, zhash)
 
 
 class GameState(Enum):
@@ -365,62 +714,150 @@ class GameState(Enum):
     AskCardToCapture = 5
     AnsweredCardToCapture = 6
 
+    AskGo = 7
+    AnsweredGo = 8
+
     Draw = 254
     Done = 255
 
+# canonical action codes; a card is addressed by its index, CardCode.value - 1
+ACTION_BOMB_CARD = 0                  # throw a bomb card
+ACTION_THROW     = 1                  # ACTION_THROW + index: throw a hand card
+ACTION_SHAKE     = ACTION_THROW + 51  # ACTION_SHAKE + index: throw a hand card with shake_or_bomb
+ACTION_STOP      = ACTION_SHAKE + 51  # answer 'go' with False
+ACTION_GO        = ACTION_STOP + 1    # answer 'go' with True
+ACTION_CAPTURE   = ACTION_GO + 1      # ACTION_CAPTURE + index: choose a board card to capture
+NUM_ACTIONS      = ACTION_CAPTURE + 51
+
+# appends the action codes base + index of the cards in the mask, in ascending order
+def _append_actions(res:List[int], cards:int, base:int) -> List[int]:
+    bits = int(cards)
+    base -= 1
+    while bits:
+        low = bits & -bits
+        res.append(base + low.bit_length())
+        bits ^= low
+    return res
+
 class Board(object):
     _cards = None
     _bbuck_player = None
 
-    def __init__(self, cards: List[Card]):
-        self._cards = dict()
-        self._bbuck_player = dict()
-
-        for i in range(1, 13):
-            self._cards[i] = set()
-            self._bbuck_player[i] = None
-
-        for card in cards:
-            month = card.month
-            if not (1 <= month and month <= 12) : continue
-            self._cards[card.month].add(card)
-            
-    def by_month(self, month:int) -> Set[Card]:
-        if month < 1 or month > 12: return set()
-        return self._cards[month]
-
-    def as_set(self) -> Set[Card]:
-        res = set()
-        for key in self._cards.keys():
-            res.update(self._cards[key])
-        return res
+    def __init__(self, cards: Iterable[Card]):
+        self._reset(cards)
+
+    def _reset(self, cards: Iterable[Card]):
+        # indexed by month; index 0 is unused
+        self._bbuck_player = (None,) * 13
+
+        # bonus cards do not belong to any month, so they never stay on the board
+        self._cards = CardMask(cards) - BONUS_MASK
+        # zobrist hash of _cards and _bbuck_player
+        self._zhash = _zobrist(self._cards, ZONE_BOARD)
+
+    def by_month(self, month:int) -> CardMask:
+        return self._cards.by_month(month)
+
+    def as_set(self) -> CardMask:
+        return self._cards
 
     def count(self) -> int:
-        res = 0
-        for key in self._cards.keys():
-            res += len(self._cards[key])
-        return res
+        return len(self._cards)
+
+    def _put(self, cards:CardMask):
+        self._zhash ^= _zobrist(cards - self._cards, ZONE_BOARD)
+        self._cards |= cards
+
+    def _take(self, cards:CardMask):
+        self._zhash ^= _zobrist(cards & self._cards, ZONE_BOARD)
+        self._cards -= cards
 
     def whose_bbuck(self, month:int) -> Union[None, int]:
-        if not month in self._bbuck_player: return None
+        if month is None or month < 1 or month > 12: return None
         return self._bbuck_player[month]
 
     def _set_bbuck(self, player_idx:Union[None, int], month:int) -> bool:
         if month < 1 or month > 12: return False
-        self._bbuck_player[month] = player_idx
+        bbuck_player = list(self._bbuck_player)
+        old = bbuck_player[month]
+        self._zhash ^= (_Z_BBUCK[month][0 if old is None else old + 1]
+                        ^ _Z_BBUCK[month][0 if player_idx is None else player_idx + 1])
+        bbuck_player[month] = player_idx
+        self._bbuck_player = tuple(bbuck_player)
         return True
 
+    def _check_zhash(self):
+        zhash = _zobrist(self._cards, ZONE_BOARD)
+        for month, player_idx in enumerate(self._bbuck_player):
+            if player_idx is not None: zhash ^= _Z_BBUCK[month][0] ^ _Z_BBUCK[month][player_idx + 1]
+        assert self._zhash == zhash, 'zobrist hash {0:x} != recount {1:x}'.format(self._zhash, zhash)
+
+    def _clone(self) -> 'Board':
+        board = object.__new__(Board)
+        board.__dict__.update(self.__dict__)
+        return board
+
+
+# deal seeds: a game dealt from a seed can be re-dealt from that seed alone.
+# game_seed(run, k) is the seed of the k-th game of run, so any game of a run is re-dealt in O(1).
+_SEED_MASK = (1 << 64) - 1
+
+def _splitmix64(x:int) -> int:
+    x = (x + 0x9e3779b97f4a7c15) & _SEED_MASK
+    x = ((x ^ (x >> 30)) * 0xbf58476d1ce4e5b9) & _SEED_MASK
+    x = ((x ^ (x >> 27)) * 0x94d049bb133111eb) & _SEED_MASK
+    return x ^ (x >> 31)
+
+def game_seed(run:int, index:int) -> int:
+    return _splitmix64(_splitmix64(run & _SEED_MASK) ^ (index & _SEED_MASK))
+
+def new_seed() -> int:
+    # from the OS, so the global random state is left alone
+    return int.from_bytes(os.urandom(8), 'little')
+
+# the deck a game with num_players players is dealt from seed. it is shuffled again while the board
+# would get the four cards of a month, so a deck from this function is always dealt as is.
+def deck_from_seed(seed:int, num_players:int=2) -> Tuple[Card, ...]:
+    rnd = random.Random(seed).random
+    # a permutation of the card values, sorted by fresh random keys on every (re)deal
+    perm = list(range(1, len(CARDS)))
+    start = _NUM_HAND[num_players] * num_players
+    end = start + _NUM_BOARD[num_players]
+    while True:
+        keys = [rnd() for _ in range(len(CARDS))]
+        perm.sort(key=keys.__getitem__)
+        board = 0
+        for v in perm[start:end]:
+            board |= 1 << (v - 1)
+        if board & (board >> 1) & (board >> 2) & (board >> 3) & _MONTH_LOW_BITS == 0:
+            return tuple(map(CARDS.__getitem__, perm))
+
+# hand and board sizes by the number of players
+_NUM_HAND = {2: 10, 3: 7}
+_NUM_BOARD = {2: 8, 3: 6}
+
 
 class Game(object):
     _round_cnt = 0
     _players = None
-    _stock = None
     _board = None
     _state = None
     _round = None
     _turn = None
     _answer = None
     _winner = None
+    _captured = None
+    _steal_cnt = 0
+    _pending = None
+    _undo = None
+    # the deck is dealt in regions: the hands, the board, then the stock from _stock_pos on
+    _deck = None
+    _stock_pos = 0
+    # cards every player has seen: the board as dealt, and every card thrown, flipped or shaked since.
+    # a card never hides again, so it is only ever added to
+    _public = 0
+    _seed = None
+    _stock_zhash = 0
 
     @property
     def num_player(self):
@@ -431,76 +868,139 @@ class Game(object):
         if self.num_player == 2: return 7
         elif self.num_player == 3: return 3
 
-    def __init__(self, num_players:int=2):
+    # deck: cards in dealing order (hands, board, then the stock). a given deck is dealt as is.
+    # seed: the deck is deck_from_seed(seed). without deck and seed, a new seed is drawn from the OS.
+    def __init__(self, num_players:int=2, deck:Union[None, Sequence[Card]]=None, seed:Union[None, int]=None):
+        if not num_players in [2, 3]: raise NotImplemented
+        self._players = [Player() for _ in range(num_players)]
+        self._board = Board([])
+        self._undo = []
+        self.reset(deck, seed)
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    def _stock_zobrist(self) -> int:
+        h = 0
+        deck = self._deck
+        n = len(deck)
+        for i in range(self._stock_pos, n):
+            h ^= _Z_STOCK[n - 1 - i][deck[i]._value]
+        return h
+
+    # replaces the stock; the cards out of the stock are put before it in code order, so the deck
+    # stays a permutation but no longer tells the deal
+    def _set_stock(self, cards:Sequence[Card]):
+        stock = CardMask(cards)
+        self._deck = tuple(ALL_CARDS - stock) + tuple(cards)
+        self._stock_pos = len(CardCode) - len(cards)
+        self._stock_zhash = self._stock_zobrist()
+
+    # hand cards that can be thrown with shake_or_bomb, see _shakable_bits()
+    def _shakable(self, player:Player) -> CardMask:
+        return CardMask(_shakable_bits(player._hand, self._board._cards))
+
+    def _check_zhash(self):
+        for p in self._players:
+            p._check_zhash()
+        self._board._check_zhash()
+        assert self._stock_zhash == self._stock_zobrist(), 'stock zobrist hash mismatch'
+
+    # starts a new game with the same players and board objects.
+    # without deck and seed, the next seed follows from the seed of the last game (if any),
+    # so the games of a seeded Game are reproducible and a clone deals the same games as its origin.
+    def reset(self, deck:Union[None, Sequence[Card]]=None, seed:Union[None, int]=None):
+        if deck is None:
+            if seed is None:
+                seed = new_seed() if self._seed is None else _splitmix64(self._seed)
+            deck = deck_from_seed(seed, self.num_player)
+        else:
+            if len(deck) != len(CardCode) or len(CardMask(deck)) != len(CardCode):
+                raise Exception('Illegal deck')
+            seed = None
+        self._seed = seed
+
         self._state = GameState.Initialized
         self._turn = 0
         self._answer = None
-
-        if num_players == 2:
-            num_hand = 10
-            num_board = 8
-        elif num_players == 3:
-            num_hand = 7
-            num_board = 6
-        else: raise NotImplemented
-
-        need_init = True
+        self._winner = None
+        self._captured = CardMask()
+        self._steal_cnt = 0
+        self._pending = ()
+        del self._undo[:]
+
+        num_hand = _NUM_HAND[self.num_player]
+        num_board = _NUM_BOARD[self.num_player]
         self._round_cnt = 0
 
-        while need_init:
-            need_init = False
-            self._players = list()
-            self._stock = list()
-            self._board = None
-
-            for _ in range(num_players):
-                self._players.append(Player())
-
-            for i in CardCode:
-                self._stock.append(Card(i))
-
-            # dealing cards
-            random.shuffle(self._stock)
-            for i in range(self.num_player):
-                hand, self._stock = self._stock[:num_hand], self._stock[num_hand:]
-                self._players[i]._hand.update(hand)
-
-            board, self._stock = self._stock[:num_board], self._stock[num_board:]
-            self._board.update(board)
+        for p in self._players: #type: Player
+            p._reset()
 
-            # the 1st player get the bonus cards on the board 
-            for c in self._board: #type: Card
-                if c.is_bonus: self._players[0]._acquired.add(c)
-            self._board = Board(set([c for c in self._board if not c.is_bonus]))
+        deck = self._deck = tuple(deck)
 
+        # dealing cards
+        for i, p in enumerate(self._players):
+            p._deal(CardMask(deck[i * num_hand:(i + 1) * num_hand]))
 
-            # if 'president' occured on the board, we re-initialize the whole game.
-            cnt = dict()
-            for c in self._board.as_set(): #type:Card
-                m = c.month
-                cnt[m] = cnt.get(m, 0) + 1
+        start = self.num_player * num_hand
+        board = deck[start:start + num_board]
+        self._stock_pos = start + num_board
+        self._stock_zhash = self._stock_zobrist()
+        self._public = CardMask(board)
 
-            res = []
-            for k in cnt.keys():
-                if cnt[k] == 4:
-                    need_init = True
-                    break
+        # the 1st player get the bonus cards on the board 
+        self._players[0]._get(CardMask(board) & BONUS_MASK)
+        self._board._reset(board)
 
         self._deal()
         return
 
+    # the mutable state of a game is held in immutable values (card masks, counters, tuples),
+    # so a snapshot is a shallow copy of the attributes of the game, its players and its board.
+    # a snapshot can only be restored into the game it was taken from.
+    def snapshot(self) -> tuple:
+        return (self.__dict__.copy(), [p.__dict__.copy() for p in self._players], self._board.__dict__.copy())
+
+    def restore(self, snapshot:tuple):
+        game, players, board = snapshot
+        self.__dict__.update(game)
+        for p, state in zip(self._players, players):
+            p.__dict__.update(state)
+        self._board.__dict__.update(board)
+
+    # an independent copy sharing the interned cards, with an empty undo log
+    def clone(self) -> 'Game':
+        game = object.__new__(Game)
+        game.__dict__.update(self.__dict__)
+        game._players = [p._clone() for p in self._players]
+        game._board = self._board._clone()
+        game._undo = []
+        return game
+
+    # same as action(), but the action can be rolled back with undo()
+    def do(self, ans:dict) -> bool:
+        self._undo.append(self.snapshot())
+        if self.action(ans): return True
+        self.restore(self._undo.pop())
+        return False
+
+    def undo(self) -> bool:
+        if len(self._undo) == 0: return False
+        self.restore(self._undo.pop())
+        return True
+
     def winner(self):
         if self._state != GameState.Done: return None
         if self._state == GameState.Draw: return None
         return self._winner
 
     def _deal(self):
-        cur_player = self.turn_player()
+        cur_player = self.turn_player
 
         if self._state in [GameState.Initialized, GameState.AnsweredPresident]:
+            if self._state == GameState.AnsweredPresident: self._turn += 1
             while self._turn < len(self._players):
-                months = cur_player.president_months()
+                months = self._players[self._turn].president_months()
                 if len(months) > 0:
+                    if _probe is not None: _probe.count('deal.president')
                     self._state = GameState.AskPresident
                     return
                 self._turn += 1
@@ -511,98 +1011,285 @@ class Game(object):
         
         elif self._state == GameState.AnsweredCardToThrow:
             hand_card = self._answer['card']
-            shake = self._answer['shake_or_bomb']
-
-            throw_res = cur_player._throw(hand_card)
-            assert(throw_res)
-
-            if hand_card.is_special: 
-                cur_player._get(set([hand_card]))
-                for p in self._players:
-                    res = p._remove_pi()
-                    if res is not None:
-                        cur_player._get(set([res]))
-                self._state = GameState.AskCardToThrow
+            shake = self._answer['shake_or_bomb'] and hand_card is not None
+
+            if hand_card is not None and hand_card.is_bonus:
+                if _probe is not None: _probe.count('deal.bonus')
+                throw_res = cur_player._throw(hand_card)
+                assert(throw_res)
+                self._public |= hand_card.mask
+                cur_player._get(hand_card.mask)
+                self._steal_pi(1)
+                # the player draws a card from the stock in its place, so every hand runs out on the same round
+                deck = self._deck
+                if self._stock_pos < len(deck):
+                    c = deck[self._stock_pos]
+                    self._stock_zhash ^= _Z_STOCK[len(deck) - 1 - self._stock_pos][c._value]
+                    self._stock_pos += 1
+                    cur_player._deal(c.mask)
+                # and throws again, unless the bonus card was the last one
+                if len(cur_player._hand) == 0 and cur_player._bomb_card_cnt == 0:
+                    self._resolve_turn()
+                else:
+                    self._state = GameState.AskCardToThrow
                 return
 
-            if len(self._stock) == 0:
-                self._state = GameState.Done
-                return 
-
-            stock_cards = []
-            while True:
-                stock_card = self._stock.pop(0)
-                stock_cards.append(stock_card)
-                if not stock_card.is_bonus: break
-            
-            hand_month = None
-            stock_month = None
-            if not hand_card is None: hand_month = hand_card.month
-            for stock_card in stock_cards:
-                stock_month = stock_card.month
-                if 1 <= stock_card_month and stock_card_month <= 12: break
-
-            hand_cnt = 0 if hand_month is None else len(self._board.by_month(hand_month))
-            stock_cnt = 0 if stock_month is None else len(self._board.by_month(stock_month))
-
-            gather_pi_from_others = 0
-
-            if hand_month is None:
-                #used a bomb card
-                if   stock_cnt == 0:
-                    pass # wasted
-                elif stock_cnt == 1:
-                    pass # acquired
-                elif stock_cnt == 2:
-                    pass # choose what to acquire
-                elif stock_cnt == 3:
-                    pass # resolve bbuck
-            else:
-                #used a normal card
-                if shake:
-                    if hand_cnt == 0:
-                        pass # shaked
-                    else:
-                        pass # bomb
+            hand_month = None if hand_card is None else hand_card.month
+            hand_board = self._board.by_month(hand_month)
+
+            bomb = False
+            if shake:
+                if len(hand_board) == 0:
+                    # shaked
+                    if _probe is not None: _probe.count('deal.shake')
+                    cur_player._shake(hand_card)
+                    cur_player._shake_cnt += 1
+                    self._public |= cur_player._shaked
                 else:
-                    if hand_month == stock_month:
-                        if hand_cnt == 0:
-                            pass # jjock
-                        elif hand_cnt == 1:
-                            pass # bbuck
-                        elif hand_cnt == 2:
-                            pass # dda dack
-                    else:
-                        # TODO: what do we have to do when hand_cnt == 2 and stock_cnt == 2?
-                        if   hand_cnt == 0:
-                            pass # wasted
-                        elif hand_cnt == 1:
-                            pass # acquired
-                        elif hand_cnt == 2:
-                            pass # choose what to acquire
-                        elif hand_cnt == 3:
-                            pass # resolve bbuck
-
-                        if   stock_cnt == 0:
-                            pass # wasted
-                        elif stock_cnt == 1:
-                            pass # acquired
-                        elif stock_cnt == 2:
-                            pass # choose what to acquire
-                        elif stock_cnt == 3:
-                            pass # resolve bbuck
+                    # bomb: throw every card of the month and take the board cards
+                    if _probe is not None: _probe.count('deal.bomb')
+                    bomb = True
+                    hand_same = cur_player._hand.by_month(hand_month)
+                    for c in hand_same: #type: Card
+                        cur_player._throw(c)
+                    self._public |= hand_same
+                    cur_player._acquire_bomb(len(hand_same) - 1)
+                    cur_player._bomb_cnt += 1
+                    self._board._take(hand_board)
+                    self._captured |= hand_same | hand_board
+                    self._steal_cnt += 1
+                    hand_month = None
+
+            if not bomb:
+                throw_res = cur_player._throw(hand_card)
+                assert(throw_res)
+                if hand_card is not None: self._public |= hand_card.mask
+
+            # flip the stock; bonus cards go straight to the player
+            stock_card = None
+            deck = self._deck
+            while self._stock_pos < len(deck):
+                c = deck[self._stock_pos]
+                self._stock_zhash ^= _Z_STOCK[len(deck) - 1 - self._stock_pos][c._value]
+                self._stock_pos += 1
+                self._public |= c.mask
+                if c.is_bonus:
+                    if _probe is not None: _probe.count('deal.stock_bonus')
+                    self._captured |= c.mask
+                    continue
+                stock_card = c
+                break
+            stock_month = None if stock_card is None else stock_card.month
+
+            # jjock, bbuck, dda dack or the matches of both cards, on plain ints
+            card = -1 if hand_month is None else hand_card._value - 1
+            stock_idx = -1 if stock_card is None else stock_card._value - 1
+            old_board = int(self._board._cards)
+            bbuck = list(self._board._bbuck_player)
+            pending = []
+            board, captured, self._steal_cnt, event = _resolve_throw_bits(
+                self._turn, card, stock_idx, int(hand_board), old_board, int(self._captured), self._steal_cnt,
+                pending, bbuck)
+            if _probe is not None: _probe.count(_TURN_PROBES[event])
+            self._board._take(CardMask(old_board & ~board))
+            self._board._put(CardMask(board & ~old_board))
+            for month in (hand_month, stock_month):
+                if month is not None and bbuck[month] != self._board._bbuck_player[month]:
+                    self._board._set_bbuck(bbuck[month], month)
+            if event == _TURN_BBUCK: cur_player._bbuck_cnt += 1
+            self._captured = CardMask(captured)
+            if pending: self._pending += tuple(CARDS[c + 1] for c in pending)
+
+            self._resolve_turn()
+            return
+
+        elif self._state == GameState.AnsweredCardToCapture:
+            if _probe is not None: _probe.count('deal.capture')
+            card = self._pending[0]
+            self._pending = self._pending[1:]
+            chosen = self._answer['card']
+            self._board._take(chosen.mask)
+            self._captured |= card.mask | chosen.mask
+            self._resolve_turn()
+            return
+
+        elif self._state == GameState.AnsweredGo:
+            if _probe is not None: _probe.count('deal.go' if self._answer['go'] else 'deal.stop')
+            if not self._answer['go']:
+                self._state = GameState.Done
+                self._winner = self._turn
+                return
+            cur_player._claim_go()
+            self._next_turn()
+            return
+
+    def _resolve_turn(self):
+        if len(self._pending) > 0:
+            self._state = GameState.AskCardToCapture
+            return
+
+        cur_player = self.turn_player
+        # sweeping the board takes a pi from the others as well
+        if self._board.count() == 0 and self._captured: self._steal_cnt += 1
+        cur_player._get(self._captured)
+        self._captured = CardMask()
+        self._steal_pi(self._steal_cnt)
+        self._steal_cnt = 0
+
+        # can_say_go(), without scoring twice
+        score = cur_player.score(amplifier=False)
+        if score >= self.goable_score and score > cur_player._latest_go_score and score > 0:
+            self._state = GameState.AskGo
+            return
+        self._next_turn()
+
+    def _steal_pi(self, cnt:int):
+        if cnt == 0: return
+        acquired = [int(p._acquired) for p in self._players]
+        _steal_pi_bits(acquired, self._turn, cnt)
+        for p, bits in zip(self._players, acquired): #type: Player, int
+            if bits != p._acquired: p._set_acquired(bits)
+
+    def _next_turn(self):
+        self._turn = (self._turn + 1) % len(self._players)
+        p = self.turn_player
+        if len(p._hand) == 0 and p._bomb_card_cnt == 0:
+            # nobody stopped before the cards ran out
+            self._state = GameState.Done
+            return
+        self._state = GameState.AskCardToThrow
+
+
+    @property
+    def deck(self) -> Tuple[Card, ...]:
+        return self._deck
+
+    # the cards left in the stock, the next one first
+    @property
+    def stock(self) -> Tuple[Card, ...]:
+        return self._deck[self._stock_pos:]
+
+    @property
+    def stock_size(self) -> int:
+        return len(self._deck) - self._stock_pos
+
+    # the card flipped after the next idx flips, or None past the end of the stock
+    def peek_stock(self, idx:int=0) -> Union[None, Card]:
+        pos = self._stock_pos + idx
+        if idx < 0 or pos >= len(self._deck): return None
+        return self._deck[pos]
+
+    # seed of the current deal, or None when the deck was given
+    @property
+    def seed(self) -> Union[None, int]:
+        return self._seed
+
+    # 64-bit zobrist hash of the state: the cards of every zone (with the stock in order), bbucks, the cards
+    # of an unfinished turn, the turn, the state and the counters of the players.
+    # the card part is kept up to date by every move; the rest is hashed when asked.
+    @property
+    def zhash(self) -> int:
+        h = self._board._zhash ^ self._stock_zhash
+        if self._captured: h ^= _zobrist(self._captured, ZONE_CAPTURED)
+        for i, p in enumerate(self._players): #type: Player
+            h ^= _rotl64(p._zhash, 13 * i)
+        return h ^ self._scalar_zhash(self._pending)
+
+    # hash of everything but the card zones; the cards of an unfinished turn are given, in order
+    def _scalar_zhash(self, pending:Sequence[Card]) -> int:
+        counters = tuple((p._go_cnt, p._shake_cnt, p._bomb_cnt, p._bomb_card_cnt, p._bbuck_cnt,
+                          p._consec_bbuck_cnt, p._latest_go_score, p._president_cnt, p._kukjin_as_doublepi)
+                         for p in self._players)
+        scalars = (self._turn, self._state.value, -1 if self._winner is None else self._winner, self._steal_cnt,
+                   tuple(c._value for c in pending), counters)
+        return _splitmix64(hash(scalars) & _SEED_MASK)
+
+    # canonical action code (see ACTION_*) of an answer to the current request
+    def answer_to_action(self, ans:dict) -> Union[None, int]:
+        if self._state in [GameState.AskPresident, GameState.AskGo]:
+            return ACTION_GO if ans['go'] else ACTION_STOP
+        elif self._state == GameState.AskCardToThrow:
+            card = ans['card']
+            if card is None: return ACTION_BOMB_CARD
+            if ans['shake_or_bomb']: return ACTION_SHAKE + card._value - 1
+            return ACTION_THROW + card._value - 1
+        elif self._state == GameState.AskCardToCapture:
+            return ACTION_CAPTURE + ans['card']._value - 1
+        return None
 
+    def action_to_answer(self, action:int) -> dict:
+        if action == ACTION_BOMB_CARD:
+            return {'card': None, 'shake_or_bomb': False}
+        elif action < ACTION_SHAKE:
+            return {'card': CARDS[action - ACTION_THROW + 1], 'shake_or_bomb': False}
+        elif action < ACTION_STOP:
+            return {'card': CARDS[action - ACTION_SHAKE + 1], 'shake_or_bomb': True}
+        elif action == ACTION_STOP:
+            return {'go': False}
+        elif action == ACTION_GO:
+            return {'go': True}
+        elif action < NUM_ACTIONS:
+            return {'card': CARDS[action - ACTION_CAPTURE + 1]}
+        raise Exception('Illegal action code')
+
+    # boolean mask over the canonical action codes (see ACTION_*): mask[action] is 1 for a legal action
+    def legal_actions(self) -> bytearray:
+        mask = bytearray(NUM_ACTIONS)
+        for action in self.legal_action_list():
+            mask[action] = 1
+        return mask
+
+    # legal action codes in ascending order
+    def legal_action_list(self) -> List[int]:
+        state = self._state
+        if state in [GameState.AskPresident, GameState.AskGo]:
+            return [ACTION_STOP, ACTION_GO]
+        elif state == GameState.AskCardToCapture:
+            return _append_actions([], self._board.by_month(self._pending[0].month), ACTION_CAPTURE)
+        elif state != GameState.AskCardToThrow:
+            return []
+
+        player = self.turn_player
+        res = [ACTION_BOMB_CARD] if player._bomb_card_cnt > 0 else []
+        _append_actions(res, player._hand, ACTION_THROW)
+        _append_actions(res, self._shakable(player), ACTION_SHAKE)
+        return res
 
     def action_reqfields(self):
         if self._state == GameState.AskPresident:
             return ['go']
         elif self._state == GameState.AskCardToThrow:
             return ['card', 'shake_or_bomb']
+        elif self._state == GameState.AskCardToCapture:
+            return ['card']
+        elif self._state == GameState.AskGo:
+            return ['go']
     
+    # applies a legal action code (see legal_action_list()) without checking it, as action() would apply its answer.
+    # the answers are shared by all games (see _ANSWERS), so nothing is allocated per move.
+    def _act(self, action:int):
+        state = self._state
+        self._answer = _ANSWERS[action]
+        if state == GameState.AskPresident:
+            if action == ACTION_STOP:
+                self.turn_player._claim_president()
+                self._state = GameState.Done
+                self._winner = self._turn
+                return
+            self._state = GameState.AnsweredPresident
+        elif state == GameState.AskCardToThrow:
+            self._state = GameState.AnsweredCardToThrow
+        elif state == GameState.AskCardToCapture:
+            self._state = GameState.AnsweredCardToCapture
+        elif state == GameState.AskGo:
+            self._state = GameState.AnsweredGo
+        self._deal()
+
     # for a valid action, this function returns true. if not, it returns false
     def action(self, ans:dict) -> bool:
-        required = self.answer_reqfields()
-        cur_player = self.turn_player()
+        required = self.action_reqfields()
+        if required is None: return False
+        cur_player = self.turn_player
         for key in required:
             if not key in ans: return False
         self._answer = ans
@@ -618,17 +1305,17 @@ class Game(object):
             hand_card = ans['card']
             shake = ans['shake_or_bomb']
             if hand_card is None:
-                if cur_player.bomb_cnt < 1: return False
+                if cur_player._bomb_card_cnt < 1: return False
             else:
                 if not cur_player.has(hand_card): return False
-                if shake:
-                    shakable_months = cur_player.shakable_months()
-                    hand_month = hand_card.month
-                    if not hand_month in shakable_months:
-                        board_cnt = len(self._board.by_month(hand_month))
-                        hand_cnt = cur_player.by_month('hand', hand_month)
-                        if board_cnt + hand_cnt < 4: return False
+                if shake and not hand_card in self._shakable(cur_player): return False
             self._state = GameState.AnsweredCardToThrow
+        elif self._state == GameState.AskCardToCapture:
+            chosen = ans['card']
+            if chosen is None or not chosen in self._board.by_month(self._pending[0].month): return False
+            self._state = GameState.AnsweredCardToCapture
+        elif self._state == GameState.AskGo:
+            self._state = GameState.AnsweredGo
 
         self._deal()
         return True
@@ -647,8 +1334,8 @@ class Game(object):
 
     def dump_str(self, indent:int=4):
         res  = 'Round #{0}\n'.format(self._round_cnt)
-        res += 'Board: {0}\n'.format(_cardset_to_str(self._board))
-        res += 'Stock: {0}\n'.format(_cardset_to_str(self._stock))
+        res += 'Board: {0}\n'.format(_cardset_to_str(self._board.as_set()))
+        res += 'Stock: {0}\n'.format(_cardset_to_str(self.stock))
         for pidx, p in enumerate(self._players):
             res += 'Player #{0} ====\n'.format(pidx)
             res += p.dump_str(indent=indent)
@@ -656,9 +1343,17 @@ class Game(object):
         return res
 
 
+# the answer of every action code, shared by the moves of Game._act(); they must not be modified
+_ANSWERS = tuple(Game.action_to_answer(None, action) for action in range(NUM_ACTIONS))
+
+
 class TestConsole(object):
     def __init__(self, num_players=2):
         self._game = Game(num_players)
 
 console = TestConsole(2)
 
+if os.environ.get('ALPHAGS_PROBE', '0') not in ('', '0'):
+    from .probe import _enable_from_env
+    _enable_from_env()
+
@@ -0,0 +1,304 @@
+from typing import *
+import random
+import time
+
+import numpy as np
+
+from .logic import Game, GameState, NUM_ACTIONS
+from .determinize import Determinizer
+from .playout import playout, random_policy
+
+
+# Monte Carlo tree search over canonical action codes (see ACTION_* in logic).
+#
+# the hidden cards are sampled by a Determinizer: every simulation plays one world from the root,
+# and the tree is shared by all worlds (open loop), so a node stands for a sequence of actions.
+# a child is selected among the actions legal in the current world, by
+#
+#   Q + c_puct * prior * sqrt(available) / (1 + visits)
+#
+# where Q is the mean reward of the player who took the action and available counts the simulations
+# in which the action was legal. rewards are in [-1, 1]: the winner gets min(score, reward_scale) / reward_scale,
+# and the losers share its negation.
+#
+# nodes live in a NodePool, a struct of numpy arrays. the children of a node are found through a row of
+# NUM_ACTIONS child indices, which is only allocated when the node gets its first child.
+
+# prior(game) -> weights indexed by action code; only the weights of the legal actions are used
+PriorHook = Callable[[Game], np.ndarray]
+
+# rollout(game) -> action code of the turn player
+RolloutPolicy = Callable[[Game], int]
+
+
+class NodePool(object):
+    def __init__(self, capacity:int=1 << 16):
+        self._alloc(capacity, capacity // 4 + 1)
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self.visits)
+
+    def clear(self):
+        self._size = 0
+        self._rows = 0
+
+    def new_node(self, parent:int, action:int, mover:int, prior:float) -> int:
+        if self._size == len(self.visits): self._grow_nodes()
+        node = self._size
+        self._size += 1
+        self.visits[node] = 0
+        self.available[node] = 0
+        self.value_sum[node] = 0.0
+        self.prior[node] = prior
+        self.parent[node] = parent
+        self.action[node] = action
+        self.mover[node] = mover
+        self.row[node] = -1
+        if parent >= 0:
+            row = self.row[parent]
+            if row < 0: row = self._new_row(parent)
+            self.children[row, action] = node
+        return node
+
+    # children of node indexed by action code (-1 for none); None before the first child
+    def child_row(self, node:int) -> Union[None, np.ndarray]:
+        row = self.row[node]
+        if row < 0: return None
+        return self.children[row]
+
+    # copies the subtree of root to the front of the pool and returns its new index (0)
+    def compact(self, root:int) -> int:
+        order = [root]
+        i = 0
+        while i < len(order):
+            row = self.row[order[i]]
+            if row >= 0:
+                kids = self.children[row]
+                order.extend(kids[kids >= 0].tolist())
+            i += 1
+        old = np.array(order, dtype=np.int64)
+        remap = np.full(self._size + 1, -1, dtype=np.int32)
+        remap[old] = np.arange(len(old), dtype=np.int32)
+
+        n = len(old)
+        for name in ('visits', 'available', 'value_sum', 'prior', 'action', 'mover'):
+            arr = getattr(self, name)
+            arr[:n] = arr[old]
+        self.parent[:n] = remap[self.parent[old]]
+        self.parent[0] = -1
+
+        # rows follow their nodes, in the same order
+        rows = self.row[old]
+        has_row = rows >= 0
+        new_rows = np.full(n, -1, dtype=np.int32)
+        new_rows[has_row] = np.arange(int(has_row.sum()), dtype=np.int32)
+        kept = self.children[rows[has_row]]
+        # remap[-1] is -1, so missing children stay missing
+        self.children[:len(kept)] = remap[kept]
+        self.row[:n] = new_rows
+        self._size = n
+        self._rows = len(kept)
+        return 0
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    def _alloc(self, capacity:int, row_capacity:int):
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.available = np.zeros(capacity, dtype=np.int32)
+        self.value_sum = np.zeros(capacity, dtype=np.float64)
+        self.prior = np.zeros(capacity, dtype=np.float32)
+        self.parent = np.zeros(capacity, dtype=np.int32)
+        self.action = np.zeros(capacity, dtype=np.int16)
+        self.mover = np.zeros(capacity, dtype=np.int8)
+        self.row = np.zeros(capacity, dtype=np.int32)
+        self.children = np.full((row_capacity, NUM_ACTIONS), -1, dtype=np.int32)
+
+    def _grow_nodes(self):
+        size = len(self.visits)
+        for name in ('visits', 'available', 'value_sum', 'prior', 'parent', 'action', 'mover', 'row'):
+            arr = getattr(self, name)
+            grown = np.zeros(2 * size, dtype=arr.dtype)
+            grown[:size] = arr
+            setattr(self, name, grown)
+
+    def _new_row(self, node:int) -> int:
+        if self._rows == len(self.children):
+            grown = np.full((2 * len(self.children), NUM_ACTIONS), -1, dtype=np.int32)
+            grown[:self._rows] = self.children
+            self.children = grown
+        row = self._rows
+        self._rows += 1
+        self.children[row] = -1
+        self.row[node] = row
+        return row
+
+
+class MCTSPlayer(object):
+    # simulations and time_limit (seconds) bound a search; the search stops at the first one reached,
+    # after at least one simulation.
+    # with determinize=False, the simulations play the real hidden cards (a perfect-information baseline).
+    def __init__(self, simulations:Union[None, int]=1000, time_limit:Union[None, float]=None,
+                 c_puct:float=1.5, rollout:Union[None, RolloutPolicy]=None, prior:Union[None, PriorHook]=None,
+                 reward_scale:float=10.0, max_rollout_plies:Union[None, int]=None, determinize:bool=True,
+                 worlds_per_batch:int=32, capacity:int=1 << 16, seed:Union[None, int]=None):
+        if simulations is None and time_limit is None:
+            raise Exception('Either simulations or time_limit is required')
+        self.simulations = simulations
+        self.time_limit = time_limit
+        self.c_puct = c_puct
+        self.reward_scale = reward_scale
+        self.max_rollout_plies = max_rollout_plies
+        self._rng = random.Random(seed)
+        self._rollout_hook = rollout
+        # a playout policy (see playout); random_policy draws from self._rng on the int path of playout
+        self._rollout = random_policy if rollout is None else self._hooked_rollout
+        self._prior = prior
+        self._determinizer = Determinizer(seed=self._rng.getrandbits(64)) if determinize else None
+        self._worlds_per_batch = worlds_per_batch
+        self._pool = NodePool(capacity)
+        self._root = -1
+        self._observed = False
+
+    @property
+    def pool(self) -> NodePool:
+        return self._pool
+
+    @property
+    def root(self) -> int:
+        return self._root
+
+    # a policy (see selfplay): answers the request of the turn player. the search draws from its own random state
+    def __call__(self, game:Game, reqfields:List[str], rng:random.Random) -> dict:
+        return game.action_to_answer(self.search(game))
+
+    # searches from game for its turn player and returns the action code with the most visits
+    def search(self, game:Game) -> int:
+        legal = game.legal_action_list()
+        if len(legal) == 0: raise Exception('No action to search in this state')
+        if len(legal) == 1:
+            self._root = -1
+            return legal[0]
+
+        pool = self._pool
+        # the tree is reused when the moves since the last search were passed to observe()
+        if self._root < 0 or not self._observed:
+            pool.clear()
+            self._root = pool.new_node(-1, 0, -1, 1.0)
+        elif len(pool) > pool.capacity // 2:
+            self._root = pool.compact(self._root)
+        self._observed = False
+
+        observer = game.turn
+        start = time.perf_counter()
+        worlds = []
+        done = 0
+        while True:
+            # at least one simulation, so the root has children to choose from
+            if done > 0:
+                if self.simulations is not None and done >= self.simulations: break
+                if self.time_limit is not None and time.perf_counter() - start >= self.time_limit: break
+            if len(worlds) == 0:
+                if self._determinizer is None:
+                    worlds = [game.clone() for _ in range(self._worlds_per_batch)]
+                else:
+                    worlds = self._determinizer.sample(game, self._worlds_per_batch, observer)[0]
+            self._simulate(worlds.pop())
+            done += 1
+
+        row = pool.child_row(self._root)
+        kids = row[legal]
+        visits = np.where(kids >= 0, pool.visits[kids], -1)
+        return legal[int(np.argmax(visits))]
+
+    # moves the root along an action taken in the real game (by any player)
+    def observe(self, action:int):
+        if self._root < 0: return
+        row = self._pool.child_row(self._root)
+        child = -1 if row is None else int(row[action])
+        self._root = child
+        self._observed = child >= 0
+
+    def reset(self):
+        self._pool.clear()
+        self._root = -1
+        self._observed = False
+
+    # visits and mean rewards of the root children, by action code
+    def root_stats(self) -> Dict[int, Tuple[int, float]]:
+        pool = self._pool
+        if self._root < 0: return {}
+        row = pool.child_row(self._root)
+        if row is None: return {}
+        res = dict()
+        for action in np.flatnonzero(row >= 0).tolist():
+            node = row[action]
+            n = int(pool.visits[node])
+            res[action] = (n, float(pool.value_sum[node]) / n if n > 0 else 0.0)
+        return res
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    def _simulate(self, game:Game):
+        pool = self._pool
+        node = self._root
+        path = [node]
+        while game.state != GameState.Done:
+            legal = game.legal_action_list()
+            row = pool.child_row(node)
+            kids = None if row is None else row[legal]
+            if kids is not None and (kids >= 0).all():
+                pool.available[kids] += 1
+                node = self._select(legal, kids)
+                game.action(game.action_to_answer(int(pool.action[node])))
+                path.append(node)
+                continue
+
+            if kids is not None:
+                pool.available[kids[kids >= 0]] += 1
+                untried = [a for a, k in zip(legal, kids.tolist()) if k < 0]
+            else:
+                untried = legal
+            action, prior = self._expand_choice(game, legal, untried)
+            node = pool.new_node(node, action, game.turn, prior)
+            pool.available[node] += 1
+            game.action(game.action_to_answer(action))
+            path.append(node)
+            break
+
+        rewards = self._playout(game)
+        for node in path:
+            pool.visits[node] += 1
+            mover = pool.mover[node]
+            if mover >= 0: pool.value_sum[node] += rewards[mover]
+
+    def _select(self, legal:List[int], kids:np.ndarray) -> int:
+        pool = self._pool
+        visits = pool.visits[kids]
+        q = pool.value_sum[kids] / np.maximum(visits, 1)
+        u = self.c_puct * pool.prior[kids] * np.sqrt(pool.available[kids]) / (1 + visits)
+        return int(kids[int(np.argmax(q + u))])
+
+    def _expand_choice(self, game:Game, legal:List[int], untried:List[int]) -> Tuple[int, float]:
+        if self._prior is None:
+            return self._rng.choice(untried), 1.0 / len(legal)
+        weights = np.asarray(self._prior(game), dtype=np.float64)
+        legal_sum = weights[legal].sum()
+        if legal_sum <= 0: return self._rng.choice(untried), 1.0 / len(legal)
+        best = max(untried, key=lambda a: weights[a])
+        return best, float(weights[best] / legal_sum)
+
+    def _playout(self, game:Game) -> List[float]:
+        playout(game, self._rollout, self.max_rollout_plies, self._rng)
+        num_players = game.num_player
+        winner = game.winner()
+        if winner is None: return [0.0] * num_players
+        s = min(game._players[winner].score(), self.reward_scale) / self.reward_scale
+        rewards = [-s / (num_players - 1)] * num_players
+        rewards[winner] = s
+        return rewards
+
+    def _hooked_rollout(self, game:Game, legal:List[int]) -> int:
+        return self._rollout_hook(game)
@@ -0,0 +1,310 @@
+from typing import *
+import random
+from bisect import insort
+
+from .logic import (Game, GameState, CardMask, CARDS, CARD_FLAGS, CARD_PI_CNT, FLAG_BRIGHT, FLAG_ANIMAL, FLAG_RIBBON,
+                    ACTION_BOMB_CARD, ACTION_THROW, ACTION_SHAKE, ACTION_STOP, ACTION_GO, ACTION_CAPTURE,
+                    base_score, _append_actions, _shakable_bits, _steal_pi_bits, _resolve_throw_bits, _TURN_BBUCK,
+                    _ANSWERS, _Z_STOCK, _BRIGHT_BITS, _SUBBRIGHT_BITS, _KUKJIN_BITS, _RED_RIBBON_BITS,
+                    _BLUE_RIBBON_BITS, _PLAIN_RIBBON_BITS, _ANIMAL_BITS, _BIRD_BITS, _PI1_BITS, _PI2_BITS, _PI3_BITS)
+
+
+# the fast path of a playout: plays a game to GameState.Done with action codes. a playout policy gets
+# the legal action codes (see Game.legal_action_list()) and returns one of them:
+#
+#   policy(game, legal) -> action code
+#
+# the built-in random_policy and greedy_policy only look at the board, so their playouts run on plain ints:
+# the matches of a turn and the pi steals are the int rules Game._deal() runs as well (_resolve_throw_bits()
+# and _steal_pi_bits() in logic), the throws of every player are a list that loses the cards thrown, and the
+# game is written back once at the end. any other policy is asked through Game._act(), one move at a time.
+# either way a playout ends exactly as the same game played through Game.action(), e.g. random_policy with rng
+# draws the same cards as selfplay.random_policy given the same rng. the int path is not probed.
+
+PlayoutPolicy = Callable[[Game, List[int]], int]
+
+
+def random_policy(game:Game, legal:List[int]) -> int:
+    return random.choice(legal)
+
+
+# a one-ply heuristic: stops whenever it can, throws a bonus card first, then a card that captures the best
+# board card of its month (or else the cheapest card), and captures the best card of a choice.
+# ties go to the lowest action code.
+def greedy_policy(game:Game, legal:List[int]) -> int:
+    return _greedy(legal, int(game._board._cards))
+
+
+# plays game (in place) to its end, or for at most max_plies moves, and returns the score of every player.
+# rng is the random state of random_policy, the global one by default.
+def playout(game:Game, policy:PlayoutPolicy=random_policy, max_plies:Union[None, int]=None,
+            rng:Union[None, random.Random]=None) -> Tuple[int, ...]:
+    if policy is random_policy:
+        choose = (random if rng is None else rng).choice
+        _playout_ints(game, lambda legal, board: choose(legal), max_plies)
+    elif policy is greedy_policy:
+        _playout_ints(game, _greedy, max_plies)
+    else:
+        done = GameState.Done
+        act = game._act
+        legal_actions = game.legal_action_list
+        if max_plies is None:
+            while game._state is not done:
+                act(policy(game, legal_actions()))
+        else:
+            for _ in range(max_plies):
+                if game._state is done: break
+                act(policy(game, legal_actions()))
+    return tuple(p.score() for p in game._players)
+
+
+## Functions, whose names start with an underscore, should not be called by the user
+def _card_values() -> Tuple[int, ...]:
+    values = [0]
+    for flags, pi_cnt in zip(CARD_FLAGS[1:], CARD_PI_CNT[1:]):
+        if flags & FLAG_BRIGHT: values.append(5)
+        elif flags & FLAG_ANIMAL: values.append(4)
+        elif flags & FLAG_RIBBON: values.append(3)
+        else: values.append(pi_cnt)
+    return tuple(values)
+
+# rough worth of a card, indexed by CardCode.value
+_CARD_VALUE = _card_values()
+
+# states of the int path
+_THROW   = 0
+_CAPTURE = 1
+_GO      = 2
+_DONE    = 3
+_STATES = {GameState.AskCardToThrow: _THROW, GameState.AskCardToCapture: _CAPTURE, GameState.AskGo: _GO,
+           GameState.Done: _DONE}
+_GAME_STATES = {v: k for k, v in _STATES.items()}
+
+_BONUS = 48
+
+
+def _greedy(legal:List[int], board:int) -> int:
+    first = legal[0]
+    if first == ACTION_STOP: return ACTION_STOP
+    if first >= ACTION_CAPTURE:
+        return max(legal, key=lambda a: _CARD_VALUE[a - ACTION_CAPTURE + 1])
+
+    best, best_value = first, None
+    for action in legal:
+        if action == ACTION_BOMB_CARD: value = -1
+        else:
+            idx = action - (ACTION_THROW if action < ACTION_SHAKE else ACTION_SHAKE)
+            # the board cards of the month, as the bits of its nibble
+            month = (board >> (idx & ~3)) & 15
+            if idx >= _BONUS: value = 200
+            elif month: value = 100 + max(_CARD_VALUE[(idx & ~3) + i + 1] for i in range(4) if month >> i & 1)
+            else: value = -_CARD_VALUE[idx + 1]
+        if best_value is None or value > best_value: best, best_value = action, value
+    return best
+
+
+# Player.score(amplifier=False) of the acquired cards
+def _base_score(bits:int, kukjin_as_doublepi:bool) -> int:
+    pi = (bits & _PI1_BITS).bit_count() + 2 * (bits & _PI2_BITS).bit_count() + 3 * (bits & _PI3_BITS).bit_count()
+    animal = (bits & _ANIMAL_BITS).bit_count()
+    if kukjin_as_doublepi and bits & _KUKJIN_BITS:
+        pi += 2
+        animal -= 1
+    return base_score((bits & _BRIGHT_BITS).bit_count(), (bits & _SUBBRIGHT_BITS) != 0, pi, animal,
+                      (bits & _BIRD_BITS).bit_count(), (bits & _RED_RIBBON_BITS).bit_count(),
+                      (bits & _BLUE_RIBBON_BITS).bit_count(), (bits & _PLAIN_RIBBON_BITS).bit_count())
+
+
+# plays game with choose(legal, board) -> action code on plain ints, and writes the result back into game
+def _playout_ints(game:Game, choose:Callable[[List[int], int], int], max_plies:Union[None, int]):
+    plies = 0
+    # a president is only asked at the start of a game
+    while game._state is GameState.AskPresident:
+        if max_plies is not None and plies >= max_plies: return
+        game._act(choose(game.legal_action_list(), int(game._board._cards)))
+        plies += 1
+    if game._state is GameState.Done: return
+
+    players = game._players
+    num_players = len(players)
+    hands = [int(p._hand) for p in players]
+    # the throw action codes of every hand, in ascending order
+    throws = [_append_actions([], h, ACTION_THROW) for h in hands]
+    acquired = [int(p._acquired) for p in players]
+    shaked = [int(p._shaked) for p in players]
+    bomb_cards = [p._bomb_card_cnt for p in players]
+    go_cnt = [p._go_cnt for p in players]
+    shake_cnt = [p._shake_cnt for p in players]
+    bomb_cnt = [p._bomb_cnt for p in players]
+    bbuck_cnt = [p._bbuck_cnt for p in players]
+    latest_go = [p._latest_go_score for p in players]
+    kukjin = [p._kukjin_as_doublepi for p in players]
+    board = int(game._board._cards)
+    bbuck = list(game._board._bbuck_player)
+    stock = [c._value - 1 for c in game.stock]
+    num_stock = len(stock)
+    flipped = 0
+    public = int(game._public)
+    captured = int(game._captured)
+    steal = game._steal_cnt
+    pending = [c._value - 1 for c in game._pending]
+    turn = game._turn
+    winner = game._winner
+    goable = game.goable_score
+    state = _STATES[game._state]
+    action = None
+
+    while state != _DONE:
+        if max_plies is not None and plies >= max_plies: break
+        plies += 1
+
+        if state == _THROW:
+            hand = hands[turn]
+            legal = [ACTION_BOMB_CARD] + throws[turn] if bomb_cards[turn] else throws[turn][:]
+            shakable = _shakable_bits(hand, board)
+            if shakable: _append_actions(legal, shakable, ACTION_SHAKE)
+            action = choose(legal, board)
+
+            if action >= ACTION_SHAKE:
+                card = action - ACTION_SHAKE
+                shake = True
+            else:
+                card = action - ACTION_THROW
+                shake = False
+
+            if card >= _BONUS:
+                bit = 1 << card
+                hands[turn] = hand ^ bit
+                throws[turn].remove(ACTION_THROW + card)
+                shaked[turn] &= ~bit
+                public |= bit
+                acquired[turn] |= bit
+                _steal_pi_bits(acquired, turn, 1)
+                # the player draws a card from the stock in its place
+                if flipped < num_stock:
+                    c = stock[flipped]
+                    flipped += 1
+                    hands[turn] |= 1 << c
+                    insort(throws[turn], ACTION_THROW + c)
+                # and throws again, unless the bonus card was the last one
+                if hands[turn] or bomb_cards[turn]: continue
+            else:
+                # card is -1 for a bomb card
+                month_bits = 0 if card < 0 else 15 << (card & ~3)
+                hand_board = board & month_bits
+                bomb = False
+                if shake:
+                    same = hand & month_bits
+                    if not hand_board:
+                        shaked[turn] |= same
+                        shake_cnt[turn] += 1
+                        public |= shaked[turn]
+                    else:
+                        # bomb: throw every card of the month and take the board cards
+                        bomb = True
+                        hand ^= same
+                        hands[turn] = hand
+                        for action_card in _append_actions([], same, ACTION_THROW):
+                            throws[turn].remove(action_card)
+                        shaked[turn] &= ~same
+                        public |= same
+                        bomb_cards[turn] += same.bit_count() - 1
+                        bomb_cnt[turn] += 1
+                        board ^= hand_board
+                        captured |= same | hand_board
+                        steal += 1
+                        card = -1
+                if not bomb:
+                    if card < 0: bomb_cards[turn] -= 1
+                    else:
+                        bit = 1 << card
+                        hands[turn] = hand ^ bit
+                        throws[turn].remove(ACTION_THROW + card)
+                        shaked[turn] &= ~bit
+                        public |= bit
+
+                # flip the stock; bonus cards go straight to the player
+                stock_card = -1
+                while flipped < num_stock:
+                    c = stock[flipped]
+                    flipped += 1
+                    public |= 1 << c
+                    if c >= _BONUS:
+                        captured |= 1 << c
+                        continue
+                    stock_card = c
+                    break
+
+                board, captured, steal, event = _resolve_throw_bits(turn, card, stock_card, hand_board, board,
+                                                                    captured, steal, pending, bbuck)
+                if event == _TURN_BBUCK: bbuck_cnt[turn] += 1
+
+        elif state == _CAPTURE:
+            card = pending[0]
+            legal = _append_actions([], board & (15 << (card & ~3)), ACTION_CAPTURE)
+            action = choose(legal, board)
+            chosen = 1 << (action - ACTION_CAPTURE)
+            del pending[0]
+            board ^= chosen
+            captured |= chosen | (1 << card)
+
+        else:
+            action = choose([ACTION_STOP, ACTION_GO], board)
+            if action == ACTION_STOP:
+                state = _DONE
+                winner = turn
+                break
+            score = _base_score(acquired[turn], kukjin[turn])
+            if score > latest_go[turn] and score > 0:
+                latest_go[turn] = score
+                go_cnt[turn] += 1
+
+        if state != _GO:
+            # Game._resolve_turn()
+            if pending:
+                state = _CAPTURE
+                continue
+            # sweeping the board takes a pi from the others as well
+            if not board and captured: steal += 1
+            acquired[turn] |= captured
+            captured = 0
+            _steal_pi_bits(acquired, turn, steal)
+            steal = 0
+            score = _base_score(acquired[turn], kukjin[turn])
+            if score >= goable and score > latest_go[turn] and score > 0:
+                state = _GO
+                continue
+
+        # Game._next_turn()
+        turn = (turn + 1) % num_players
+        state = _DONE if not hands[turn] and not bomb_cards[turn] else _THROW
+
+    for i, p in enumerate(players):
+        p._set_hand(CardMask(hands[i]))
+        p._set_acquired(acquired[i])
+        p._set_shaked(CardMask(shaked[i]))
+        p._bomb_card_cnt = bomb_cards[i]
+        p._go_cnt = go_cnt[i]
+        p._shake_cnt = shake_cnt[i]
+        p._bomb_cnt = bomb_cnt[i]
+        p._bbuck_cnt = bbuck_cnt[i]
+        p._latest_go_score = latest_go[i]
+    old_board = game._board._cards
+    game._board._take(CardMask(old_board & ~board))
+    game._board._put(CardMask(board & ~old_board))
+    for month, player_idx in enumerate(bbuck):
+        if player_idx != game._board._bbuck_player[month]: game._board._set_bbuck(player_idx, month)
+    deck = game._deck
+    n = len(deck)
+    for _ in range(flipped):
+        pos = game._stock_pos
+        game._stock_zhash ^= _Z_STOCK[n - 1 - pos][deck[pos]._value]
+        game._stock_pos = pos + 1
+    game._public = CardMask(public)
+    game._captured = CardMask(captured)
+    game._steal_cnt = steal
+    game._pending = tuple(CARDS[c + 1] for c in pending)
+    game._turn = turn
+    game._winner = winner
+    game._state = _GAME_STATES[state]
+    if action is not None: game._answer = _ANSWERS[action]
@@ -0,0 +1,113 @@
+from typing import *
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+
+from . import logic
+from .logic import Game, Player
+
+
+# opt-in instrumentation of the engine:
+#   counters  the branches taken by Game._deal(), e.g. 'deal.bomb' or 'deal.match'
+#   timers    calls and total seconds of Game.action(), Game._deal() and Player.score()
+#
+# it is off by default and then costs nothing: the timed methods are the plain ones, and a branch
+# counter is a single check of logic._probe. turn it on with
+#
+#   with probing() as probe:
+#       ...
+#   print(probe.report())
+#
+# or for a whole process with the environment variable ALPHAGS_PROBE=1 (or stderr), which prints the report
+# as JSON to stderr at exit. ALPHAGS_PROBE=<path> appends it to that file instead; an empty value or 0 is off.
+
+_TIMED = ((Game, 'action', 'game.action'),
+          (Game, '_deal', 'game.deal'),
+          (Player, 'score', 'player.score'))
+
+
+class Probe(object):
+    def __init__(self):
+        self.counts = dict()
+        self.calls = dict()
+        self.seconds = dict()
+
+    def count(self, name:str, n:int=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def clear(self):
+        self.counts.clear()
+        self.calls.clear()
+        self.seconds.clear()
+
+    def report(self) -> dict:
+        timers = dict()
+        for name, calls in sorted(self.calls.items()):
+            seconds = self.seconds[name]
+            timers[name] = {'calls': calls, 'seconds': seconds, 'us_per_call': 1e6 * seconds / calls}
+        return {'counts': dict(sorted(self.counts.items())), 'timers': timers}
+
+
+_originals = dict()
+
+
+# installs probe (a new one by default) and returns it
+def enable(probe:Union[None, Probe]=None) -> Probe:
+    if probe is None: probe = Probe()
+    logic._probe = probe
+    for cls, attr, name in _TIMED:
+        if (cls, attr) in _originals: continue
+        func = getattr(cls, attr)
+        _originals[(cls, attr)] = func
+        setattr(cls, attr, _timed(func, name))
+    return probe
+
+
+def disable():
+    logic._probe = None
+    for (cls, attr), func in _originals.items():
+        setattr(cls, attr, func)
+    _originals.clear()
+
+
+@contextlib.contextmanager
+def probing(probe:Union[None, Probe]=None) -> Iterator[Probe]:
+    probe = enable(probe)
+    try:
+        yield probe
+    finally:
+        disable()
+
+
+## Functions, whose names start with an underscore, should not be called by the user
+def _timed(func:Callable, name:str) -> Callable:
+    perf_counter = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            probe = logic._probe
+            probe.calls[name] = probe.calls.get(name, 0) + 1
+            probe.seconds[name] = probe.seconds.get(name, 0.0) + perf_counter() - start
+    return wrapper
+
+
+def _enable_from_env():
+    probe = enable()
+    target = os.environ.get('ALPHAGS_PROBE')
+
+    def dump():
+        report = dict(probe.report(), pid=os.getpid())
+        if target in ('1', 'stderr'):
+            print(json.dumps(report), file=sys.stderr)
+        else:
+            with open(target, 'a') as f:
+                f.write(json.dumps(report) + '\n')
+    atexit.register(dump)
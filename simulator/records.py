@@ -0,0 +1,153 @@
+from typing import *
+import mmap
+import os
+import struct
+from array import array
+
+from .logic import Game, Card, CardCode, CARDS
+
+
+# a record file is a file header followed by game records:
+#
+#   file header : magic 'AGSR', version (u8), 3 reserved bytes
+#   record      : number of players (u8), reserved (u8), number of plies (u16, little endian),
+#                 the dealt deck as 51 card codes (one byte each, CardCode.value),
+#                 one canonical action code (see ACTION_* in logic) per ply
+#
+# records are appended to the end of the file, so a file can be written by several runs. a record cut short
+# by an interrupted writer is ignored by readers, and cut off by the next writer before it appends.
+
+MAGIC = b'AGSR'
+VERSION = 1
+DECK_SIZE = len(CardCode)
+
+_FILE_HEADER = struct.Struct('<4sB3x')
+_RECORD_HEADER = struct.Struct('<BxH')
+
+
+def pack_record(num_players:int, deck:Sequence[Card], actions:Sequence[int]) -> bytes:
+    if len(actions) > 0xffff:
+        raise Exception('Too many plies for a record')
+    return (_RECORD_HEADER.pack(num_players, len(actions))
+            + bytes(c._value for c in deck)
+            + bytes(actions))
+
+
+class GameRecord(object):
+    __slots__ = ('num_players', 'deck', 'actions')
+
+    def __init__(self, num_players:int, deck:bytes, actions:bytes):
+        self.num_players = num_players
+        self.deck = deck
+        self.actions = actions
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def cards(self) -> List[Card]:
+        return [CARDS[v] for v in self.deck]
+
+    # rebuilds the game after the given number of plies (all of them by default)
+    def replay(self, plies:Union[None, int]=None) -> Game:
+        game = Game(self.num_players, deck=self.cards())
+        for action in self.actions[:plies]:
+            if not game.action(game.action_to_answer(action)):
+                raise Exception('Illegal action in the record')
+        return game
+
+
+class RecordWriter(object):
+    def __init__(self, path:str, buffer_size:int=1 << 20):
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb+') as f:
+                _check_header(f.read(_FILE_HEADER.size))
+                size = os.fstat(f.fileno()).st_size
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    end = _scan_records(buf, size)
+                if end < size: f.truncate(end)
+            self._file = open(path, 'ab', buffering=buffer_size)
+        else:
+            self._file = open(path, 'ab', buffering=buffer_size)
+            self._file.write(_FILE_HEADER.pack(MAGIC, VERSION))
+
+    def write(self, num_players:int, deck:Sequence[Card], actions:Sequence[int]):
+        self._file.write(pack_record(num_players, deck, actions))
+
+    def write_game(self, game:Game, actions:Sequence[int]):
+        self.write(game.num_player, game.deck, actions)
+
+    # appends records that are already packed by pack_record()
+    def write_packed(self, records:Iterable[bytes]):
+        self._file.writelines(records)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> 'RecordWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# memory-maps a record file and indexes its records without reading them
+class RecordReader(object):
+    def __init__(self, path:str):
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _FILE_HEADER.size:
+            self._file.close()
+            raise Exception('Not a record file')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        _check_header(self._mmap[:_FILE_HEADER.size])
+
+        # record offsets; a record cut short by an interrupted writer is ignored
+        self._offsets = array('Q')
+        _scan_records(self._mmap, size, self._offsets)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __getitem__(self, idx:int) -> GameRecord:
+        pos = self._offsets[idx]
+        num_players, plies = _RECORD_HEADER.unpack_from(self._mmap, pos)
+        pos += _RECORD_HEADER.size
+        return GameRecord(num_players, self._mmap[pos:pos + DECK_SIZE],
+                          self._mmap[pos + DECK_SIZE:pos + DECK_SIZE + plies])
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for idx in range(len(self._offsets)):
+            yield self[idx]
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> 'RecordReader':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# walks the record headers of a file of the given size and returns the end of its last complete record.
+# the offsets of the complete records are appended to offsets, if given
+def _scan_records(buf, size:int, offsets:Union[None, array]=None) -> int:
+    pos = _FILE_HEADER.size
+    while pos + _RECORD_HEADER.size <= size:
+        _, plies = _RECORD_HEADER.unpack_from(buf, pos)
+        end = pos + _RECORD_HEADER.size + DECK_SIZE + plies
+        if end > size: break
+        if offsets is not None: offsets.append(pos)
+        pos = end
+    return pos
+
+def _check_header(header:bytes):
+    if len(header) < _FILE_HEADER.size:
+        raise Exception('Not a record file')
+    magic, version = _FILE_HEADER.unpack(header)
+    if magic != MAGIC: raise Exception('Not a record file')
+    if version != VERSION: raise Exception('Unsupported record version {0}'.format(version))
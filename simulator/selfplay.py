@@ -0,0 +1,145 @@
+from typing import *
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .logic import Game, GameState, game_seed, new_seed, _splitmix64
+from .records import RecordWriter, pack_record
+
+
+# a policy answers the fields asked by Game.action_reqfields() for the turn player. rng is the random state of
+# the game: a policy draws from it, not from the global random state, so a game is played again from its seeds.
+# policies are sent to the worker processes, so they have to be picklable (e.g. module level functions).
+Policy = Callable[[Game, List[str], random.Random], dict]
+
+# (winner or None, final score of each player, number of plies)
+GameResult = Tuple[Union[None, int], Tuple[int, ...], int]
+
+
+def random_policy(game:Game, reqfields:List[str], rng:random.Random) -> dict:
+    return game.action_to_answer(rng.choice(game.legal_action_list()))
+
+
+# the seed of the policy random state of the i-th game of run, which is dealt from game_seed(run, i)
+def policy_seed(run:int, index:int) -> int:
+    return _splitmix64(game_seed(run, index))
+
+
+# rng: the random state of the policies. by default it is seeded from the deal seed of the game
+# (random.Random(policy_seed(run, i)) for a game dealt from game_seed(run, i)), so a game is played again
+# from its seed alone
+def play_game(policies:Sequence[Policy], num_players:int=2, seed:Union[None, int]=None,
+              rng:Union[None, random.Random]=None) -> GameResult:
+    game, plies = _play(policies, num_players, seed, rng, None)
+    return _result(game, plies)
+
+
+# when actions is given, the action code of every ply is appended to it
+def _play(policies:Sequence[Policy], num_players:int, seed:Union[None, int], rng:Union[None, random.Random],
+          actions:Union[None, List[int]]) -> Tuple[Game, int]:
+    game = Game(num_players, seed=seed)
+    if rng is None: rng = random.Random(_splitmix64(game._seed))
+    plies = 0
+    while game.state != GameState.Done:
+        reqfields = game.action_reqfields()
+        ans = policies[game.turn](game, reqfields, rng)
+        if actions is not None: actions.append(game.answer_to_action(ans))
+        if not game.action(ans):
+            raise Exception('Policy of player {0} answered an invalid action: {1}'.format(game.turn, ans))
+        plies += 1
+    return game, plies
+
+
+def _result(game:Game, plies:int) -> GameResult:
+    return game.winner(), tuple(p.score() for p in game._players), plies
+
+
+# plays the games first, ..., first + num_games - 1 of the run; the i-th game is dealt from game_seed(run, i)
+def _play_chunk(policies:Sequence[Policy], num_players:int, run:int, first:int, num_games:int,
+                record:bool) -> Tuple[List[GameResult], List[bytes]]:
+    results = []
+    records = []
+    for i in range(first, first + num_games):
+        # seeded per game, so a run depends neither on the scheduling nor on the chunk size
+        rng = random.Random(policy_seed(run, i))
+        actions = [] if record else None
+        game, plies = _play(policies, num_players, game_seed(run, i), rng, actions)
+        results.append(_result(game, plies))
+        if record: records.append(pack_record(num_players, game.deck, actions))
+    return results, records
+
+
+class SelfPlayStats(object):
+    def __init__(self, num_players:int):
+        self.games = 0
+        self.plies = 0
+        self.draws = 0
+        self.wins = [0] * num_players
+        self.elapsed = 0.0
+
+    @property
+    def games_per_sec(self) -> float:
+        if self.elapsed <= 0: return 0.0
+        return self.games / self.elapsed
+
+    def _add(self, results:List[GameResult]):
+        for winner, _, plies in results:
+            self.games += 1
+            self.plies += plies
+            if winner is None: self.draws += 1
+            else: self.wins[winner] += 1
+
+    def __str__(self):
+        return ('{0} games, {1} plies in {2:.2f}s ({3:.1f} games/s), wins: {4}, draws: {5}'
+                .format(self.games, self.plies, self.elapsed, self.games_per_sec, self.wins, self.draws))
+
+
+# plays num_games games over a process pool. results come back one chunk at a time and are
+# handed to sink (in the calling process) as lists of GameResult.
+# with record_path, every game is also appended to that record file (see records).
+# the k-th game of a run with seed is dealt from game_seed(seed, k), see logic.deck_from_seed().
+def run_selfplay(policies:Sequence[Policy], num_games:int, num_players:int=2, workers:Union[None, int]=None,
+                 chunk_size:int=256, seed:Union[None, int]=None,
+                 sink:Union[None, Callable[[List[GameResult]], None]]=None,
+                 record_path:Union[None, str]=None) -> SelfPlayStats:
+    if len(policies) != num_players:
+        raise Exception('One policy per player is required')
+    if seed is None: seed = new_seed()
+    if workers is None: workers = os.cpu_count() or 1
+
+    record = record_path is not None
+    writer = RecordWriter(record_path) if record else None
+    stats = SelfPlayStats(num_players)
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for first in range(0, num_games, chunk_size):
+                cnt = min(chunk_size, num_games - first)
+                futures.append(executor.submit(_play_chunk, policies, num_players, seed, first, cnt, record))
+
+            for future in futures:
+                results, records = future.result()
+                stats._add(results)
+                if sink is not None: sink(results)
+                if record: writer.write_packed(records)
+    finally:
+        if record: writer.close()
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Self-play games with random policies')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--players', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--record', default=None, help='append the games to this record file')
+    args = parser.parse_args()
+
+    print(run_selfplay([random_policy] * args.players, args.games, args.players, args.workers,
+                       args.chunk_size, args.seed, record_path=args.record))
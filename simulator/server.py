@@ -0,0 +1,400 @@
+from typing import *
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import struct
+
+from .logic import Game, GameState, game_seed
+
+
+# an asyncio table server: one event loop drives any number of tables, one task per table.
+# players connect over a local socket (a unix socket path, or a TCP port on localhost) and a connection
+# may sit at any number of seats of any number of tables. seats nobody sits at are played by a bot.
+#
+# a frame is the length of its body (u32, little endian) followed by the body, a JSON object.
+# client -> server
+#
+#   {"op": "create", "players": 2, "seats": [0], "bots": [1]}
+#                       a new table; the connection sits at seats, the server plays bots. the other seats
+#                       wait for a join, and are played by the bot after join_timeout. the server deals the
+#                       cards: a client that knew the seed of a table would know every hidden card.
+#   {"op": "join", "table": 7, "seat": 1}
+#   {"op": "act", "table": 7, "ply": 12, "action": 17}
+#                       answers the request of ply with a canonical action code (see ACTION_* in logic)
+#
+# server -> client
+#
+#   {"op": "created", "table": 7, "seats": [0]}         {"op": "joined", "table": 7, "seat": 1}
+#   {"op": "request", "table": 7, "ply": 12, "seat": 0, "legal": [...], "view": {...}}
+#   {"op": "timeout", "table": 7, "ply": 12, "action": 17}   the bot answered for a late player
+#   {"op": "done", "table": 7, "winner": 0, "scores": [...]}
+#   {"op": "error", "for": "create", "table": null, "message": "..."}   the op (and table) of the refused message
+#   {"op": "error", "for": null, "table": 7, "message": "..."}          the table failed and is closed
+#   {"op": "error", "for": null, "table": null, "message": "..."}       the connection failed and is closed
+#
+# a request is answered within turn_timeout seconds, or the bot answers it. the view holds the cards seen by
+# the seat as card masks (see CardMask): hand, board, cards captured earlier in the turn, acquired and shaked of
+# every player, pending card codes and the stock size.
+#
+# backpressure: a connection sends its frames through a queue of max_queued frames that is drained into the
+# socket. a table waits (within its turn timeout) for a slow reader, and the messages of a client are not read
+# while their replies wait. new tables are refused past max_tables. a timeout notice is dropped when the queue
+# is full; the next request has a new ply anyway.
+
+_LENGTH = struct.Struct('<I')
+MAX_FRAME = 1 << 20
+
+# answers for a bot seat or a late player: bot(game) -> canonical action code
+Bot = Callable[[Game], int]
+
+
+def encode_frame(msg:dict) -> bytes:
+    body = json.dumps(msg, separators=(',', ':')).encode()
+    return _LENGTH.pack(len(body)) + body
+
+
+# the next message, or None at the end of the stream
+async def read_frame(reader:asyncio.StreamReader) -> Union[None, dict]:
+    try:
+        head = await reader.readexactly(_LENGTH.size)
+        size, = _LENGTH.unpack(head)
+        if size > MAX_FRAME: raise Exception('Frame of {0} bytes is too large'.format(size))
+        return json.loads(await reader.readexactly(size))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def view(game:Game, seat:int) -> dict:
+    return {'hand': int(game._players[seat]._hand), 'board': int(game._board.as_set()), 'captured': int(game._captured),
+            'acquired': [int(p._acquired) for p in game._players], 'shaked': [int(p._shaked) for p in game._players],
+            'pending': [c._value for c in game._pending], 'stock': game.stock_size}
+
+
+class ServerStats(object):
+    def __init__(self):
+        self.connections = 0
+        self.tables = 0
+        self.finished = 0
+        self.decisions = 0
+        self.timeouts = 0
+        self.refused = 0
+
+    def __str__(self):
+        return ('{0} connections, {1} tables ({2} finished, {3} refused), {4} decisions, {5} timeouts'
+                .format(self.connections, self.tables, self.finished, self.refused, self.decisions, self.timeouts))
+
+
+class TableServer(object):
+    # path: a unix socket to listen on; without it, TCP on host:port (port 0 picks a free one).
+    # seed: the deals and the bots of the server, for reproducible runs; the deals come from the OS without it.
+    def __init__(self, path:Union[None, str]=None, host:str='127.0.0.1', port:int=0, max_tables:int=10000,
+                 turn_timeout:float=10.0, join_timeout:float=10.0, max_queued:int=256,
+                 bot:Union[None, Bot]=None, seed:Union[None, int]=None):
+        self.path = path
+        self.host = host
+        self.port = port
+        self.max_tables = max_tables
+        self.turn_timeout = turn_timeout
+        self.join_timeout = join_timeout
+        self.max_queued = max_queued
+        self._seed = seed
+        self._rng = random.Random(seed)
+        self._bot = self._random_bot if bot is None else bot
+        self._server = None
+        self._tables = dict()
+        self._connections = set()
+        self._ids = itertools.count()
+        self.stats = ServerStats()
+
+    @property
+    def num_tables(self) -> int:
+        return len(self._tables)
+
+    # the unix socket path, or the (host, port) the server listens on
+    @property
+    def address(self) -> Union[str, Tuple[str, int]]:
+        if self.path is not None: return self.path
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        if self.path is not None:
+            self._server = await asyncio.start_unix_server(self._serve, self.path)
+        else:
+            self._server = await asyncio.start_server(self._serve, self.host, self.port)
+
+    async def serve_forever(self):
+        if self._server is None: await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        tables = [table.task for table in self._tables.values()]
+        for task in tables:
+            task.cancel()
+        # a closed connection ends its handler at the end of its stream
+        handlers = [conn.handler for conn in self._connections]
+        for conn in list(self._connections):
+            conn.close()
+        await asyncio.gather(*tables, *handlers, return_exceptions=True)
+
+    async def __aenter__(self) -> 'TableServer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    def _random_bot(self, game:Game) -> int:
+        return self._rng.choice(game.legal_action_list())
+
+    async def _serve(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        conn = _Connection(writer, self.max_queued)
+        conn.handler = asyncio.current_task()
+        self._connections.add(conn)
+        self.stats.connections += 1
+        try:
+            while True:
+                msg = None
+                msg = await read_frame(reader)
+                if msg is None: break
+                # replies wait for room in the queue, so a client that does not read is no longer read either
+                await conn.send(self._dispatch(conn, msg))
+        except Exception as e:
+            # e.g. a frame that is too large or not a JSON object
+            op = msg.get('op') if isinstance(msg, dict) else None
+            table = msg.get('table') if isinstance(msg, dict) else None
+            conn.post({'op': 'error', 'for': op, 'table': table, 'message': str(e)})
+            await conn.flush(self.turn_timeout)
+        finally:
+            self._connections.discard(conn)
+            conn.close()
+            # the bot takes over the seats of a closed connection
+            for table in list(conn.tables):
+                table.release(conn)
+
+    # handles one message; returns the reply, or None
+    def _dispatch(self, conn:'_Connection', msg:dict) -> Union[None, dict]:
+        error = self._handle(conn, msg)
+        if isinstance(error, str):
+            return {'op': 'error', 'for': msg.get('op'), 'table': msg.get('table'), 'message': error}
+        return error
+
+    # returns the reply, an error message or None
+    def _handle(self, conn:'_Connection', msg:dict) -> Union[None, str, dict]:
+        op = msg.get('op')
+        if op == 'act':
+            table = self._tables.get(msg.get('table'))
+            if table is None: return 'No table {0}'.format(msg.get('table'))
+            return table.answer(conn, msg.get('ply'), msg.get('action'))
+        elif op == 'create':
+            if len(self._tables) >= self.max_tables:
+                self.stats.refused += 1
+                return 'Too many tables'
+            num_players = msg.get('players', 2)
+            if not num_players in [2, 3]: return 'Illegal number of players'
+            seats = msg.get('seats', [0])
+            bots = msg.get('bots', [])
+            if not isinstance(seats, list) or not isinstance(bots, list): return 'Illegal seats'
+            if any(not _is_seat(s, num_players) for s in itertools.chain(seats, bots)): return 'Illegal seat'
+            if len(set(seats) | set(bots)) != len(seats) + len(bots): return 'Duplicate seats'
+            if 'seed' in msg: return 'The server deals the cards'
+            id = next(self._ids)
+            seed = None if self._seed is None else game_seed(self._seed, id)
+            table = _Table(id, Game(num_players, seed=seed), bots)
+            for seat in seats:
+                table.sit(conn, seat)
+            self._tables[table.id] = table
+            self.stats.tables += 1
+            table.task = asyncio.ensure_future(self._run(table))
+            return {'op': 'created', 'table': table.id, 'seats': seats}
+        elif op == 'join':
+            table = self._tables.get(msg.get('table'))
+            if table is None: return 'No table {0}'.format(msg.get('table'))
+            seat = msg.get('seat')
+            if not _is_seat(seat, table.game.num_player): return 'Illegal seat'
+            if not table.sit(conn, seat): return 'Seat {0} is not free'.format(seat)
+            return {'op': 'joined', 'table': table.id, 'seat': seat}
+        return 'Unknown op {0}'.format(op)
+
+    async def _run(self, table:'_Table'):
+        game = table.game
+        try:
+            if not table.ready.is_set():
+                try:
+                    await asyncio.wait_for(table.ready.wait(), self.join_timeout)
+                except asyncio.TimeoutError:
+                    pass
+            table.started = True
+            while game.state != GameState.Done:
+                conn = table.seats[game.turn]
+                action = None
+                if conn is not None and not conn.closed: action = await self._ask(table, conn)
+                if action is None: action = self._bot(game)
+                if not game.action(game.action_to_answer(action)):
+                    raise Exception('Illegal action {0} at table {1}'.format(action, table.id))
+                table.ply += 1
+                self.stats.decisions += 1
+                # let the other tables run between the moves of bots
+                if conn is None: await asyncio.sleep(0)
+
+            msg = {'op': 'done', 'table': table.id, 'winner': game.winner(),
+                   'scores': [p.score() for p in game._players]}
+            for conn in table.connections():
+                try:
+                    await asyncio.wait_for(conn.send(msg), self.turn_timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self.stats.finished += 1
+        except Exception as e:
+            # e.g. a failing bot: the table is closed, and its players told so
+            msg = {'op': 'error', 'for': None, 'table': table.id, 'message': str(e)}
+            for conn in table.connections():
+                conn.post(msg)
+        finally:
+            del self._tables[table.id]
+            for conn in table.connections():
+                conn.tables.discard(table)
+
+    # the answer of the seat to act, or None when the bot has to answer
+    async def _ask(self, table:'_Table', conn:'_Connection') -> Union[None, int]:
+        game = table.game
+        legal = game.legal_action_list()
+        loop = asyncio.get_running_loop()
+        table.waiting = loop.create_future()
+        table.legal = legal
+        deadline = loop.time() + self.turn_timeout
+        try:
+            msg = {'op': 'request', 'table': table.id, 'ply': table.ply, 'seat': game.turn, 'legal': legal,
+                   'view': view(game, game.turn)}
+            await asyncio.wait_for(conn.send(msg), self.turn_timeout)
+            return await asyncio.wait_for(table.waiting, max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            action = self._bot(game)
+            conn.post({'op': 'timeout', 'table': table.id, 'ply': table.ply, 'action': action})
+            return action
+        finally:
+            table.waiting = None
+
+
+# json numbers that are ints; true and 17.0 are not
+def _is_int(x) -> bool:
+    return type(x) is int
+
+
+def _is_seat(x, num_players:int) -> bool:
+    return _is_int(x) and 0 <= x < num_players
+
+
+class _Table(object):
+    def __init__(self, id:int, game:Game, bots:Sequence[int]):
+        self.id = id
+        self.game = game
+        self.ply = 0
+        # the connection at each seat; None for a bot or a free seat
+        self.seats = [None] * game.num_player
+        self.free = set(range(game.num_player)) - set(bots)
+        self.ready = asyncio.Event()
+        if not self.free: self.ready.set()
+        self.started = False
+        self.waiting = None
+        self.legal = None
+        self.task = None
+
+    def sit(self, conn:'_Connection', seat:int) -> bool:
+        if self.started or not seat in self.free: return False
+        self.free.discard(seat)
+        self.seats[seat] = conn
+        conn.tables.add(self)
+        if not self.free: self.ready.set()
+        return True
+
+    def release(self, conn:'_Connection'):
+        for seat, c in enumerate(self.seats):
+            if c is conn: self.seats[seat] = None
+        if self.waiting is not None and not self.waiting.done() and self.seats[self.game.turn] is None:
+            self.waiting.set_result(None)
+
+    def answer(self, conn:'_Connection', ply:int, action:int) -> Union[None, str]:
+        if self.waiting is None or self.waiting.done() or ply != self.ply:
+            return 'Table {0} is not waiting for ply {1}'.format(self.id, ply)
+        if self.seats[self.game.turn] is not conn: return 'Not your turn at table {0}'.format(self.id)
+        if not _is_int(action) or not action in self.legal: return 'Illegal action {0} at table {1}'.format(action, self.id)
+        self.waiting.set_result(action)
+        return None
+
+    def connections(self) -> Set['_Connection']:
+        return set(c for c in self.seats if c is not None and not c.closed)
+
+
+class _Connection(object):
+    def __init__(self, writer:asyncio.StreamWriter, max_queued:int):
+        self._writer = writer
+        self._queue = asyncio.Queue(max_queued)
+        self.tables = set()
+        self.closed = False
+        self.handler = None
+        self._task = asyncio.ensure_future(self._flush())
+
+    # waits while the queue is full
+    async def send(self, msg:Union[None, dict]):
+        if self.closed or msg is None: return
+        await self._queue.put(encode_frame(msg))
+
+    # for notices that must not wait; dropped when the queue is full
+    def post(self, msg:dict):
+        if self.closed or self._queue.full(): return
+        self._queue.put_nowait(encode_frame(msg))
+
+    # waits, for at most timeout seconds, until the queued frames are written
+    async def flush(self, timeout:float):
+        if self.closed: return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def close(self):
+        if self.closed: return
+        self.closed = True
+        self._task.cancel()
+        self._writer.close()
+
+    async def _flush(self):
+        queue = self._queue
+        writer = self._writer
+        try:
+            while True:
+                writer.write(await queue.get())
+                cnt = 1
+                # frames are written together while they are queued; the socket is drained when the queue is empty
+                while not queue.empty():
+                    writer.write(queue.get_nowait())
+                    cnt += 1
+                await writer.drain()
+                for _ in range(cnt):
+                    queue.task_done()
+        except (ConnectionError, asyncio.CancelledError):
+            self.closed = True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Go-Stop table server')
+    parser.add_argument('--path', default=None, help='unix socket to listen on')
+    parser.add_argument('--port', type=int, default=7007, help='TCP port on localhost, without --path')
+    parser.add_argument('--max-tables', type=int, default=10000)
+    parser.add_argument('--turn-timeout', type=float, default=10.0)
+    parser.add_argument('--join-timeout', type=float, default=10.0)
+    args = parser.parse_args()
+
+    server = TableServer(args.path, port=args.port, max_tables=args.max_tables, turn_timeout=args.turn_timeout,
+                         join_timeout=args.join_timeout)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print(server.stats)
@@ -0,0 +1,169 @@
+from typing import *
+
+import numpy as np
+
+from .logic import (Game, Card, CardMask, CARDS, ALL_CARDS, NUM_ACTIONS, ACTION_THROW, ACTION_SHAKE, ACTION_STOP,
+                    ACTION_CAPTURE, ZONE_HAND, ZONE_ACQUIRED, ZONE_SHAKED, ZONE_BOARD, ZONE_CAPTURED,
+                    _Z_STOCK, _zobrist, _rotl64, _splitmix64, _SEED_MASK)
+
+
+# card symmetries: the two plain pi of a month (Jan1/Jan2, ..., Nov1/Nov2) and the two double jokers
+# (JokerDouble1/JokerDouble2) have the same month, category and pi count, so swapping the cards of a pair
+# everywhere in a state gives a state with the same play and the same scores. the cards of a pair are
+# adjacent codes, and a set of swapped pairs is a mask of the bits of their first cards (swaps below).
+#
+# the canonical form of a state swaps every pair whose first card comes after its second one, in the order:
+#
+#   full state (canonical_key)        hand, acquired and shaked cards of every player, board, captured,
+#                                     cards of an unfinished turn, then the stock from the top
+#   observation (canonical_obs_key)   hand of the observer, board, captured, cards of an unfinished turn,
+#                                     acquired and shaked cards of every player; unseen cards are alike
+#
+# pairs that are never told apart (e.g. both in the same hand) are left as they are. equivalent states get
+# the same key, and the actions of a state map to the canonical frame with permute_action(action, swaps).
+
+# first cards of the pairs; the second card of a pair is the next bit
+PAIR_MASK = int(CardMask(c for c in CARDS[1:] if c._code.name[-1] == '1'))
+SYMMETRIC_CARDS = CardMask(PAIR_MASK | (PAIR_MASK << 1))
+
+
+# pairs swapped by the canonical form of game; with observer, of what observer can see
+def canonical_swaps(game:Game, observer:Union[None, int]=None) -> int:
+    if observer is None:
+        zones = []
+        for p in game._players:
+            zones += [p._hand, p._acquired, p._shaked]
+        zones += [game._board.as_set(), game._captured, CardMask(game._pending)]
+    else:
+        zones = [game._players[observer]._hand, game._board.as_set(), game._captured, CardMask(game._pending)]
+        for p in game._players:
+            zones += [p._acquired, p._shaked]
+
+    swaps = 0
+    undecided = PAIR_MASK
+    seen = 0
+    for zone in zones:
+        if not undecided: return swaps
+        zone = int(zone)
+        first = zone & undecided
+        second = (zone >> 1) & undecided
+        # a pair is decided by the first zone holding one of its cards but not the other
+        swaps |= second & ~first
+        undecided &= ~(first ^ second)
+        seen |= zone
+    if observer is not None: return swaps
+
+    # both cards left in the stock: the one flipped first comes first
+    unseen = int(ALL_CARDS) & ~seen
+    undecided &= unseen & (unseen >> 1)
+    if undecided:
+        deck = game._deck
+        for i in range(game._stock_pos, len(deck)):
+            bit = 1 << (deck[i]._value - 1)
+            if bit & undecided:
+                undecided &= ~bit
+            elif (bit >> 1) & undecided:
+                swaps |= bit >> 1
+                undecided &= ~(bit >> 1)
+            if not undecided: break
+    return swaps
+
+
+def permute_mask(cards:int, swaps:int) -> CardMask:
+    cards = int(cards)
+    t = (cards ^ (cards >> 1)) & swaps
+    return CardMask(cards ^ t ^ (t << 1))
+
+
+def permute_card(card:Card, swaps:int) -> Card:
+    idx = card._value - 1
+    if (swaps >> idx) & 1: return CARDS[card._value + 1]
+    if idx > 0 and (swaps >> (idx - 1)) & 1: return CARDS[card._value - 1]
+    return card
+
+
+# the action code that plays the same move in the state permuted by swaps
+def permute_action(action:int, swaps:int) -> int:
+    if ACTION_THROW <= action < ACTION_STOP:
+        base = ACTION_THROW if action < ACTION_SHAKE else ACTION_SHAKE
+    elif ACTION_CAPTURE <= action < NUM_ACTIONS:
+        base = ACTION_CAPTURE
+    else:
+        return action
+    return base + permute_card(CARDS[action - base + 1], swaps)._value - 1
+
+
+# index arrays of a permutation: x[card_permutation(swaps)] permutes an array over cards (CardCode.value - 1),
+# e.g. the planes of an observation, and x[action_permutation(swaps)] an array over action codes, e.g. a policy.
+# a permutation is its own inverse.
+def card_permutation(swaps:int) -> np.ndarray:
+    return np.array([permute_card(c, swaps)._value - 1 for c in CARDS[1:]], dtype=np.int64)
+
+
+def action_permutation(swaps:int) -> np.ndarray:
+    return np.array([permute_action(a, swaps) for a in range(NUM_ACTIONS)], dtype=np.int64)
+
+
+# zobrist hash of the canonical form of game, for transposition tables. it is game.zhash when no pair is swapped.
+# swaps, when given, must be canonical_swaps(game).
+def canonical_key(game:Game, swaps:Union[None, int]=None) -> int:
+    if swaps is None: swaps = canonical_swaps(game)
+    if not swaps: return game.zhash
+
+    board = game._board
+    h = board._zhash ^ _zobrist(board._cards, ZONE_BOARD) ^ _zobrist(permute_mask(board._cards, swaps), ZONE_BOARD)
+    if game._captured: h ^= _zobrist(permute_mask(game._captured, swaps), ZONE_CAPTURED)
+    for i, p in enumerate(game._players):
+        h ^= _rotl64(_player_zobrist(p, swaps), 13 * i)
+    deck = game._deck
+    n = len(deck)
+    for i in range(game._stock_pos, n):
+        h ^= _Z_STOCK[n - 1 - i][permute_card(deck[i], swaps)._value]
+    return h ^ game._scalar_zhash([permute_card(c, swaps) for c in game._pending])
+
+
+# hash of the canonical form of what observer (the turn player by default) sees, to deduplicate training samples:
+# two states get the same key when no player can be told apart from the other by observer.
+def canonical_obs_key(game:Game, observer:Union[None, int]=None) -> int:
+    if observer is None: observer = game.turn
+    swaps = canonical_swaps(game, observer)
+    board = game._board
+    h = (_zobrist(permute_mask(game._players[observer]._hand, swaps), ZONE_HAND)
+         ^ board._zhash ^ _zobrist(board._cards, ZONE_BOARD) ^ _zobrist(permute_mask(board._cards, swaps), ZONE_BOARD))
+    if game._captured: h ^= _zobrist(permute_mask(game._captured, swaps), ZONE_CAPTURED)
+    for i, p in enumerate(game._players):
+        h ^= _rotl64(_zobrist(permute_mask(p._acquired, swaps), ZONE_ACQUIRED)
+                     ^ _zobrist(permute_mask(p._shaked, swaps), ZONE_SHAKED), 13 * i)
+    hidden = (observer, game.stock_size, tuple(len(p._hand) for p in game._players))
+    return (h ^ game._scalar_zhash([permute_card(c, swaps) for c in game._pending])
+            ^ _splitmix64(hash(hidden) & _SEED_MASK))
+
+
+# a copy of game in its canonical form (with swaps, in the form permuted by swaps); its zhash is canonical_key(game)
+def canonical_game(game:Game, swaps:Union[None, int]=None) -> Game:
+    if swaps is None: swaps = canonical_swaps(game)
+    res = game.clone()
+    if not swaps: return res
+    # the seed no longer deals the permuted deck
+    res._seed = None
+    res._deck = tuple(permute_card(c, swaps) for c in game._deck)
+    res._stock_zhash = res._stock_zobrist()
+    res._captured = permute_mask(game._captured, swaps)
+    res._public = permute_mask(game._public, swaps)
+    res._pending = tuple(permute_card(c, swaps) for c in game._pending)
+    for p in res._players:
+        p._zhash = _player_zobrist(p, swaps)
+        p._hand = permute_mask(p._hand, swaps)
+        p._acquired = permute_mask(p._acquired, swaps)
+        p._shaked = permute_mask(p._shaked, swaps)
+    board = res._board
+    cards = permute_mask(board._cards, swaps)
+    board._zhash ^= _zobrist(board._cards, ZONE_BOARD) ^ _zobrist(cards, ZONE_BOARD)
+    board._cards = cards
+    return res
+
+
+## Functions, whose names start with an underscore, should not be called by the user
+def _player_zobrist(p, swaps:int) -> int:
+    return (_zobrist(permute_mask(p._hand, swaps), ZONE_HAND) ^ _zobrist(permute_mask(p._acquired, swaps), ZONE_ACQUIRED)
+            ^ _zobrist(permute_mask(p._shaked, swaps), ZONE_SHAKED))
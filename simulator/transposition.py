@@ -0,0 +1,146 @@
+from typing import *
+from collections import OrderedDict
+
+
+# bounded transposition tables keyed by Game.zhash.
+#
+#   DepthPreferredTable  two slots per bucket: the first keeps the entry searched deepest, the second
+#                        always takes the newest entry. fixed memory, no reordering on hits.
+#   LRUTable             keeps the most recently used entries.
+#
+# both store an opaque value with the depth it was searched to, and a lookup can ask for a minimum depth.
+# storing a state again replaces its entry.
+
+class TableStats(object):
+    def __init__(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    @property
+    def hit_rate(self) -> float:
+        if self.probes == 0: return 0.0
+        return self.hits / self.probes
+
+    def __str__(self):
+        return ('{0} probes, {1} hits ({2:.1%}), {3} stores, {4} replacements'
+                .format(self.probes, self.hits, self.hit_rate, self.stores, self.replacements))
+
+
+class DepthPreferredTable(object):
+    def __init__(self, capacity:int=1 << 20):
+        if capacity < 2: raise Exception('Capacity must be at least 2')
+        self._num_buckets = capacity // 2
+        size = 2 * self._num_buckets
+        # slot 2 * bucket is depth-preferred, slot 2 * bucket + 1 is always-replace
+        self._keys = [None] * size
+        self._depths = [0] * size
+        self._values = [None] * size
+        self._len = 0
+        self.stats = TableStats()
+
+    @property
+    def capacity(self) -> int:
+        return len(self._keys)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, key:int) -> bool:
+        return self._find(key) >= 0
+
+    def get(self, key:int, min_depth:int=0, default=None):
+        self.stats.probes += 1
+        slot = self._find(key)
+        if slot < 0 or self._depths[slot] < min_depth: return default
+        self.stats.hits += 1
+        return self._values[slot]
+
+    def store(self, key:int, value, depth:int=0):
+        self.stats.stores += 1
+        keys = self._keys
+        first = 2 * (key % self._num_buckets)
+        old = keys[first]
+        if old == key or old is None or depth >= self._depths[first]:
+            if old != key and old is not None:
+                # the deeper entry moves to the always-replace slot rather than being dropped,
+                # and the key leaves that slot if it was there. only an entry of another key counts as replaced
+                if keys[first + 1] == key: self._drop(first + 1)
+                self._put(first + 1, old, self._depths[first], self._values[first])
+                self._drop(first)
+            self._put(first, key, depth, value)
+        else:
+            self._put(first + 1, key, depth, value)
+
+    def clear(self):
+        size = len(self._keys)
+        self._keys = [None] * size
+        self._depths = [0] * size
+        self._values = [None] * size
+        self._len = 0
+
+    ## Functions, whose names start with an underscore, should not be called by the user
+    def _find(self, key:int) -> int:
+        first = 2 * (key % self._num_buckets)
+        if self._keys[first] == key: return first
+        if self._keys[first + 1] == key: return first + 1
+        return -1
+
+    def _put(self, slot:int, key:int, depth:int, value):
+        old = self._keys[slot]
+        if old is None: self._len += 1
+        elif old != key: self.stats.replacements += 1
+        self._keys[slot] = key
+        self._depths[slot] = depth
+        self._values[slot] = value
+
+    def _drop(self, slot:int):
+        self._keys[slot] = None
+        self._values[slot] = None
+        self._len -= 1
+
+
+class LRUTable(object):
+    def __init__(self, capacity:int=1 << 20):
+        if capacity < 1: raise Exception('Capacity must be at least 1')
+        self._capacity = capacity
+        # key -> (depth, value), least recently used first
+        self._entries = OrderedDict()
+        self.stats = TableStats()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key:int) -> bool:
+        return key in self._entries
+
+    def get(self, key:int, min_depth:int=0, default=None):
+        self.stats.probes += 1
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < min_depth: return default
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry[1]
+
+    def store(self, key:int, value, depth:int=0):
+        self.stats.stores += 1
+        entries = self._entries
+        entries[key] = (depth, value)
+        entries.move_to_end(key)
+        if len(entries) > self._capacity:
+            entries.popitem(last=False)
+            self.stats.replacements += 1
+
+    def clear(self):
+        self._entries.clear()
+
+
+def make_table(capacity:int=1 << 20, replacement:str='depth') -> Union[DepthPreferredTable, LRUTable]:
+    if replacement == 'depth': return DepthPreferredTable(capacity)
+    elif replacement == 'lru': return LRUTable(capacity)
+    raise Exception('Unknown replacement scheme: {0}'.format(replacement))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# simulator is a namespace package run from the repository root, not an installed one
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,57 @@
+import random
+
+import numpy as np
+import pytest
+
+from simulator.logic import Game, GameState, CardMask, CARDS, game_seed
+from simulator.batch import BatchGame, LOC_BOARD, LOC_CAPTURED, LOC_HAND, LOC_ACQUIRED
+
+
+# BatchGame against Game on the same decks, with the same random legal actions, compared every ply
+
+def _cards(row:np.ndarray) -> CardMask:
+    return CardMask(CARDS[i + 1] for i in np.nonzero(row)[0])
+
+
+def _compare(game:Game, batch:BatchGame, i:int):
+    assert batch.state[i] == game.state.value
+    if game.state == GameState.Done:
+        assert (batch.winner[i] if batch.winner[i] >= 0 else None) == game.winner()
+    else:
+        assert batch.turn[i] == game.turn
+    loc = batch._loc[i]
+    for k, p in enumerate(game._players):
+        assert _cards(loc == LOC_HAND + k) == p._hand
+        assert _cards(loc == LOC_ACQUIRED + k) == p._acquired
+        assert _cards(batch._shaked[i] & (loc == LOC_HAND + k)) == p._shaked
+        assert batch._go_cnt[i, k] == p._go_cnt
+        assert batch._shake_cnt[i, k] == p._shake_cnt
+        assert batch._bomb_cnt[i, k] == p._bomb_cnt
+        assert batch._bomb_card_cnt[i, k] == p._bomb_card_cnt
+    assert _cards(loc == LOC_BOARD) == game._board.as_set()
+    assert _cards(loc == LOC_CAPTURED) == game._captured
+    assert len(batch._deck[i]) - batch._stock_pos[i] == game.stock_size
+    assert list(batch.scores()[i]) == [p.score() for p in game._players]
+
+
+@pytest.mark.parametrize('num_players', [2, 3])
+def test_batch_matches_game(num_players:int):
+    rng = random.Random(num_players)
+    n = 200
+    games = [Game(num_players, seed=game_seed(1, i)) for i in range(n)]
+    batch = BatchGame(n, num_players)
+    batch.deal(np.array([[c._value - 1 for c in g.deck] for g in games]))
+    for i, g in enumerate(games): _compare(g, batch, i)
+
+    while not batch.done.all():
+        legal = batch.legal_actions()
+        actions = np.full(n, -1, dtype=np.int64)
+        for i, g in enumerate(games):
+            if g.state == GameState.Done: continue
+            codes = g.legal_action_list()
+            assert codes == list(np.nonzero(legal[i])[0])
+            actions[i] = rng.choice(codes)
+            assert g.action(g.action_to_answer(int(actions[i])))
+        assert (batch.step(actions) == (actions >= 0)).all()
+        for i, g in enumerate(games): _compare(g, batch, i)
+    assert all(g.state == GameState.Done for g in games)
@@ -0,0 +1,57 @@
+import random
+
+import numpy as np
+import pytest
+
+from simulator.logic import Game, GameState, CardMask, CARDS, ALL_CARDS, game_seed
+from simulator.encoder import ObservationEncoder, PLANE_HAND, PLANE_CAPTURED, PLANE_ACQUIRED
+from simulator.determinize import unseen_cards
+from simulator.belief import location_probabilities
+
+
+def _cards(plane:np.ndarray) -> CardMask:
+    return CardMask(CARDS[i + 1] for i in np.nonzero(plane)[0])
+
+
+# every card is in exactly one card plane of the observer, or unseen by it
+@pytest.mark.parametrize('num_players', [2, 3])
+def test_every_card_is_placed_once(num_players:int):
+    rng = random.Random(num_players)
+    encoder = ObservationEncoder(num_players)
+    obs = encoder.new_buffer()
+    # the shaked cards of the observer are in its hand, those of the others are shown
+    zones = list(range(PLANE_HAND, PLANE_ACQUIRED + num_players))
+    zones += list(range(PLANE_ACQUIRED + num_players + 1, PLANE_ACQUIRED + 2 * num_players))
+    captured = 0
+    for i in range(100):
+        game = Game(num_players, seed=game_seed(3, i))
+        while game.state != GameState.Done:
+            encoder.encode(game, obs)
+            cards = [_cards(obs[k]) for k in zones] + [unseen_cards(game, game.turn)]
+            assert sum(len(c) for c in cards) == len(ALL_CARDS)
+            union = CardMask()
+            for c in cards: union |= c
+            assert union == ALL_CARDS
+            if game.state == GameState.AskCardToCapture and game._captured:
+                assert _cards(obs[PLANE_CAPTURED]) == game._captured
+                captured += 1
+            game._act(rng.choice(game.legal_action_list()))
+    assert captured > 0
+
+
+def test_belief_planes():
+    rng = random.Random(0)
+    plain = ObservationEncoder(3)
+    beliefs = ObservationEncoder(3, max_batch=4, beliefs=True)
+    assert beliefs.shape == (plain.num_planes + 3, plain.shape[1])
+    games = [Game(3, seed=game_seed(4, i)) for i in range(4)]
+    for _ in range(20):
+        for game in games:
+            if game.state != GameState.Done: game._act(rng.choice(game.legal_action_list()))
+    out = beliefs.encode_batch(games, beliefs.new_buffer(4))
+    n = plain.num_planes - 1
+    for game, obs in zip(games, out):
+        expected = plain.encode(game, plain.new_buffer())
+        assert (obs[:n] == expected[:n]).all()
+        assert (obs[-1] == expected[-1]).all()
+        assert np.allclose(obs[n:-1], location_probabilities(game))
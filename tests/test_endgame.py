@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from simulator.logic import Game, GameState, game_seed
+from simulator.endgame import EndgameSolver, payoff
+
+
+# plain minimax (max^n for three players), ties to the first legal action
+def _minimax(game:Game):
+    if game.state == GameState.Done: return payoff(game)
+    best = None
+    for action in game.legal_action_list():
+        game.do(game.action_to_answer(action))
+        value = _minimax(game)
+        game.undo()
+        if best is None or value[game.turn] > best[game.turn]: best = value
+    return best
+
+
+def _endgames(num_players:int, stock:int, num_games:int):
+    rng = random.Random(num_players)
+    for i in range(num_games):
+        game = Game(num_players, seed=game_seed(11, i))
+        while game.state != GameState.Done and game.stock_size > stock:
+            game._act(rng.choice(game.legal_action_list()))
+        if game.state != GameState.Done: yield game
+
+
+@pytest.mark.parametrize('symmetric', [False, True])
+def test_alphabeta_matches_minimax(symmetric:bool):
+    for game in _endgames(2, 4, 100):
+        expected = _minimax(game)
+        solver = EndgameSolver(perfect_information=True, symmetric=symmetric)
+        assert solver.solve(game) == expected
+        values = solver.action_values(game)
+        assert max(values.values()) == expected[game.turn]
+        assert values[solver.best_action(game)] == expected[game.turn]
+
+
+def test_maxn_matches_minimax():
+    for game in _endgames(3, 3, 60):
+        assert EndgameSolver(perfect_information=True).solve(game) == _minimax(game)
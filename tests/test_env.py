@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from simulator.logic import Game, GameState, game_seed
+from simulator.encoder import ObservationEncoder
+from simulator.env import GoStopVectorEnv
+
+
+def _random_actions(masks:np.ndarray, rng:np.random.Generator) -> np.ndarray:
+    return np.array([rng.choice(np.flatnonzero(m)) for m in masks])
+
+
+def test_backends_play_the_same_games():
+    rng = np.random.default_rng(0)
+    with GoStopVectorEnv(6, 3, backend='sync', seed=1) as sync, \
+         GoStopVectorEnv(6, 3, backend='subprocess', num_workers=2, seed=1) as sub:
+        expected, played = sync.reset(), sub.reset()
+        done = 0
+        for _ in range(300):
+            for a, b in zip(expected, played):
+                assert (a == b).all()
+            actions = _random_actions(expected[-1], rng)
+            expected, played = sync.step(actions), sub.step(actions)
+            done += expected[2].sum()
+        assert done > 0
+
+
+# a finished game is reset in place: the step that ends it returns its rewards and the start of the next game
+def test_auto_reset():
+    rng = np.random.default_rng(1)
+    encoder = ObservationEncoder(2)
+    game = Game(2, seed=game_seed(2, 0))
+    game.reset()
+    finished = 0
+    with GoStopVectorEnv(1, 2, seed=2) as env:
+        obs, masks = env.reset()
+        while finished < 3:
+            action = _random_actions(masks, rng)
+            obs, rewards, dones, masks = env.step(action)
+            assert game.action(game.action_to_answer(int(action[0])))
+            assert dones[0] == (game.state == GameState.Done)
+            if dones[0]:
+                finished += 1
+                assert rewards.sum() == 0
+                if game.winner() is not None: assert rewards[0, game.winner()] == game._players[game.winner()].score()
+                game.reset()
+            else:
+                assert (rewards == 0).all()
+            assert (obs[0] == encoder.encode(game, encoder.new_buffer())).all()
+            assert (masks[0] == np.frombuffer(game.legal_actions(), dtype=np.bool_)).all()
+
+
+@pytest.mark.parametrize('backend', ['sync', 'subprocess'])
+def test_illegal_action(backend:str):
+    rng = np.random.default_rng(2)
+    with GoStopVectorEnv(4, 2, backend=backend, num_workers=2, seed=3) as env:
+        obs, masks = env.reset()
+        before = obs.copy(), masks.copy()
+        actions = _random_actions(masks, rng)
+        actions[1] = np.flatnonzero(~masks[1])[0]
+        with pytest.raises(Exception, match='env 1'):
+            env.step(actions)
+        # the games of the illegal action did not move, and the env goes on
+        assert (obs[:2] == before[0][:2]).all() and (masks[:2] == before[1][:2]).all()
+        for _ in range(20):
+            obs, rewards, dones, masks = env.step(_random_actions(masks, rng))
+            assert masks.any(axis=1).all()
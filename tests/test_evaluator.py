@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from simulator.logic import Game, GameState, NUM_ACTIONS, game_seed
+from simulator.encoder import ObservationEncoder
+from simulator.evaluator import BatchedEvaluator, LinearModel
+
+
+def _games(num:int) -> list:
+    rng = random.Random(num)
+    games = []
+    for i in range(num):
+        game = Game(2, seed=game_seed(9, i))
+        for _ in range(i % 11):
+            if game.state != GameState.Done: game._act(rng.choice(game.legal_action_list()))
+        if game.state != GameState.Done: games.append(game)
+    return games
+
+
+# the model on one game at a time
+def _expected(model:LinearModel, game:Game):
+    encoder = ObservationEncoder(2)
+    obs = encoder.encode(game, encoder.new_buffer())[None]
+    masks = np.frombuffer(game.legal_actions(), dtype=np.bool_)[None]
+    policies, values = model(obs, masks)
+    return policies[0], float(values[0])
+
+
+# a model that holds its batch until released
+class _Gate(object):
+    def __init__(self, model:LinearModel):
+        self.model = model
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, obs:np.ndarray, masks:np.ndarray):
+        self.entered.set()
+        self.release.wait()
+        return self.model(obs, masks)
+
+
+def test_concurrent_submitters_are_batched():
+    model = LinearModel(seed=0)
+    games = _games(64)
+    results = [None] * len(games)
+
+    def submitter(k:int):
+        for i in range(k, len(games), 8):
+            results[i] = evaluator.evaluate(games[i])
+
+    with BatchedEvaluator(model, max_batch=8, max_latency=0.05) as evaluator:
+        threads = [threading.Thread(target=submitter, args=(k,)) for k in range(8)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+    assert evaluator.stats.evaluations == len(games)
+    assert evaluator.stats.mean_batch > 1
+    for game, (policy, value) in zip(games, results):
+        expected_policy, expected_value = _expected(model, game)
+        assert policy.shape == (NUM_ACTIONS,)
+        assert np.allclose(policy, expected_policy, atol=1e-5)
+        assert value == pytest.approx(expected_value, abs=1e-5)
+
+
+def test_latency_flushes_a_partial_batch():
+    with BatchedEvaluator(LinearModel(seed=0), max_batch=256, max_latency=0.01) as evaluator:
+        start = time.perf_counter()
+        evaluator.evaluate(_games(1)[0])
+        assert time.perf_counter() - start < 5.0
+        assert evaluator.stats.batches == 1 and evaluator.stats.evaluations == 1
+
+
+def test_cancelled_and_failing_batches():
+    gate = _Gate(LinearModel(seed=0))
+    games = _games(8)
+    with BatchedEvaluator(gate, max_batch=4, max_latency=0.01) as evaluator:
+        first = evaluator.submit(games[0])
+        assert gate.entered.wait(5.0)
+        # queued behind the batch in the model
+        waiting = [evaluator.submit(game) for game in games[1:4]]
+        assert waiting[1].cancel()
+        gate.release.set()
+        assert first.result(5.0)[0].shape == (NUM_ACTIONS,)
+        assert waiting[0].result(5.0) and waiting[2].result(5.0)
+        assert waiting[1].cancelled()
+        assert evaluator.stats.evaluations == 3
+
+        # a model answer of the wrong shape fails its batch only
+        gate.model = lambda obs, masks: (np.zeros((len(obs), NUM_ACTIONS)), np.zeros(0))
+        with pytest.raises(Exception):
+            evaluator.evaluate(games[4])
+        gate.model = LinearModel(seed=0)
+        assert evaluator.evaluate(games[5])[0].shape == (NUM_ACTIONS,)
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from simulator.logic import Game, GameState, ACTION_STOP, game_seed
+
+
+# a game that is played to the end leaves no card in any hand, bonus cards thrown from the hand included
+@pytest.mark.parametrize('num_players', [2, 3])
+def test_every_hand_runs_out(num_players:int):
+    rng = random.Random(num_players)
+    for i in range(1000):
+        game = Game(num_players, seed=game_seed(5, i))
+        always_go = i % 2 == 1
+        while game.state != GameState.Done:
+            legal = game.legal_action_list()
+            if always_go and ACTION_STOP in legal: legal.remove(ACTION_STOP)
+            game._act(rng.choice(legal))
+        if always_go or game.winner() is None:
+            assert all(len(p._hand) == 0 and p._bomb_card_cnt == 0 for p in game._players)
+
+
+# the incremental zobrist hash agrees with a recount after every move, and undo() restores it
+@pytest.mark.parametrize('num_players', [2, 3])
+def test_zhash_across_do_and_undo(num_players:int):
+    rng = random.Random(num_players)
+    for i in range(200):
+        game = Game(num_players, seed=game_seed(6, i))
+        hashes = [game.zhash]
+        while game.state != GameState.Done:
+            legal = game.legal_action_list()
+            if rng.random() < 0.3:
+                # a move that is taken back
+                before = game.zhash
+                assert game.do(game.action_to_answer(rng.choice(legal)))
+                game._check_zhash()
+                assert game.undo()
+                assert game.zhash == before
+            else:
+                assert game.do(game.action_to_answer(rng.choice(legal)))
+                hashes.append(game.zhash)
+            game._check_zhash()
+            assert game.zhash == hashes[-1]
+        # the whole game is taken back
+        while hashes:
+            assert game.zhash == hashes.pop()
+            game._check_zhash()
+            game.undo()
+        assert not game.undo()
@@ -0,0 +1,19 @@
+import random
+
+import pytest
+
+from simulator.logic import Game, GameState, game_seed
+from simulator.mcts import MCTSPlayer
+
+
+@pytest.mark.parametrize('limits', [{'simulations': 0}, {'simulations': None, 'time_limit': 1e-9}])
+def test_search_without_budget(limits:dict):
+    player = MCTSPlayer(seed=0, **limits)
+    rng = random.Random(0)
+    for i in range(5):
+        game = Game(2, seed=game_seed(9, i))
+        while game.state != GameState.Done:
+            legal = game.legal_action_list()
+            action = player.search(game) if game.turn == 0 else rng.choice(legal)
+            assert action in legal
+            game._act(action)
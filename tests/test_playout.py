@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from simulator.logic import Game, GameState, game_seed
+from simulator.playout import playout, random_policy, greedy_policy
+from simulator.selfplay import play_game, policy_seed, random_policy as selfplay_random_policy
+
+
+def _state(game:Game):
+    attrs = dict(game.__dict__)
+    for name in ['_undo', '_answer', '_players', '_board']:
+        del attrs[name]
+    return attrs, [p.__dict__ for p in game._players], game._board.__dict__
+
+
+# the same moves through Game._act(), one at a time
+def _play_acts(game:Game, policy, max_plies, rng:random.Random):
+    plies = 0
+    while game.state != GameState.Done and (max_plies is None or plies < max_plies):
+        legal = game.legal_action_list()
+        game._act(rng.choice(legal) if policy is random_policy else policy(game, legal))
+        plies += 1
+
+
+@pytest.mark.parametrize('num_players', [2, 3])
+def test_same_games_as_selfplay(num_players:int):
+    n = 2000
+    expected = [play_game([selfplay_random_policy] * num_players, num_players, game_seed(7, i))[:2] for i in range(n)]
+    played = []
+    for i in range(n):
+        game = Game(num_players, seed=game_seed(7, i))
+        scores = playout(game, rng=random.Random(policy_seed(7, i)))
+        played.append((game.winner(), scores))
+    assert played == expected
+
+
+@pytest.mark.parametrize('num_players', [2, 3])
+def test_int_path_matches_act(num_players:int):
+    for i in range(600):
+        policy = greedy_policy if i % 3 == 0 else random_policy
+        # from the deal or from a few moves into the game, to the end or for a few plies
+        game = Game(num_players, seed=game_seed(12, i))
+        moves = random.Random(i)
+        for _ in range(i % 7):
+            if game.state != GameState.Done: game._act(moves.choice(game.legal_action_list()))
+        other = game.clone()
+        max_plies = i % 13 if i % 5 == 0 else None
+
+        playout(game, policy, max_plies, rng=random.Random(i))
+        _play_acts(other, policy, max_plies, random.Random(i))
+        assert _state(game) == _state(other)
+        game._check_zhash()
+        for p in game._players:
+            p._check_counters()
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = 'from simulator.selfplay import play_game, random_policy; play_game([random_policy] * 2, seed=1)'
+
+
+def _run(value:str, cwd:str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, ALPHAGS_PROBE=value, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, '-c', SCRIPT], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+
+
+@pytest.mark.parametrize('value', ['', '0'])
+def test_probe_off(value:str, tmp_path):
+    res = _run(value, str(tmp_path))
+    assert res.stderr == ''
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_probe_to_stderr(tmp_path):
+    for value in ['1', 'stderr']:
+        report = json.loads(_run(value, str(tmp_path)).stderr)
+        assert report['timers']['game.action']['calls'] > 0
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_probe_to_file(tmp_path):
+    _run('probe.jsonl', str(tmp_path))
+    _run('probe.jsonl', str(tmp_path))
+    with open(str(tmp_path / 'probe.jsonl')) as f:
+        assert len(f.readlines()) == 2
@@ -0,0 +1,64 @@
+import random
+
+from simulator.logic import Game, GameState, game_seed
+from simulator.records import RecordWriter, RecordReader
+
+
+def _play(num_players:int, seed:int, rng:random.Random):
+    game = Game(num_players, seed=seed)
+    actions, hashes = [], [game.zhash]
+    while game.state != GameState.Done:
+        action = rng.choice(game.legal_action_list())
+        assert game.action(game.action_to_answer(action))
+        actions.append(action)
+        hashes.append(game.zhash)
+    return game, actions, hashes
+
+
+def test_write_read_replay(tmp_path):
+    path = str(tmp_path / 'games.agsr')
+    rng = random.Random(0)
+    played = [_play(2 + i % 2, game_seed(7, i), rng) for i in range(40)]
+
+    # two writers append to the same file
+    for part in [played[:25], played[25:]]:
+        with RecordWriter(path) as writer:
+            for game, actions, _ in part:
+                writer.write_game(game, actions)
+
+    with RecordReader(path) as reader:
+        assert len(reader) == len(played)
+        for record, (game, actions, hashes) in zip(reader, played):
+            assert record.num_players == game.num_player
+            assert tuple(record.cards()) == game.deck
+            assert list(record.actions) == actions
+            replayed = record.replay()
+            assert replayed.state == GameState.Done
+            assert replayed.zhash == game.zhash
+            assert [p.score() for p in replayed._players] == [p.score() for p in game._players]
+            ply = rng.randrange(len(actions) + 1)
+            assert record.replay(ply).zhash == hashes[ply]
+
+
+def test_truncated_record_is_ignored(tmp_path):
+    path = str(tmp_path / 'games.agsr')
+    rng = random.Random(1)
+    played = [_play(2, game_seed(8, i), rng) for i in range(6)]
+    with RecordWriter(path) as writer:
+        for game, actions, _ in played[:3]:
+            writer.write_game(game, actions)
+    with open(path, 'rb+') as f:
+        f.truncate(len(f.read()) - 5)
+    with RecordReader(path) as reader:
+        assert len(reader) == 2
+
+    # the next writer cuts off the broken record before it appends
+    with RecordWriter(path) as writer:
+        for game, actions, _ in played[3:]:
+            writer.write_game(game, actions)
+    with RecordReader(path) as reader:
+        assert len(reader) == 5
+        kept = played[:2] + played[3:]
+        for record, (game, actions, _) in zip(reader, kept):
+            assert list(record.actions) == actions
+            assert record.replay().zhash == game.zhash
@@ -0,0 +1,25 @@
+import random
+
+from simulator.selfplay import run_selfplay, play_game, random_policy, policy_seed
+from simulator.records import RecordReader
+from simulator.logic import game_seed
+
+
+def test_games_do_not_depend_on_chunks(tmp_path):
+    policies = [random_policy] * 2
+    runs = []
+    for chunk_size in [16, 7]:
+        path = str(tmp_path / '{0}.agsr'.format(chunk_size))
+        run_selfplay(policies, 40, 2, workers=1, chunk_size=chunk_size, seed=5, record_path=path)
+        with RecordReader(path) as reader:
+            runs.append([(bytes(r.deck), bytes(r.actions)) for r in reader])
+    assert runs[0] == runs[1]
+
+    # any game of the run is played again from its seeds alone
+    with RecordReader(str(tmp_path / '16.agsr')) as reader:
+        for k in [0, 13, 39]:
+            _, scores, plies = play_game(policies, 2, game_seed(5, k), random.Random(policy_seed(5, k)))
+            replayed = reader[k].replay()
+            assert play_game(policies, 2, game_seed(5, k)) == (replayed.winner(), scores, plies)
+            assert plies == len(reader[k])
+            assert scores == tuple(p.score() for p in replayed._players)
@@ -0,0 +1,94 @@
+import asyncio
+
+from simulator.logic import Game
+from simulator.server import TableServer, encode_frame, read_frame, view
+from simulator.loadtest import open_connection, run_load
+
+
+async def _request(reader, writer, msg:dict) -> dict:
+    writer.write(encode_frame(msg))
+    return await read_frame(reader)
+
+
+def test_create_validates_seats():
+    async def main():
+        async with TableServer(join_timeout=0.1, seed=0) as server:
+            reader, writer = await open_connection(server.address)
+            for seats, bots in [([0, 0], []), ([0], [0]), ([0, 1], [1]), ([True], []), ([0.0], [1]), (0, [])]:
+                reply = await _request(reader, writer, {'op': 'create', 'players': 2, 'seats': seats, 'bots': bots})
+                assert reply['op'] == 'error' and reply['for'] == 'create'
+            # the server deals the cards
+            reply = await _request(reader, writer, {'op': 'create', 'players': 2, 'seats': [0], 'seed': 3})
+            assert reply['op'] == 'error' and reply['for'] == 'create'
+            assert server.num_tables == 0
+            reply = await _request(reader, writer, {'op': 'create', 'players': 2, 'seats': [1], 'bots': [0]})
+            assert reply == {'op': 'created', 'table': reply['table'], 'seats': [1]}
+            writer.close()
+    asyncio.run(main())
+
+
+def test_act_rejects_non_int_actions():
+    async def main():
+        async with TableServer(turn_timeout=5.0, seed=0) as server:
+            reader, writer = await open_connection(server.address)
+            created = await _request(reader, writer, {'op': 'create', 'players': 2, 'seats': [0, 1]})
+            request = await read_frame(reader)
+            assert request['op'] == 'request' and request['table'] == created['table']
+            action = request['legal'][0]
+            for bad in [float(action), True, str(action), None]:
+                reply = await _request(reader, writer, {'op': 'act', 'table': request['table'],
+                                                        'ply': request['ply'], 'action': bad})
+                assert reply['op'] == 'error' and reply['for'] == 'act'
+            # the table still plays on
+            while True:
+                writer.write(encode_frame({'op': 'act', 'table': request['table'], 'ply': request['ply'],
+                                           'action': request['legal'][0]}))
+                request = await read_frame(reader)
+                if request['op'] == 'done': break
+                assert request['op'] == 'request'
+            writer.close()
+    asyncio.run(main())
+
+
+def test_failing_table_reports_an_error():
+    async def main():
+        # a bot that answers a float, as a broken client would
+        async with TableServer(bot=lambda game: 0.5, join_timeout=0.1) as server:
+            reader, writer = await open_connection(server.address)
+            created = await _request(reader, writer, {'op': 'create', 'players': 2, 'seats': [0], 'bots': [1]})
+            while True:
+                msg = await read_frame(reader)
+                if msg['op'] != 'request': break
+                writer.write(encode_frame({'op': 'act', 'table': msg['table'], 'ply': msg['ply'],
+                                           'action': msg['legal'][0]}))
+            assert msg['op'] == 'error' and msg['table'] == created['table']
+            await asyncio.sleep(0)
+            assert server.num_tables == 0
+            writer.close()
+    asyncio.run(main())
+
+
+def test_broken_frame_closes_the_connection():
+    async def main():
+        async with TableServer() as server:
+            reader, writer = await open_connection(server.address)
+            body = b'[1]'
+            writer.write(len(body).to_bytes(4, 'little') + body)
+            assert await read_frame(reader) == {'op': 'error', 'for': None, 'table': None,
+                                                'message': "'list' object has no attribute 'get'"}
+            assert await read_frame(reader) is None
+            writer.close()
+    asyncio.run(main())
+
+
+def test_view_has_captured_cards():
+    game = Game(2, seed=0)
+    assert view(game, 0)['captured'] == int(game._captured)
+
+
+def test_load():
+    async def main():
+        async with TableServer(seed=0) as server:
+            stats = await run_load(server.address, num_clients=3, num_tables=5, num_games=10, num_bots=1, seed=0)
+        assert stats.games == 30 and stats.errors == 0 and stats.timeouts == 0
+    asyncio.run(main())
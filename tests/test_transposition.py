@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from simulator.transposition import DepthPreferredTable, LRUTable, make_table
+
+
+def test_depth_preferred_replacement():
+    # a single bucket: every key lands in it
+    table = DepthPreferredTable(2)
+    table.store(1, 'a', depth=5)
+    table.store(2, 'b', depth=1)
+    assert len(table) == 2 and table.get(1) == 'a' and table.get(2) == 'b'
+    # a shallower entry takes the always-replace slot
+    table.store(3, 'c', depth=0)
+    assert len(table) == 2 and 2 not in table and table.get(1) == 'a'
+    assert table.stats.replacements == 1
+    # a deeper entry takes the depth-preferred slot, and the entry there moves to the other one
+    table.store(4, 'd', depth=7)
+    assert len(table) == 2 and 3 not in table and table.get(1) == 'a' and table.get(4) == 'd'
+    assert table.stats.replacements == 2
+    # a key of the always-replace slot moves up; nothing is dropped
+    table.store(1, 'e', depth=9)
+    assert len(table) == 2 and table.get(1) == 'e' and table.get(4) == 'd'
+    assert table.stats.replacements == 2
+    # storing a key again replaces its entry, depth included
+    table.store(1, 'f', depth=0)
+    assert len(table) == 2 and table.get(1) == 'f'
+
+    assert table.get(4, min_depth=7) == 'd'
+    assert table.get(4, min_depth=8) is None
+    assert table.get(4, min_depth=8, default='x') == 'x'
+    assert table.get(5, default='x') == 'x'
+    table.clear()
+    assert len(table) == 0 and table.get(4) is None
+
+
+# __len__ counts the distinct keys in the table, whatever the shuffles between the two slots of a bucket
+def test_depth_preferred_len():
+    rng = random.Random(0)
+    table = DepthPreferredTable(8)
+    stored = dict()
+    for i in range(2000):
+        key = rng.randrange(24)
+        table.store(key, i, depth=rng.randrange(4))
+        stored[key] = i
+        keys = [k for k in table._keys if k is not None]
+        assert len(keys) == len(set(keys)) == len(table)
+        assert key in table
+        # an entry in the table holds the last value stored for its key
+        for k in keys:
+            assert table.get(k) == stored[k]
+    assert table.stats.stores == 2000
+
+
+def test_lru_eviction_order():
+    table = LRUTable(3)
+    for key in [1, 2, 3]:
+        table.store(key, str(key))
+    # a hit makes an entry the most recently used one
+    assert table.get(1) == '1'
+    table.store(4, '4')
+    assert 2 not in table and len(table) == 3
+    # so does storing it again
+    table.store(3, '3', depth=2)
+    table.store(5, '5')
+    assert 1 not in table
+    # a lookup that misses min_depth is no hit
+    assert table.get(4, min_depth=1) is None
+    assert table.get(3, min_depth=2) == '3'
+    table.store(6, '6')
+    assert 4 not in table
+    assert list(table._entries) == [5, 3, 6]
+    assert table.stats.replacements == 3
+
+
+def test_make_table():
+    assert isinstance(make_table(16, 'depth'), DepthPreferredTable)
+    assert isinstance(make_table(16, 'lru'), LRUTable)
+    with pytest.raises(Exception):
+        make_table(16, 'fifo')